@@ -0,0 +1,236 @@
+import os
+import sys
+import json
+import stat
+import time
+import uuid
+import signal
+import logging
+import threading
+import socketserver
+from concurrent.futures import ThreadPoolExecutor
+
+# Agents (and boto3 with them) are imported once for the life of the worker
+from bedrock_agent import BedrockAgent
+from validator_agent import ValidatorAgent
+from analyst_agent import AnalystAgent
+from propose_fix_agent import ProposeFixAgent
+from apply_fix_agent import ApplyFixAgent
+from merge_fix_agent import MergeFixAgent
+from worktree_pool import sandbox_enabled
+
+
+class AgentWorker:
+    """
+    Long-lived agent worker.
+    Loads the agents once, keeps the shared Bedrock client and HTTP session warm,
+    and runs jobs (validate, analyze, analyze_batch, propose, apply, merge) on a bounded thread pool.
+
+    Protocol: one JSON object per line over a Unix socket.
+        {"job": "apply", "args": ["<fixId>", "<repoPath>", "<branch>"], "wait": false}
+            -> {"ok": true, "id": "<jobId>", "status": "queued"}
+        {"job": "status", "id": "<jobId>"}  -> {"ok": true, "id": ..., "status": ..., "error": ...}
+        {"job": "stats"}                    -> {"ok": true, "stats": {...}}
+    With "wait": true the reply is sent when the job has finished.
+    """
+
+    # job -> (agent class, number of positional args)
+    JOBS = {
+        "validate": (ValidatorAgent, 0),
+        "analyze": (AnalystAgent, 1),
+        "analyze_batch": (AnalystAgent, 0),
+        "propose": (ProposeFixAgent, 1),
+        "apply": (ApplyFixAgent, 3),
+        "merge": (MergeFixAgent, 3),
+    }
+    # Jobs that check out branches: serialised per repository path
+    # (apply runs in its own worktree with FIX_SANDBOX=worktree, so it is not)
+    REPO_JOBS = ("apply", "merge")
+    SANDBOXED_JOBS = ("apply",)
+
+    def __init__(self, concurrency=4, max_pending=100, keep_results=500):
+        self.logger = logging.getLogger("AgentWorker")
+        self.concurrency = concurrency
+        self.max_pending = max_pending
+        self.keep_results = keep_results
+        self.executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="agent-job")
+        self._lock = threading.Lock()
+        self._repo_locks = {}
+        self._jobs = {}  # id -> {"job", "status", "error", "started", "finished"}
+        self._pending = 0
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0}
+
+    def warm_up(self):
+        """Create the shared Bedrock client and HTTP session before the first job arrives."""
+        BedrockAgent.shared_client()
+        self.logger.info("Bedrock client ready")
+
+    def submit(self, job, args):
+        """Queue a job; returns (job_id, future) or raises ValueError when it cannot be accepted."""
+        if job not in self.JOBS:
+            raise ValueError(f"unknown job '{job}'")
+        agent_cls, arity = self.JOBS[job]
+        args = [str(a) for a in (args or [])]
+        if len(args) != arity:
+            raise ValueError(f"job '{job}' expects {arity} args, got {len(args)}")
+
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self.stats["rejected"] += 1
+                raise ValueError("worker queue is full")
+            self._pending += 1
+            self.stats["submitted"] += 1
+            job_id = f"{job}-{uuid.uuid4().hex[:12]}"
+            self._jobs[job_id] = {"job": job, "status": "queued", "error": None, "started": None, "finished": None}
+            self._trim_results()
+
+        future = self.executor.submit(self._run, job_id, job, agent_cls, args)
+        return job_id, future
+
+    def _run(self, job_id, job, agent_cls, args):
+        record = self._jobs[job_id]
+        record["status"] = "running"
+        record["started"] = time.time()
+        self.logger.info(f"Running {job_id} {args}")
+        try:
+            serialised = job in self.REPO_JOBS and not (job in self.SANDBOXED_JOBS and sandbox_enabled())
+            repo_lock = self._repo_lock(args[1]) if serialised else None
+            if repo_lock:
+                with repo_lock:
+                    agent_cls().run(*args)
+            else:
+                agent_cls().run(*args)
+            record["status"] = "completed"
+        except SystemExit as e:
+            # CLI-style agents exit on failure; that must not take the worker down
+            record["status"] = "completed" if not e.code else "failed"
+            if e.code:
+                record["error"] = f"agent exited with code {e.code}"
+        except Exception as e:
+            record["status"] = "failed"
+            record["error"] = str(e)
+        finally:
+            record["finished"] = time.time()
+            with self._lock:
+                self._pending -= 1
+                self.stats["completed" if record["status"] == "completed" else "failed"] += 1
+
+        if record["status"] == "failed":
+            self.logger.error(f"Job {job_id} failed: {record['error']}")
+        else:
+            self.logger.info(f"Job {job_id} completed in {record['finished'] - record['started']:.1f}s")
+        return record
+
+    def _repo_lock(self, repo_path):
+        key = os.path.realpath(repo_path)
+        with self._lock:
+            return self._repo_locks.setdefault(key, threading.Lock())
+
+    def _trim_results(self):
+        """Forget the oldest finished jobs beyond keep_results (caller holds _lock)."""
+        excess = len(self._jobs) - self.keep_results
+        if excess <= 0:
+            return
+        for job_id in [j for j, r in self._jobs.items() if r["finished"]][:excess]:
+            del self._jobs[job_id]
+
+    def status(self, job_id):
+        record = self._jobs.get(job_id)
+        if record is None:
+            return None
+        return {"id": job_id, "job": record["job"], "status": record["status"], "error": record["error"]}
+
+    def snapshot(self):
+        with self._lock:
+            stats = {**self.stats, "pending": self._pending, "concurrency": self.concurrency}
+        stats["llm_cache"] = BedrockAgent.cache_stats()
+        stats["model_routing"] = BedrockAgent.routing_stats()
+        stats["bedrock_governors"] = BedrockAgent.governor_stats()
+        return stats
+
+    def handle(self, request):
+        """Process one decoded request and return the reply dict."""
+        job = request.get("job")
+        if job == "stats":
+            return {"ok": True, "stats": self.snapshot()}
+        if job == "status":
+            status = self.status(request.get("id", ""))
+            return {"ok": True, **status} if status else {"ok": False, "error": "unknown job id"}
+
+        try:
+            job_id, future = self.submit(job, request.get("args"))
+        except ValueError as e:
+            return {"ok": False, "error": str(e)}
+
+        if request.get("wait"):
+            future.result()
+            return {"ok": True, **self.status(job_id)}
+        return {"ok": True, "id": job_id, "status": "queued"}
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                reply = self.server.worker.handle(json.loads(line))
+            except json.JSONDecodeError as e:
+                reply = {"ok": False, "error": f"invalid JSON: {e}"}
+            self.wfile.write((json.dumps(reply) + "\n").encode("utf-8"))
+            self.wfile.flush()
+
+
+class AgentWorkerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path, worker):
+        try:
+            mode = os.lstat(socket_path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError(f"{socket_path} exists and is not a socket; refusing to replace it")
+            os.remove(socket_path)  # stale socket from a previous run
+        self.worker = worker
+        super().__init__(socket_path, _RequestHandler)
+
+
+def main():
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger("AgentWorker")
+
+    socket_path = os.getenv("AGENT_WORKER_SOCKET", "/tmp/night-agent-worker.sock")
+    worker = AgentWorker(
+        concurrency=int(os.getenv("AGENT_WORKER_CONCURRENCY", "4")),
+        max_pending=int(os.getenv("AGENT_WORKER_MAX_PENDING", "100")),
+    )
+    worker.warm_up()
+
+    server = AgentWorkerServer(socket_path, worker)
+
+    def stop(signum, frame):
+        logger.info("Shutting down, waiting for running jobs...")
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    logger.info(f"Listening on {socket_path} (concurrency {worker.concurrency})")
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        worker.shutdown()
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        logger.info(f"Stopped: {worker.snapshot()}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
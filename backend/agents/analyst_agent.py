@@ -1,55 +1,177 @@
 
 from bedrock_agent import BedrockAgent
-import requests
+from concurrency import AdaptiveLimiter, is_throttle_error
+from anomaly_groups import cluster_anomalies, root_key
+from repo_index import open_index
+from model_router import json_check
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import json
 import logging
 import os
 import sys
+import time
 
 class AnalystAgent(BedrockAgent):
     def __init__(self):
         super().__init__(model_name="mistral_large_3")
         self.api_url = os.getenv("API_URL", "http://localhost:3001/api/internal")
+        self.concurrency = int(os.getenv("ANALYST_CONCURRENCY", "4"))
+        self.analysis_batch_size = int(os.getenv("ANALYST_SAVE_BATCH", "20"))
+        # Optional index of the target repository: source locations for the prompt
+        self.repo_path = os.getenv("REPO_PATH")
+        self.index = open_index(self.repo_path) if os.getenv("REPO_INDEX", "true").lower() != "false" else None
+        # Cascade: a smaller model's analysis is kept when complete and at least this confident
+        self.check = json_check(("root_cause", "suggested_fix"),
+                                min_confidence=float(os.getenv("MODEL_CASCADE_MIN_CONFIDENCE", "0.7")))
 
     def run(self, anomaly_id=None):
         if anomaly_id:
             self.analyze_single(anomaly_id)
         else:
-            self.logger.info("Batch mode not implemented for Analyst yet.")
+            self.run_batch()
 
     def analyze_single(self, anomaly_id):
         self.logger.info(f"Fetching anomaly {anomaly_id}...")
         try:
-            res = requests.get(f"{self.api_url}/anomalies/{anomaly_id}")
+            res = self.http.get(f"{self.api_url}/anomalies/{anomaly_id}")
             anomaly = res.json()
         except Exception as e:
             self.logger.error(f"Failed to fetch anomaly: {e}")
             return
 
+        analysis = self.analyze(anomaly)
+        if analysis:
+            self.save_analysis(anomaly['id'], analysis)
+
+    def run_batch(self):
+        """
+        Analyse every validated-critical anomaly in one pass:
+        one fetch for all of them, one LLM call per (service, log template) group
+        run concurrently, the group's analysis shared by all its members,
+        results saved in bulk.
+        """
+        self.logger.info("Fetching validated anomalies...")
+        try:
+            res = self.http.get(f"{self.api_url}/anomalies/validated", timeout=30)
+            res.raise_for_status()
+            anomalies = res.json()
+        except Exception as e:
+            self.logger.error(f"Failed to fetch validated anomalies: {e}")
+            return
+
+        if not anomalies:
+            self.logger.info("No validated anomalies to analyse.")
+            return
+
+        groups = cluster_anomalies(anomalies, key_fn=root_key)
+        print(f"INFO:AnalystAgent:{len(anomalies)} validated anomalies -> {len(groups)} distinct root templates")
+
+        limiter = AdaptiveLimiter(initial=self.concurrency, max_limit=max(self.concurrency, 16))
+        self.throttle_listener = limiter.on_throttle
+        pending = []
+        timings = []
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(max_workers=limiter.max_limit, thread_name_prefix="analyst") as pool:
+            futures = {pool.submit(self._analyze_group, limiter, group): group for group in groups}
+            for future in as_completed(futures):
+                group = futures[future]
+                rep_id = group.representative['id']
+                try:
+                    analysis, elapsed = future.result()
+                except Exception as e:
+                    kind = "throttled" if is_throttle_error(e) else "failed"
+                    print(f"ERROR:AnalystAgent:Analysis of {rep_id} {kind}: {e}")
+                    timings.append((rep_id, len(group), None))
+                    continue
+
+                timings.append((rep_id, len(group), elapsed))
+                if not analysis:
+                    continue
+                for anomaly in group.members:
+                    shared = analysis if anomaly['id'] == rep_id else {**analysis, "shared_from": rep_id}
+                    pending.append({"id": anomaly['id'], "analysis": shared})
+
+                if len(pending) >= self.analysis_batch_size:
+                    self.save_analyses(pending)
+                    pending = []
+
+        if pending:
+            self.save_analyses(pending)
+
+        for rep_id, members, elapsed in timings:
+            took = f"{elapsed:.2f}s" if elapsed is not None else "failed"
+            print(f"TIMING:AnalystAgent:{rep_id} members={members} {took}")
+        stats = limiter.snapshot()
+        print(f"INFO:AnalystAgent:Batch finished in {time.monotonic() - started:.1f}s "
+              f"({len(groups)} LLM calls, concurrency {stats['limit']}, throttles {stats['throttles']})")
+
+    def _analyze_group(self, limiter, group):
+        related = [a['id'] for a in group.members if a['id'] != group.representative['id']]
+        with limiter:
+            started = time.monotonic()
+            analysis = self.analyze(group.representative, related)
+            elapsed = time.monotonic() - started
+        limiter.on_success()
+        return analysis, elapsed
+
+    def _source_locations(self, anomaly):
+        """Index lookups for the anomaly's message, template and logs (no model call)."""
+        if not self.index:
+            return []
+        context = anomaly.get('context') if isinstance(anomaly.get('context'), dict) else {}
+        logs = anomaly.get('logs') or []
+        text = "\n".join([anomaly.get('message') or '', context.get('log_template') or '',
+                          *(logs if isinstance(logs, list) else [str(logs)])])
+        return self.index.locate(text, limit=8)
+
+    def analyze(self, anomaly, related=None):
+        """Root cause analysis for one anomaly; returns the analysis dict or None."""
         print(f"INFO:AnalystAgent:Analyzing anomaly {anomaly['id']}...")
-        
+
+        locations = self._source_locations(anomaly)
+        locations_text = ""
+        if locations:
+            listed = "\n        ".join(
+                f"- {loc['path']}:{loc['line']}" + (f" in {loc['symbol']}" if loc['symbol'] else "") + f" ({loc['reason']})"
+                for loc in locations
+            )
+            locations_text = f"""
+        CANDIDATE SOURCE LOCATIONS (from the repository index):
+        {listed}
+        """
+
+        related_text = ""
+        if related:
+            related_text = f"""
+        RELATED OCCURRENCES:
+        {len(related)} more anomalies with the same service and log template ({', '.join(related[:10])}).
+        They share this root cause.
+        """
+
         prompt = f"""
         You are a Principal Software Engineer doing Root Cause Analysis (RCA).
-        
+
         ANOMALY:
         {json.dumps(anomaly, indent=2)}
-        
+        {related_text}{locations_text}
         REPO URL: {anomaly.get('repoUrl', 'unknown')}
-        
+
         TASK:
-        Analyze the logs and context provided. 
+        Analyze the logs and context provided.
         Identify the Root Cause and suggest a fix.
-        
+
         OUTPUT FORMAT (JSON ONLY):
         {{
             "root_cause": "Detailed technical explanation. Single paragraph.",
             "relevant_files": ["src/service/foo.ts", "src/api/bar.ts"],
-            "suggested_fix": "Step-by-step description. Use ; to separate steps. DO NOT use newlines inside strings."
+            "suggested_fix": "Step-by-step description. Use ; to separate steps. DO NOT use newlines inside strings.",
+            "confidence": 0.0-1.0 (how sure you are that the root cause is right)
         }}
         """
-        
-        response_text = self.invoke(prompt)
-        if not response_text: return
+
+        response_text = self.invoke_cascade(prompt, self.check, task="analyze")
+        if not response_text: return None
 
         try:
             # Cleanup markdown
@@ -60,32 +182,46 @@ class AnalystAgent(BedrockAgent):
 
             # Attempt to fix newlines that break JSON
             response_text = response_text.replace('\n', ' ')
-            
+
             analysis = json.loads(response_text)
-            
+            if locations and not analysis.get('relevant_files'):
+                analysis['relevant_files'] = list(dict.fromkeys(loc['path'] for loc in locations))[:5]
+
             # Print for Kestra capture if needed (though we save via API)
             print(f"ANALYSIS_OUTPUT:{json.dumps(analysis)}")
-            
-            self.save_analysis(anomaly['id'], analysis)
+            return analysis
 
         except Exception as e:
             print(f"ERROR:AnalystAgent:Failed to parse LLM response: {e}")
             print(f"DEBUG:AnalystAgent:Raw Response: {response_text}")
+            return None
 
     def save_analysis(self, anomaly_id, analysis):
         payload = {
             "id": anomaly_id,
-            "analysis": analysis 
+            "analysis": analysis
         }
         try:
-            res = requests.post(f"{self.api_url}/anomalies/analysis", json=payload)
+            res = self.http.post(f"{self.api_url}/anomalies/analysis", json=payload)
             res.raise_for_status()
             print(f"INFO:AnalystAgent:Analysis saved: {res.status_code}")
         except Exception as e:
             print(f"ERROR:AnalystAgent:Save failed: {e}")
 
+    def save_analyses(self, items):
+        """Save several analyses in one request; falls back to one POST per analysis."""
+        try:
+            res = self.http.post(f"{self.api_url}/anomalies/analysis/batch", json={"analyses": items}, timeout=30)
+            res.raise_for_status()
+            print(f"INFO:AnalystAgent:Saved {len(items)} analyses in one batch")
+        except Exception as e:
+            print(f"WARN:AnalystAgent:Batch save failed ({e}), saving individually")
+            for item in items:
+                self.save_analysis(item['id'], item['analysis'])
+
 if __name__ == "__main__":
     if len(sys.argv) > 1:
         AnalystAgent().run(sys.argv[1])
     else:
-        print("Usage: python analyst_agent.py <anomaly_id>")
+        # No id: batch mode over all validated anomalies
+        AnalystAgent().run()
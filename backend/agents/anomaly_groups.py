@@ -0,0 +1,98 @@
+import re
+import json
+from collections import OrderedDict
+
+# Masks applied to messages when an anomaly has no log_template (mirrors the
+# sidecar's template extraction closely enough to group the same event)
+_MASKS = [
+    (re.compile(r'[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}'), '<UUID>'),
+    (re.compile(r'\b\d{1,3}(?:\.\d{1,3}){3}\b'), '<IP>'),
+    (re.compile(r'\b0x[0-9a-fA-F]+\b'), '<HEX>'),
+    (re.compile(r'\d+'), '<NUM>'),
+]
+
+
+def _template_of(anomaly):
+    context = anomaly.get('context')
+    if isinstance(context, dict) and context.get('log_template'):
+        return context['log_template']
+    text = anomaly.get('message') or ''
+    for pattern, token in _MASKS:
+        text = pattern.sub(token, text)
+    return text.strip()
+
+
+def group_key(anomaly):
+    """(service, anomaly type, log template) - anomalies with the same key describe the same event."""
+    return (
+        anomaly.get('serviceId') or 'unknown',
+        anomaly.get('anomaly_type') or 'Unknown',
+        _template_of(anomaly),
+    )
+
+
+def root_key(anomaly):
+    """(service, log template) - same underlying event regardless of how it was detected."""
+    return (anomaly.get('serviceId') or 'unknown', _template_of(anomaly))
+
+
+class AnomalyGroup:
+    """Anomalies sharing a key (group_key or root_key); the representative is the one sent to the LLM."""
+
+    def __init__(self, key):
+        self.key = key
+        self.members = []
+
+    @property
+    def service(self):
+        return self.key[0]
+
+    @property
+    def anomaly_type(self):
+        return self.key[1] if len(self.key) > 2 else self.representative.get('anomaly_type') or 'Unknown'
+
+    @property
+    def template(self):
+        return self.key[-1]
+
+    @property
+    def representative(self):
+        # Highest backend priority first, then sidecar confidence, then the newest (list order)
+        return max(self.members, key=lambda a: (a.get('priority_score') or 0, a.get('confidence') or 0))
+
+    def __len__(self):
+        return len(self.members)
+
+    def summary(self, max_logs=5, max_chars=300):
+        """Compact description of the group for packed prompts (no full JSON dump)."""
+        rep = self.representative
+        logs = rep.get('logs') or []
+        if isinstance(logs, str):
+            logs = logs.splitlines()
+        context = rep.get('context') if isinstance(rep.get('context'), dict) else {}
+        return {
+            "service": self.service,
+            "type": self.anomaly_type,
+            "template": self.template[:max_chars],
+            "occurrences": len(self.members),
+            "severity": rep.get('severity') or context.get('severity'),
+            "message": (rep.get('message') or '')[:max_chars],
+            "sample_logs": [str(line)[:max_chars] for line in logs[-max_logs:]],
+        }
+
+
+def cluster_anomalies(anomalies, key_fn=group_key):
+    """Group anomalies by key_fn (default group_key), keeping first-seen order."""
+    groups = OrderedDict()
+    for anomaly in anomalies:
+        key = key_fn(anomaly)
+        group = groups.get(key)
+        if group is None:
+            group = groups[key] = AnomalyGroup(key)
+        group.members.append(anomaly)
+    return list(groups.values())
+
+
+def summaries_json(groups):
+    """Numbered group summaries as prompt text."""
+    return json.dumps([{"group": i, **g.summary()} for i, g in enumerate(groups)], indent=2)
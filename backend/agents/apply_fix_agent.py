@@ -3,8 +3,9 @@ import sys
 import os
 import re
 import logging
-import requests
 from bedrock_agent import BedrockAgent
+from model_router import merge_check
+from worktree_pool import WorktreePool, sandbox_enabled
 
 
 class ApplyFixAgent(BedrockAgent):
@@ -20,7 +21,7 @@ class ApplyFixAgent(BedrockAgent):
 
         # 1. Fetch Patch
         try:
-            res = requests.get(f"{self.api_url}/fix/{fix_proposal_id}")
+            res = self.http.get(f"{self.api_url}/fix/{fix_proposal_id}")
             res.raise_for_status()
             fix_data = res.json()
             patch_content = fix_data.get("diff")
@@ -31,6 +32,10 @@ class ApplyFixAgent(BedrockAgent):
             self.logger.error(f"Failed to fetch fix details: {e}")
             return
 
+        if sandbox_enabled():
+            self.run_sandboxed(fix_proposal_id, repo_path, branch_name, patch_content)
+            return
+
         patch_file = os.path.join(repo_path, "temp_apply.patch")
         with open(patch_file, "w") as f:
             f.write(patch_content)
@@ -88,6 +93,77 @@ class ApplyFixAgent(BedrockAgent):
                 os.remove(patch_file)
 
         # 4. Commit and Push (If changes exist)
+        self._commit_changes(repo_path, fix_proposal_id)
+
+    def run_sandboxed(self, fix_proposal_id, repo_path, branch_name, patch_content):
+        """
+        Apply the fix in a pooled git worktree (FIX_SANDBOX=worktree) instead of the
+        shared checkout, so several fixes can be applied and validated at once.
+        The branch starts from the locally cached base commit.
+        """
+        pool = WorktreePool.from_env(repo_path)
+        with pool.lease(branch_name) as work_path:
+            self.logger.info(f"Sandbox worktree {work_path} on branch {branch_name}")
+            patch_file = os.path.join(work_path, "temp_apply.patch")
+            with open(patch_file, "w") as f:
+                f.write(patch_content)
+            try:
+                self.logger.info("Attempting native git apply...")
+                subprocess.run(
+                    ["git", "apply", "temp_apply.patch"],
+                    cwd=work_path,
+                    check=True,
+                    capture_output=True,
+                )
+                self.logger.info("Native git apply succeeded.")
+            except subprocess.CalledProcessError as e:
+                self.logger.warning(
+                    f"Native git apply failed: {e.stderr.decode() if e.stderr else str(e)}"
+                )
+                self.logger.info("Attempting Bedrock Conflict Resolution...")
+                self.resolve_conflict_and_apply(work_path, patch_content)
+            finally:
+                if os.path.exists(patch_file):
+                    os.remove(patch_file)
+
+            self._commit_changes(work_path, fix_proposal_id)
+            # After the commit, so build/test output is never committed (release cleans it)
+            passed = self._validate(work_path, fix_proposal_id)
+        if not passed:
+            # The fix stays committed on its branch for inspection, but the job fails
+            sys.exit(1)
+
+    def _validate(self, work_path, fix_proposal_id):
+        """
+        Run FIX_VALIDATE_COMMAND (e.g. the target's test suite) in the worktree, if set,
+        and report the outcome to the API. Returns False if the command failed.
+        """
+        command = os.getenv("FIX_VALIDATE_COMMAND")
+        if not command:
+            return True
+        self.logger.info(f"Validating fix: {command}")
+        result = subprocess.run(command, shell=True, cwd=work_path, capture_output=True, text=True)
+        status = "passed" if result.returncode == 0 else f"failed (exit {result.returncode})"
+        output = (result.stdout + result.stderr)[-500:]
+        print(f"VALIDATION:ApplyFixAgent:{status}")
+        if result.returncode != 0:
+            self.logger.warning(f"Validation {status}: {output}")
+        self._report_validation(fix_proposal_id, result.returncode == 0, status, output)
+        return result.returncode == 0
+
+    def _report_validation(self, fix_proposal_id, passed, status, output):
+        try:
+            res = self.http.post(
+                f"{self.api_url}/fix/{fix_proposal_id}/validation",
+                json={"passed": passed, "status": status, "output": output},
+                timeout=10,
+            )
+            if not res.ok:
+                self.logger.error(f"Failed to report validation: {res.text}")
+        except Exception as e:
+            self.logger.error(f"Failed to report validation: {e}")
+
+    def _commit_changes(self, repo_path, fix_proposal_id):
         try:
             status = subprocess.run(
                 ["git", "status", "--porcelain"],
@@ -149,18 +225,17 @@ PATCH:
         """
 
         self.logger.info(f"Asking Bedrock to merge patch for {target_file_rel}...")
-        new_content = self.invoke(
+        # Cascade: a smaller model's merge is kept if it has every added line of the patch
+        check = merge_check(file_content, patch_content, target_file_rel)
+        new_content = self.invoke_cascade(
             prompt,
+            lambda text: check(self._strip_fences(text)),
             system_prompt="You are a code merging engine. Output only the merged code.",
+            task="apply",
         )
 
         if new_content:
-            # Strip loose markdown code blocks if Bedrock adds them
-            clean_content = new_content.strip()
-            if clean_content.startswith("```"):
-                clean_content = clean_content.split("\n", 1)[1]
-            if clean_content.endswith("```"):
-                clean_content = clean_content.rsplit("\n", 1)[0]
+            clean_content = self._strip_fences(new_content)
 
             # Write Back
             with open(target_file_abs, "w") as f:
@@ -171,6 +246,16 @@ PATCH:
         else:
             self.logger.error("Bedrock returned no content.")
 
+    @staticmethod
+    def _strip_fences(content):
+        # Strip loose markdown code blocks if Bedrock adds them
+        clean_content = content.strip()
+        if clean_content.startswith("```"):
+            clean_content = clean_content.split("\n", 1)[1]
+        if clean_content.endswith("```"):
+            clean_content = clean_content.rsplit("\n", 1)[0]
+        return clean_content
+
 
 if __name__ == "__main__":
     if len(sys.argv) < 3:
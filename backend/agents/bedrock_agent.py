@@ -3,15 +3,27 @@ import boto3
 import json
 import os
 import logging
+import time
+import threading
 import requests
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception, retry_if_exception_type
+from llm_cache import LLMCache
+from concurrency import is_throttle_error, is_retryable, RateGovernor, BedrockStreamError
+from model_router import cascade_tiers, CascadeStats
 
 class BedrockAgent:
     """
     Base agent class that provides:
-    - AWS Bedrock LLM invocation with retry logic
+    - AWS Bedrock LLM invocation with retry logic (throttles and transient errors only)
+    - Per-model rate governor and circuit breaker shared across processes
     - HTTP API calls with retry logic
     - Credential management
+    - Process-wide Bedrock client and HTTP session, shared by every agent
+      instance (the agent worker keeps them warm across jobs)
+    - Optional on-disk response cache (LLM_CACHE_DIR)
+    - Streaming invocation (converse_stream) with caller-defined early stop
+    - Cascade routing: cheaper MODEL_MAPPING tiers first, escalating when the
+      answer fails a caller-supplied check (MODEL_CASCADE)
     """
     
     MODEL_MAPPING = {
@@ -35,22 +47,64 @@ class BedrockAgent:
         "mistral_large_3": "mistral.mistral-large-3-675b-instruct",
     }
 
-    def __init__(self, model_name="mistral_large_3"):
+    # Shared across instances: boto3 clients and requests sessions are thread-safe
+    # for the calls made here, and building them is the expensive part of startup
+    _clients = {}
+    _client_lock = threading.Lock()
+    _creds_loaded = False
+    http = requests.Session()
+    cache = LLMCache.from_env()
+    routing = CascadeStats.from_env()
+
+    # Called on every throttled Bedrock attempt (e.g. AdaptiveLimiter.on_throttle)
+    throttle_listener = None
+
+    # One RateGovernor per model id (None when BEDROCK_GOVERNOR=false)
+    _governors = {}
+
+    INFERENCE_CONFIG = {
+        "maxTokens": 2000,
+        "temperature": 0.7
+    }
+
+    # BEDROCK_STREAMING=false makes invoke_stream fall back to the blocking call
+    streaming = os.environ.get('BEDROCK_STREAMING', 'true').lower() != 'false'
+
+    def __init__(self, model_name="mistral_large_3", client=None):
         # Resolve friendly name to ID, or use as is if not in mapping
         self.model_id = self.MODEL_MAPPING.get(model_name, model_name)
-        self._setup_creds()
-        self.client = boto3.client(
-            service_name='bedrock-runtime',
-            region_name=os.environ.get('AWS_DEFAULT_REGION', 'us-east-1'),
-            aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
-            aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY')
-        )
+        # An injected client (e.g. bedrock_stub.StubBedrockClient) replaces the shared one
+        self.client = client or self.shared_client()
+        # Models tried by invoke_cascade, cheapest first, ending with model_id
+        self.tiers = cascade_tiers(self.MODEL_MAPPING, self.model_id)
+        self.last_stream = None
+        self.last_cascade = None
         self.logger = logging.getLogger(self.__class__.__name__)
         logging.basicConfig(level=logging.INFO)
         self.logger.info(f"Initialized BedrockAgent with model: {self.model_id}")
 
-    def _setup_creds(self):
+    @classmethod
+    def shared_client(cls):
+        """Bedrock runtime client for the current region, created once per process."""
+        region = os.environ.get('AWS_DEFAULT_REGION', 'us-east-1')
+        with cls._client_lock:
+            client = cls._clients.get(region)
+            if client is None:
+                cls._setup_creds()
+                client = cls._clients[region] = boto3.client(
+                    service_name='bedrock-runtime',
+                    region_name=region,
+                    aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
+                    aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY')
+                )
+            return client
+
+    @classmethod
+    def _setup_creds(cls):
         """Load AWS credentials from file if env vars are missing."""
+        if cls._creds_loaded:
+            return
+        cls._creds_loaded = True
         if not os.environ.get('AWS_ACCESS_KEY_ID'):
             try:
                 # Find creds relative to this file (backend/agents/bedrock_agent.py -> backend/awsp_creds.txt)
@@ -65,19 +119,58 @@ class BedrockAgent:
             except FileNotFoundError:
                 pass  # Will fail later when trying to use client
 
+    def invoke(self, prompt, system_prompt="You are a helpful AI assistant.", use_cache=True, model_id=None):
+        """
+        Invoke Bedrock LLM, answering from the response cache when enabled.
+        Pass use_cache=False to always call Bedrock (the fresh answer is still stored).
+        model_id overrides the agent's model for this call.
+        """
+        model_id = model_id or self.model_id
+        key = None
+        if self.cache:
+            key = LLMCache.make_key(model_id, system_prompt, prompt, self.INFERENCE_CONFIG)
+            if use_cache:
+                cached = self.cache.get(key)
+                if cached is not None:
+                    self.logger.info(f"LLM cache hit ({key[:12]})")
+                    return cached
+
+        text = self._converse(prompt, system_prompt, model_id)
+        if key and text:
+            self.cache.put(key, text, model_id)
+        return text
+
+    @classmethod
+    def governor_for(cls, model_id):
+        """The process's RateGovernor for model_id (state shared with other processes)."""
+        with cls._client_lock:
+            if model_id not in cls._governors:
+                cls._governors[model_id] = RateGovernor.from_env(model_id)
+            return cls._governors[model_id]
+
+    def _on_call_error(self, error, governor):
+        if is_throttle_error(error):
+            if self.throttle_listener:
+                self.throttle_listener()
+            if governor:
+                governor.on_throttle()
+
     @retry(
         stop=stop_after_attempt(3),
         wait=wait_exponential(multiplier=1, min=2, max=30),
-        retry=retry_if_exception_type(Exception),
+        retry=retry_if_exception(is_retryable),
         before_sleep=lambda retry_state: logging.getLogger("BedrockAgent").warning(
             f"Bedrock call failed, retrying in {retry_state.next_action.sleep}s... (attempt {retry_state.attempt_number})"
         )
     )
-    def invoke(self, prompt, system_prompt="You are a helpful AI assistant."):
+    def _converse(self, prompt, system_prompt, model_id=None):
         """
-        Invoke Bedrock LLM with retry logic.
-        Retries up to 3 times with exponential backoff.
+        Call Bedrock with retry logic.
+        Retries throttles and transient errors up to 3 times with exponential backoff;
+        fails fast (CircuitOpenError) while the model's circuit is open.
         """
+        model_id = model_id or self.model_id
+        governor = self.governor_for(model_id)
         messages = [{
             "role": "user",
             "content": [{"text": prompt}]
@@ -85,18 +178,203 @@ class BedrockAgent:
         
         system = [{"text": system_prompt}]
 
+        if governor:
+            governor.acquire()
         # Use the Converse API which abstracts model-specific payloads
-        response = self.client.converse(
-            modelId=self.model_id,
-            messages=messages,
-            system=system,
-            inferenceConfig={
-                "maxTokens": 2000,
-                "temperature": 0.7
-            }
-        )
+        try:
+            response = self.client.converse(
+                modelId=model_id,
+                messages=messages,
+                system=system,
+                inferenceConfig=self.INFERENCE_CONFIG
+            )
+        except Exception as e:
+            self._on_call_error(e, governor)
+            raise
+        if governor:
+            governor.on_success()
         return response['output']['message']['content'][0]['text']
 
+    def invoke_stream(self, prompt, system_prompt="You are a helpful AI assistant.", stop_when=None,
+                      on_text=None, use_cache=True, model_id=None, cache_tag=None):
+        """
+        Invoke Bedrock through converse_stream, parsing the output as it arrives.
+
+        stop_when(text) is called with the accumulated text after every delta; when it
+        returns True the stream is closed and the text so far is returned, so the model
+        stops generating (and billing) output tokens. on_text(text) sees every update.
+        Complete responses are cached (shared with invoke). Early-stopped text is only
+        cached when cache_tag names the stop condition (e.g. "fields:decision,reasoning"):
+        it is stored under a key including the tag, so only callers stopping the same way get it.
+        Details of the last call are kept in self.last_stream.
+        """
+        model_id = model_id or self.model_id
+        key = tagged_key = None
+        if self.cache:
+            key = LLMCache.make_key(model_id, system_prompt, prompt, self.INFERENCE_CONFIG)
+            if cache_tag:
+                tagged_key = LLMCache.make_key(model_id, system_prompt, prompt, self.INFERENCE_CONFIG, cache_tag)
+            if use_cache:
+                # A complete response serves any stop condition
+                for candidate in (tagged_key, key):
+                    cached = self.cache.get(candidate) if candidate else None
+                    if cached is not None:
+                        self.logger.info(f"LLM cache hit ({candidate[:12]})")
+                        self.last_stream = {"cached": True, "stopped_early": candidate == tagged_key,
+                                            "chars": len(cached)}
+                        return cached
+
+        if not self.streaming or not hasattr(self.client, "converse_stream"):
+            text = self._converse(prompt, system_prompt, model_id)
+            info = {"cached": False, "streamed": False, "stopped_early": False, "chars": len(text or "")}
+        else:
+            text, info = self._converse_stream(prompt, system_prompt, stop_when, on_text, model_id)
+        self.last_stream = info
+
+        if key and text and not info["stopped_early"]:
+            self.cache.put(key, text, model_id)
+        elif tagged_key and text:
+            self.cache.put(tagged_key, text, model_id)
+        return text
+
+    @retry(
+        stop=stop_after_attempt(3),
+        wait=wait_exponential(multiplier=1, min=2, max=30),
+        retry=retry_if_exception(is_retryable),
+        before_sleep=lambda retry_state: logging.getLogger("BedrockAgent").warning(
+            f"Bedrock stream failed, retrying in {retry_state.next_action.sleep}s... (attempt {retry_state.attempt_number})"
+        )
+    )
+    def _converse_stream(self, prompt, system_prompt, stop_when, on_text, model_id=None):
+        model_id = model_id or self.model_id
+        governor = self.governor_for(model_id)
+        if governor:
+            governor.acquire()
+        started = time.monotonic()
+        try:
+            response = self.client.converse_stream(
+                modelId=model_id,
+                messages=[{"role": "user", "content": [{"text": prompt}]}],
+                system=[{"text": system_prompt}],
+                inferenceConfig=self.INFERENCE_CONFIG
+            )
+            text, stopped, first_token, usage = self._read_stream(response['stream'], started, stop_when, on_text)
+        except Exception as e:
+            self._on_call_error(e, governor)
+            raise
+        if governor:
+            governor.on_success()
+
+        info = {
+            "cached": False,
+            "streamed": True,
+            "stopped_early": stopped,
+            "chars": len(text),
+            "first_token_s": round(first_token, 3) if first_token is not None else None,
+            "elapsed_s": round(time.monotonic() - started, 3),
+            "output_tokens": usage.get('outputTokens'),
+        }
+        if stopped:
+            self.logger.info(f"Stream stopped early after {len(text)} chars ({info['elapsed_s']}s)")
+        return text, info
+
+    @staticmethod
+    def _read_stream(stream, started, stop_when, on_text):
+        """Accumulate text deltas until the end of the stream or stop_when; returns (text, stopped, first_token_s, usage)."""
+        parts = []
+        text = ""
+        first_token = None
+        stopped = False
+        usage = {}
+        try:
+            for event in stream:
+                if 'contentBlockDelta' in event:
+                    delta = event['contentBlockDelta'].get('delta', {}).get('text', '')
+                    if not delta:
+                        continue
+                    if first_token is None:
+                        first_token = time.monotonic() - started
+                    parts.append(delta)
+                    text = "".join(parts)
+                    if on_text:
+                        on_text(text)
+                    if stop_when and stop_when(text):
+                        stopped = True
+                        break
+                elif 'metadata' in event:
+                    usage = event['metadata'].get('usage', {})
+                else:
+                    name = next(iter(event), '')
+                    if name.endswith('Exception'):
+                        raise BedrockStreamError(name, event[name].get('message', ''))
+        finally:
+            if stopped and hasattr(stream, 'close'):
+                stream.close()  # drops the connection: generation stops server-side
+        return text, stopped, first_token, usage
+
+    def invoke_cascade(self, prompt, check, system_prompt="You are a helpful AI assistant.", tiers=None,
+                       stop_when=None, task=None):
+        """
+        Route a prompt through the model tiers, cheapest first.
+
+        check(text) returns None when the answer is good enough, else the reason it
+        is not; a rejected answer (or a failed call) escalates to the next tier. The
+        last tier's answer is returned even if rejected, and its errors propagate.
+        stop_when is a zero-argument factory for a fresh invoke_stream stop condition
+        per attempt. Per-tier latency and outcomes go to BedrockAgent.routing.
+        """
+        tiers = tiers or self.tiers
+        task = task or self.__class__.__name__
+        attempts = []
+        text = None
+        try:
+            for i, model_id in enumerate(tiers):
+                last = i == len(tiers) - 1
+                started = time.monotonic()
+                try:
+                    text = self.invoke_stream(prompt, system_prompt=system_prompt, model_id=model_id,
+                                              stop_when=stop_when() if stop_when else None)
+                except Exception as e:
+                    attempts.append({"model": model_id, "latency_s": round(time.monotonic() - started, 3),
+                                     "outcome": "error", "reason": str(e)[:200]})
+                    if last:
+                        raise
+                    self.logger.warning(f"Cascade: {model_id} failed ({e}), escalating")
+                    continue
+
+                reason = check(text) if text else "empty response"
+                attempts.append({"model": model_id, "latency_s": round(time.monotonic() - started, 3),
+                                 "outcome": "rejected" if reason else "accepted", "reason": reason})
+                if not reason:
+                    break
+                if last:
+                    self.logger.warning(f"Cascade: top tier {model_id} answer failed the check ({reason})")
+                else:
+                    self.logger.info(f"Cascade: {model_id} rejected ({reason}), escalating")
+        finally:
+            self.last_cascade = {"task": task, "attempts": attempts}
+            self.routing.record(task, attempts)
+            path = " -> ".join(f"{a['model']}:{a['outcome']}:{a['latency_s']}s" for a in attempts)
+            print(f"CASCADE:{task}:{path}")
+        return text
+
+    @classmethod
+    def routing_stats(cls):
+        """Per-model cascade counters (calls, accepted, rejected, errors, latency, escalation rate)."""
+        return cls.routing.snapshot()
+
+    @classmethod
+    def governor_stats(cls):
+        """Token bucket and circuit state of every model this process has called."""
+        with cls._client_lock:
+            governors = dict(cls._governors)
+        return {model_id: g.snapshot() for model_id, g in governors.items() if g}
+
+    @classmethod
+    def cache_stats(cls):
+        """Hit/miss counters of the response cache (None when disabled)."""
+        return cls.cache.snapshot() if cls.cache else None
+
     @staticmethod
     @retry(
         stop=stop_after_attempt(3),
@@ -111,7 +389,7 @@ class BedrockAgent:
         Make an HTTP GET request with retry logic.
         Retries up to 3 times with exponential backoff on network errors.
         """
-        response = requests.get(url, timeout=timeout)
+        response = BedrockAgent.http.get(url, timeout=timeout)
         response.raise_for_status()
         return response
 
@@ -129,6 +407,6 @@ class BedrockAgent:
         Make an HTTP POST request with retry logic.
         Retries up to 3 times with exponential backoff on network errors.
         """
-        response = requests.post(url, json=json_data, timeout=timeout)
+        response = BedrockAgent.http.post(url, json=json_data, timeout=timeout)
         response.raise_for_status()
         return response
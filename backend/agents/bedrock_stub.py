@@ -0,0 +1,96 @@
+import time
+import threading
+
+
+class StubClientError(Exception):
+    """Raise from a responder to simulate a botocore ClientError, e.g. StubClientError("ThrottlingException")."""
+
+    def __init__(self, code, message="simulated"):
+        super().__init__(f"An error occurred ({code}): {message}")
+        self.response = {"Error": {"Code": code, "Message": message}}
+
+
+class StubEventStream:
+    """Iterable of converse_stream events that can be closed mid-way, like botocore's EventStream."""
+
+    def __init__(self, text, chunk_size=8, delay=0.0, usage=None, error_event=None):
+        self.text = text
+        # e.g. "internalServerException": sent in place of the rest of the stream after one chunk
+        self.error_event = error_event
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.usage = usage or {}
+        self.chunks_sent = 0
+        self.closed = False
+
+    def __iter__(self):
+        yield {"messageStart": {"role": "assistant"}}
+        yield {"contentBlockStart": {"start": {}, "contentBlockIndex": 0}}
+        for i in range(0, len(self.text), self.chunk_size):
+            if self.closed:
+                return
+            if self.delay:
+                time.sleep(self.delay)
+            self.chunks_sent += 1
+            yield {"contentBlockDelta": {"delta": {"text": self.text[i:i + self.chunk_size]}, "contentBlockIndex": 0}}
+            if self.error_event:
+                yield {self.error_event: {"message": "simulated"}}
+                return
+        yield {"contentBlockStop": {"contentBlockIndex": 0}}
+        yield {"messageStop": {"stopReason": "end_turn"}}
+        yield {"metadata": {"usage": self.usage, "metrics": {"latencyMs": 0}}}
+
+    @property
+    def total_chunks(self):
+        return (len(self.text) + self.chunk_size - 1) // self.chunk_size
+
+    def close(self):
+        self.closed = True
+
+
+class StubBedrockClient:
+    """
+    Local stand-in for the bedrock-runtime client (converse and converse_stream).
+
+    responder(prompt, model_id) returns the response text, or raises to simulate
+    a service error. Each call is recorded in self.calls; streams in self.streams.
+    stream_errors: exception event names (e.g. "throttlingException") that end the
+    next streams mid-way, one per stream.
+    """
+
+    def __init__(self, responder, chunk_size=8, delay=0.0, stream_errors=None):
+        self.responder = responder
+        self.stream_errors = list(stream_errors or [])
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.calls = []
+        self.streams = []
+        self._lock = threading.Lock()
+
+    def _respond(self, kind, modelId, messages):
+        prompt = messages[-1]["content"][0]["text"]
+        with self._lock:
+            self.calls.append({"kind": kind, "model_id": modelId, "prompt": prompt})
+        return self.responder(prompt, modelId)
+
+    @staticmethod
+    def _usage(prompt, text):
+        return {"inputTokens": len(prompt) // 4, "outputTokens": len(text) // 4,
+                "totalTokens": (len(prompt) + len(text)) // 4}
+
+    def converse(self, modelId, messages, system=None, inferenceConfig=None):
+        text = self._respond("converse", modelId, messages)
+        return {
+            "output": {"message": {"role": "assistant", "content": [{"text": text}]}},
+            "stopReason": "end_turn",
+            "usage": self._usage(messages[-1]["content"][0]["text"], text),
+        }
+
+    def converse_stream(self, modelId, messages, system=None, inferenceConfig=None):
+        text = self._respond("converse_stream", modelId, messages)
+        with self._lock:
+            error_event = self.stream_errors.pop(0) if self.stream_errors else None
+            stream = StubEventStream(text, self.chunk_size, self.delay,
+                                     self._usage(messages[-1]["content"][0]["text"], text), error_event)
+            self.streams.append(stream)
+        return {"stream": stream}
@@ -0,0 +1,327 @@
+import os
+import re
+import json
+import time
+import logging
+import threading
+
+try:
+    import fcntl
+except ImportError:  # not on POSIX: the governor only coordinates threads of one process
+    fcntl = None
+
+# Bedrock / botocore error codes that mean "slow down" rather than "broken request"
+THROTTLE_CODES = {
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "ServiceQuotaExceededException",
+    "ServiceUnavailableException",
+    "ModelNotReadyException",
+}
+
+
+# Server-side or network failures worth retrying; anything else (validation,
+# access denied, unknown model...) fails on the first attempt
+TRANSIENT_CODES = {
+    "InternalServerException",
+    "ModelStreamErrorException",
+    "ModelTimeoutException",
+    "RequestTimeout",
+    "RequestTimeoutException",
+}
+TRANSIENT_ERRORS = (
+    "EndpointConnectionError",
+    "ConnectTimeoutError",
+    "ReadTimeoutError",
+    "ConnectionClosedError",
+    "ConnectionError",
+    "TimeoutError",
+)
+
+
+class BedrockStreamError(Exception):
+    """An exception event inside a converse_stream response, shaped like a botocore ClientError."""
+
+    def __init__(self, event_name, message=""):
+        code = event_name[:1].upper() + event_name[1:]
+        super().__init__(f"Bedrock stream error {code}: {message}")
+        self.response = {"Error": {"Code": code, "Message": message}}
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a model whose circuit breaker is open."""
+
+    def __init__(self, model_id, retry_in):
+        super().__init__(f"Circuit open for {model_id}: throttled, retry in {retry_in:.0f}s")
+        self.model_id = model_id
+        self.retry_in = retry_in
+
+
+def unwrap_error(exc):
+    """The underlying exception of a tenacity RetryError (or exc itself)."""
+    last_attempt = getattr(exc, "last_attempt", None)
+    if last_attempt is not None and last_attempt.failed:
+        return last_attempt.exception()
+    return exc
+
+
+def is_throttle_error(exc):
+    """Whether an exception (possibly wrapped by tenacity) is a Bedrock throttle."""
+    exc = unwrap_error(exc)
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        code = response.get("Error", {}).get("Code")
+        if code in THROTTLE_CODES:
+            return True
+    return "Throttl" in type(exc).__name__ or "ThrottlingException" in str(exc)
+
+
+def _error_code(exc):
+    response = getattr(exc, "response", None)
+    if isinstance(response, dict):
+        return response.get("Error", {}).get("Code")
+    return None
+
+
+def is_transient_error(exc):
+    """Server errors, timeouts and dropped connections (not throttles)."""
+    exc = unwrap_error(exc)
+    if _error_code(exc) in TRANSIENT_CODES:
+        return True
+    return any(cls.__name__ in TRANSIENT_ERRORS for cls in type(exc).__mro__)
+
+
+def is_retryable(exc):
+    """Retry predicate for Bedrock calls: throttles and transient errors only."""
+    exc = unwrap_error(exc)
+    if isinstance(exc, CircuitOpenError):
+        return False
+    return is_throttle_error(exc) or is_transient_error(exc)
+
+
+class AdaptiveLimiter:
+    """
+    Concurrency limit that adapts to throttling (AIMD).
+
+    - Additive increase: +1 slot after `limit` consecutive successes (not
+      within the cooldown of a decrease)
+    - Multiplicative decrease: limit * decrease_factor on a throttle, at most
+      once per cooldown so a burst of throttled in-flight calls counts once
+    - Used as a context manager around each call: `with limiter: ...`
+    """
+
+    def __init__(self, initial=4, min_limit=1, max_limit=16, decrease_factor=0.5, cooldown=5.0,
+                 clock=time.monotonic):
+        self.min_limit = min_limit
+        self.max_limit = max(max_limit, min_limit)
+        self.limit = max(min_limit, min(initial, self.max_limit))
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.clock = clock
+        self.logger = logging.getLogger("AdaptiveLimiter")
+
+        self._cond = threading.Condition()
+        self._active = 0
+        self._successes = 0
+        self._last_decrease = None
+        self.stats = {"calls": 0, "throttles": 0, "increases": 0, "decreases": 0, "peak_limit": self.limit}
+
+    def acquire(self):
+        with self._cond:
+            while self._active >= self.limit:
+                self._cond.wait()
+            self._active += 1
+            self.stats["calls"] += 1
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._cond.notify()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
+        return False
+
+    def on_success(self):
+        with self._cond:
+            self._successes += 1
+            if self._last_decrease is not None and self.clock() - self._last_decrease < self.cooldown:
+                return
+            if self._successes >= self.limit and self.limit < self.max_limit:
+                self._successes = 0
+                self.limit += 1
+                self.stats["increases"] += 1
+                self.stats["peak_limit"] = max(self.stats["peak_limit"], self.limit)
+                self._cond.notify()
+
+    def on_throttle(self):
+        with self._cond:
+            self.stats["throttles"] += 1
+            self._successes = 0
+            now = self.clock()
+            if self._last_decrease is not None and now - self._last_decrease < self.cooldown:
+                return
+            self._last_decrease = now
+            new_limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+            if new_limit < self.limit:
+                self.stats["decreases"] += 1
+                self.logger.warning(f"Throttled: concurrency {self.limit} -> {new_limit}")
+                self.limit = new_limit
+
+    @property
+    def active(self):
+        return self._active
+
+    def snapshot(self):
+        with self._cond:
+            return {**self.stats, "limit": self.limit, "active": self._active}
+
+
+class RateGovernor:
+    """
+    Token bucket and circuit breaker for one model, shared by every agent process
+    on the host.
+
+    - State lives in <state_dir>/<model>.json, read-modify-written under an
+      exclusive fcntl lock on <model>.lock, so N processes together stay
+      within `rate` calls per second (bursts up to `burst`)
+    - Breaker: `threshold` throttles in a row open the circuit for `cooldown`
+      seconds (doubling while it keeps tripping, up to max_cooldown); callers
+      fail fast with CircuitOpenError instead of piling onto a throttled model
+    - Half-open: once the cooldown passes, one caller probes; a success closes
+      the circuit, a throttle reopens it
+    """
+
+    def __init__(self, model_id, state_dir, rate=2.0, burst=4, threshold=3, cooldown=30.0,
+                 max_cooldown=300.0, max_wait=60.0, clock=time.time, sleep=time.sleep):
+        self.model_id = model_id
+        self.rate = rate
+        self.burst = burst
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.max_wait = max_wait
+        self.clock = clock
+        self.sleep = sleep
+        self.logger = logging.getLogger("RateGovernor")
+
+        os.makedirs(state_dir, exist_ok=True)
+        name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_id)
+        self.state_path = os.path.join(state_dir, f"{name}.json")
+        self.lock_path = os.path.join(state_dir, f"{name}.lock")
+        self._thread_lock = threading.Lock()
+        self.stats = {"acquired": 0, "waited_s": 0.0, "fast_failures": 0, "throttles": 0, "trips": 0}
+
+    @classmethod
+    def from_env(cls, model_id):
+        """Governor configured by BEDROCK_RATE / BEDROCK_BURST / BEDROCK_BREAKER_*, or None when disabled."""
+        if os.getenv("BEDROCK_GOVERNOR", "true").lower() == "false":
+            return None
+        return cls(
+            model_id,
+            os.getenv("BEDROCK_GOVERNOR_DIR", os.path.join("/tmp", "night-agent-governor")),
+            rate=float(os.getenv("BEDROCK_RATE", "2")),
+            burst=int(os.getenv("BEDROCK_BURST", "4")),
+            threshold=int(os.getenv("BEDROCK_BREAKER_THRESHOLD", "3")),
+            cooldown=float(os.getenv("BEDROCK_BREAKER_COOLDOWN", "30")),
+        )
+
+    def _update(self, fn):
+        """Apply fn(state, now) to the shared state under the cross-process lock; returns fn's result."""
+        with self._thread_lock, open(self.lock_path, "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                try:
+                    with open(self.state_path, "r") as f:
+                        state = json.load(f)
+                except (OSError, ValueError):
+                    state = {"tokens": float(self.burst), "updated": self.clock(), "throttles": 0,
+                             "open_until": 0.0, "open_for": 0.0, "probe_until": 0.0}
+                now = self.clock()
+                state["tokens"] = min(float(self.burst), state["tokens"] + (now - state["updated"]) * self.rate)
+                state["updated"] = now
+                result = fn(state, now)
+                tmp = f"{self.state_path}.{os.getpid()}.tmp"
+                with open(tmp, "w") as f:
+                    json.dump(state, f)
+                os.replace(tmp, self.state_path)
+                return result
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def acquire(self):
+        """
+        Take one token, sleeping (outside the lock) until one is free.
+        Raises CircuitOpenError while the circuit is open or another caller is probing.
+        """
+        waited = 0.0
+
+        def take(state, now):
+            if now < state["open_until"]:
+                return ("open", state["open_until"] - now)
+            if state["open_until"] and now < state["probe_until"]:
+                return ("open", state["probe_until"] - now)
+            # Tolerance: refill arithmetic can land a hair below a whole token
+            if state["tokens"] >= 1 - 1e-9:
+                state["tokens"] = max(0.0, state["tokens"] - 1)
+                if state["open_until"]:
+                    # Cooldown over: this caller is the half-open probe
+                    state["probe_until"] = now + max(self.cooldown, 1.0)
+                return ("ok", 0.0)
+            return ("wait", max((1 - state["tokens"]) / self.rate, 0.001))
+
+        while True:
+            outcome, delay = self._update(take)
+            if outcome == "ok":
+                self.stats["acquired"] += 1
+                self.stats["waited_s"] += waited
+                return waited
+            if outcome == "open":
+                self.stats["fast_failures"] += 1
+                raise CircuitOpenError(self.model_id, delay)
+            if waited + delay > self.max_wait:
+                # Grossly oversubscribed: treat like a throttle rather than queue forever
+                self.stats["fast_failures"] += 1
+                raise CircuitOpenError(self.model_id, delay)
+            self.sleep(delay)
+            waited += delay
+
+    def on_success(self):
+        def success(state, now):
+            state["throttles"] = 0
+            if state["open_until"]:
+                self.logger.info(f"Circuit closed for {self.model_id}")
+            state["open_until"] = 0.0
+            state["open_for"] = 0.0
+            state["probe_until"] = 0.0
+
+        self._update(success)
+
+    def on_throttle(self):
+        def throttled(state, now):
+            self.stats["throttles"] += 1
+            state["throttles"] += 1
+            state["tokens"] = 0.0  # every process slows down, not just this one
+            probing = state["open_until"] and now >= state["open_until"]
+            if probing or state["throttles"] >= self.threshold:
+                state["open_for"] = min(self.max_cooldown, state["open_for"] * 2 if probing else self.cooldown)
+                state["open_until"] = now + state["open_for"]
+                state["probe_until"] = 0.0
+                self.stats["trips"] += 1
+                self.logger.warning(f"Circuit open for {self.model_id}: {state['throttles']} throttles, "
+                                    f"failing fast for {state['open_for']:.0f}s")
+
+        self._update(throttled)
+
+    def snapshot(self):
+        state = self._update(lambda state, now: {
+            "tokens": round(state["tokens"], 2),
+            "circuit": "open" if now < state["open_until"] else ("half-open" if state["open_until"] else "closed"),
+        })
+        return {**self.stats, "waited_s": round(self.stats["waited_s"], 3), **state}
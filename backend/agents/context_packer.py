@@ -0,0 +1,310 @@
+import re
+import ast
+import math
+import logging
+
+# Identifier-ish pieces of code/prose; used for token estimates and hint matching
+_PIECE = re.compile(r"[A-Za-z_][A-Za-z0-9_]*|\d+|[^\sA-Za-z0-9_]")
+_IDENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]{2,}")
+
+# Stack trace frames: Node ("at Foo.bar (src/x.ts:12:5)"), Python ('File "x.py", line 12, in bar'),
+# Java/Go-ish ("x.go:12", "Foo.java:12")
+_NODE_FRAME = re.compile(r"at\s+(?:async\s+)?([\w$.<>]+)?\s*\(?([^\s():]+\.\w+):(\d+)(?::\d+)?\)?")
+_PY_FRAME = re.compile(r'File "([^"]+)", line (\d+), in (\w+)')
+_FILE_LINE = re.compile(r"([\w./-]+\.(?:py|ts|js|tsx|jsx|go|java|rb|rs|kt|cs)):(\d+)")
+
+# Declarations for brace languages (TS/JS/Java/Go/C#...), named group "name"
+_DECLARATION = re.compile(
+    r"^\s*(?:export\s+)?(?:default\s+)?(?:public\s+|private\s+|protected\s+|static\s+|async\s+|readonly\s+)*"
+    r"(?:function\s*\*?\s*(?P<fn>[\w$]+)"
+    r"|class\s+(?P<cls>[\w$]+)"
+    r"|func\s+(?:\([^)]*\)\s*)?(?P<go>\w+)"
+    r"|(?:const|let|var)\s+(?P<arrow>[\w$]+)\s*=\s*(?:async\s*)?(?:\([^)]*\)|[\w$]+)\s*=>"
+    r"|(?P<method>[\w$]+)\s*\([^;]*\)\s*(?::\s*[^{;]+)?\{)"
+)
+_NOT_METHODS = {"if", "for", "while", "switch", "catch", "return", "function", "else", "with"}
+
+STOPWORDS = {
+    "the", "and", "for", "with", "this", "that", "from", "when", "error", "errors", "into", "not",
+    "are", "was", "has", "have", "should", "which", "issue", "fix", "file", "line", "null", "undefined",
+    "true", "false", "return", "const", "let", "var", "function", "class", "import", "export",
+}
+
+
+def estimate_tokens(text):
+    """
+    Deterministic token estimate close to BPE tokenizers on code:
+    one token per punctuation mark, ~4 characters per token for words and numbers.
+    """
+    total = 0
+    for piece in _PIECE.findall(text):
+        total += 1 if len(piece) <= 4 else math.ceil(len(piece) / 4)
+    return total + text.count("\n")
+
+
+class Span:
+    """A contiguous range of lines (1-based, inclusive) in one file."""
+
+    def __init__(self, path, start, end, name=None, kind="block"):
+        self.path = path
+        self.start = start
+        self.end = end
+        self.name = name
+        self.kind = kind
+        self.score = 0.0
+        self.reasons = []
+
+    def __repr__(self):
+        return f"Span({self.path}:{self.start}-{self.end} {self.kind} {self.name} score={self.score:.1f})"
+
+
+class Hints:
+    """What the root cause, suggested fix and logs point at: symbols, identifiers, file:line frames."""
+
+    def __init__(self, text):
+        self.frames = []  # (path, line, function or None)
+        self.symbols = set()
+        for m in _NODE_FRAME.finditer(text):
+            func, path, line = m.group(1), m.group(2), int(m.group(3))
+            self.frames.append((path, line, func.split(".")[-1] if func else None))
+            if func:
+                self.symbols.update(p for p in func.split(".") if p and p != "<anonymous>")
+        for m in _PY_FRAME.finditer(text):
+            self.frames.append((m.group(1), int(m.group(2)), m.group(3)))
+            self.symbols.add(m.group(3))
+        for m in _FILE_LINE.finditer(text):
+            self.frames.append((m.group(1), int(m.group(2)), None))
+        # Calls and dotted names in prose: "UserService.create()", "processRequest"
+        for m in re.finditer(r"([A-Za-z_][\w$]*(?:\.[A-Za-z_][\w$]*)*)\s*\(", text):
+            self.symbols.update(m.group(1).split("."))
+        for m in re.finditer(r"`([^`]+)`", text):
+            self.symbols.update(_IDENT.findall(m.group(1)))
+        self.identifiers = {w.lower() for w in _IDENT.findall(text)} - STOPWORDS
+        self.symbols = {s for s in self.symbols if len(s) > 2 and s.lower() not in STOPWORDS}
+
+    def frame_lines(self, path):
+        """Lines of `path` mentioned in stack frames (paths match on suffix)."""
+        lines = set()
+        for frame_path, line, _ in self.frames:
+            if path.endswith(frame_path.lstrip("./")) or frame_path.endswith(path):
+                lines.add(line)
+        return lines
+
+
+class PackedContext:
+    def __init__(self, text, tokens, budget, spans, files):
+        self.text = text
+        self.tokens = tokens
+        self.budget = budget
+        self.spans = spans
+        self.files = files
+
+    def report(self):
+        return {
+            "tokens": self.tokens,
+            "budget": self.budget,
+            "files": len(self.files),
+            "spans": [f"{s.path}:{s.start}-{s.end}" + (f" ({s.name})" if s.name else "") for s in self.spans],
+        }
+
+
+class ContextPacker:
+    """
+    Picks the source spans most relevant to a root cause and packs them into a token budget.
+
+    - Spans: Python functions/classes via ast; functions/classes/methods of brace
+      languages via declaration matching and brace balancing; fixed windows otherwise
+    - Ranking: stack-trace line inside the span > symbol named in the root cause /
+      logs > identifier overlap; smaller spans win ties
+    - Small files are offered whole; spans are merged per file and rendered with line numbers
+    """
+
+    def __init__(self, budget_tokens=6000, window_lines=60, whole_file_tokens=600, context_lines=3):
+        self.budget = budget_tokens
+        self.window_lines = window_lines
+        self.whole_file_tokens = whole_file_tokens
+        self.context_lines = context_lines
+        self.logger = logging.getLogger("ContextPacker")
+
+    # Span extraction -------------------------------------------------------------
+
+    def spans_for(self, path, content):
+        lines = content.splitlines()
+        if not lines:
+            return []
+        spans = []
+        if path.endswith(".py"):
+            spans = self._python_spans(path, content)
+        if not spans:
+            spans = self._brace_spans(path, lines)
+        covered = set()
+        for span in spans:
+            covered.update(range(span.start, span.end + 1))
+        # Top-level code between declarations (imports, config, module constants) in windows
+        start = None
+        for n in range(1, len(lines) + 2):
+            uncovered = n <= len(lines) and n not in covered
+            if uncovered and start is None:
+                start = n
+            elif not uncovered and start is not None:
+                for s in range(start, n, self.window_lines):
+                    end = min(n - 1, s + self.window_lines - 1)
+                    if any(line.strip() for line in lines[s - 1:end]):
+                        spans.append(Span(path, s, end, kind="module"))
+                start = None
+        return spans
+
+    def _python_spans(self, path, content):
+        try:
+            tree = ast.parse(content)
+        except SyntaxError:
+            return []
+        spans = []
+        for node in ast.walk(tree):
+            if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                start = min([node.lineno] + [d.lineno for d in node.decorator_list])
+                kind = "class" if isinstance(node, ast.ClassDef) else "function"
+                if kind == "class":
+                    # The class span is only its header up to the first method
+                    body_starts = [n.lineno for n in node.body if isinstance(n, (ast.FunctionDef, ast.AsyncFunctionDef))]
+                    end = (min(body_starts) - 1) if body_starts else node.end_lineno
+                else:
+                    end = node.end_lineno
+                spans.append(Span(path, start, max(start, end), node.name, kind))
+        # Nested functions are covered by their parent; keep the outermost
+        return [s for s in spans if not any(o is not s and o.kind == "function" and o.start <= s.start and s.end <= o.end
+                                            for o in spans)]
+
+    def _brace_spans(self, path, lines):
+        spans = []
+        n = 0
+        while n < len(lines):
+            m = _DECLARATION.match(lines[n])
+            name = None
+            if m:
+                name = m.group("fn") or m.group("cls") or m.group("go") or m.group("arrow") or m.group("method")
+            if not name or name in _NOT_METHODS:
+                n += 1
+                continue
+            end = self._block_end(lines, n)
+            kind = "class" if m.group("cls") else "function"
+            if kind == "class":
+                # Descend into the class so each method is its own span
+                spans.append(Span(path, n + 1, n + 1, name, "class"))
+                n += 1
+                continue
+            spans.append(Span(path, n + 1, end + 1, name, kind))
+            n = end + 1
+        return spans
+
+    @staticmethod
+    def _block_end(lines, start, limit=400):
+        """Index of the line closing the block opened at or after `start` (brace balancing)."""
+        depth = 0
+        opened = False
+        for i in range(start, min(len(lines), start + limit)):
+            code = re.sub(r"(['\"`])(?:\\.|(?!\1).)*\1", "", lines[i].split("//")[0])
+            depth += code.count("{") - code.count("}")
+            opened = opened or "{" in code
+            if opened and depth <= 0:
+                return i
+        return min(len(lines), start + limit) - 1
+
+    # Ranking -----------------------------------------------------------------------
+
+    def rank(self, spans, lines_by_path, hints):
+        for span in spans:
+            frame_lines = hints.frame_lines(span.path)
+            if any(span.start <= line <= span.end for line in frame_lines):
+                span.score += 100
+                span.reasons.append("stack frame")
+            if span.name and span.name in hints.symbols:
+                span.score += 50
+                span.reasons.append("named")
+            body = "\n".join(lines_by_path[span.path][span.start - 1:span.end])
+            overlap = hints.identifiers & {w.lower() for w in _IDENT.findall(body)}
+            if overlap:
+                span.score += min(30, 3 * len(overlap))
+                span.reasons.append(f"{len(overlap)} identifiers")
+            if span.kind == "module" and span.start == 1:
+                span.score += 2  # imports help the model write a correct patch
+            span.tokens = estimate_tokens(body)
+            # Prefer compact spans among equals
+            span.score -= span.tokens / 1000.0
+        return sorted(spans, key=lambda s: (-s.score, s.path, s.start))
+
+    # Packing -----------------------------------------------------------------------
+
+    def pack(self, file_contents, hint_text):
+        """
+        Select spans from {path: content} for the hints and render them within the budget.
+        Returns a PackedContext (text, tokens used, selected spans).
+        """
+        hints = Hints(hint_text)
+        lines_by_path = {path: content.splitlines() for path, content in file_contents.items()}
+
+        candidates = []
+        for path, content in file_contents.items():
+            tokens = estimate_tokens(content)
+            if tokens <= self.whole_file_tokens:
+                whole = Span(path, 1, max(1, len(lines_by_path[path])), kind="file")
+                candidates.append(whole)
+            else:
+                candidates.extend(self.spans_for(path, content))
+        ranked = self.rank(candidates, lines_by_path, hints)
+        relevant = any(span.reasons for span in ranked)
+        if not relevant:
+            # Nothing matched the hints: fill the budget from the top of each file
+            ranked.sort(key=lambda s: (s.path, s.start))
+
+        selected = []
+        for span in ranked:
+            if relevant and not span.reasons and any(s.reasons for s in selected):
+                break  # unrelated code is not worth the tokens
+            start = max(1, span.start - self.context_lines)
+            end = min(len(lines_by_path[span.path]), span.end + self.context_lines)
+            candidate = Span(span.path, start, end, span.name, span.kind)
+            candidate.score, candidate.reasons = span.score, span.reasons
+            trial = self._merge(selected + [candidate])
+            if self._render_tokens(trial, lines_by_path) > self.budget:
+                continue
+            selected.append(candidate)
+
+        merged = self._merge(selected)
+        text = self._render(merged, lines_by_path)
+        return PackedContext(text, estimate_tokens(text) if text else 0, self.budget, merged,
+                             sorted({s.path for s in merged}))
+
+    @staticmethod
+    def _merge(spans):
+        """Merge overlapping/adjacent spans per file, ordered by file then line."""
+        merged = []
+        for span in sorted(spans, key=lambda s: (s.path, s.start)):
+            last = merged[-1] if merged else None
+            if last and last.path == span.path and span.start <= last.end + 1:
+                if span.end > last.end:
+                    last.end = span.end
+                if span.name and span.name not in (last.name or "").split(", "):
+                    last.name = f"{last.name}, {span.name}" if last.name else span.name
+                continue
+            copy = Span(span.path, span.start, span.end, span.name, span.kind)
+            copy.score = span.score
+            merged.append(copy)
+        return merged
+
+    def _render(self, spans, lines_by_path):
+        out = []
+        current = None
+        for span in spans:
+            total = len(lines_by_path[span.path])
+            if span.path != current:
+                out.append(f"\n--- {span.path} ({total} lines) ---")
+                current = span.path
+            elif out:
+                out.append("...")
+            for n in range(span.start, span.end + 1):
+                out.append(f"{n:>5}| {lines_by_path[span.path][n - 1]}")
+        return "\n".join(out).lstrip("\n")
+
+    def _render_tokens(self, spans, lines_by_path):
+        return estimate_tokens(self._render(spans, lines_by_path))
@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+
+
+class LLMCache:
+    """
+    Content-addressed on-disk cache for LLM responses.
+
+    - Key: sha256 of (model_id, system prompt, prompt, inference config)
+    - One JSON file per entry under <directory>/<key[:2]>/<key>.json
+    - TTL: entries older than ttl_seconds are treated as misses and removed
+    - Size bound: least recently used entries (file mtime, touched on hit)
+      are evicted once the directory grows past max_bytes
+    - Safe to share between threads and between processes (atomic renames)
+    """
+
+    def __init__(self, directory, ttl_seconds=7 * 24 * 3600, max_bytes=256 * 1024 * 1024):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.logger = logging.getLogger("LLMCache")
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "expired": 0, "evictions": 0}
+
+        os.makedirs(directory, exist_ok=True)
+        self._size = sum(size for _, _, size in self._entries())
+
+    @classmethod
+    def from_env(cls):
+        """Cache configured by LLM_CACHE_DIR / LLM_CACHE_TTL / LLM_CACHE_MAX_MB, or None when disabled."""
+        directory = os.getenv("LLM_CACHE_DIR")
+        if not directory:
+            return None
+        return cls(
+            directory,
+            ttl_seconds=float(os.getenv("LLM_CACHE_TTL", str(7 * 24 * 3600))),
+            max_bytes=int(float(os.getenv("LLM_CACHE_MAX_MB", "256")) * 1024 * 1024),
+        )
+
+    @staticmethod
+    def make_key(model_id, system_prompt, prompt, inference_config=None, tag=None):
+        """tag names a stop condition: text cut off by it is stored apart from complete responses."""
+        fields = {"model": model_id, "system": system_prompt, "prompt": prompt, "config": inference_config or {}}
+        if tag:
+            fields["tag"] = tag
+        material = json.dumps(fields, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        """Cached response text, or None on a miss (or an expired entry)."""
+        path = self._path(key)
+        try:
+            with open(path, "r") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self._count("misses")
+            return None
+
+        if self.ttl_seconds and time.time() - entry.get("created", 0) > self.ttl_seconds:
+            self._remove(path)
+            self._count("expired")
+            self._count("misses")
+            return None
+
+        try:
+            os.utime(path)  # recency for LRU eviction
+        except OSError:
+            pass
+        self._count("hits")
+        return entry.get("response")
+
+    def put(self, key, response, model_id=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps({"created": time.time(), "model": model_id, "response": response})
+
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                f.write(data)
+            old_size = os.path.getsize(path) if os.path.exists(path) else 0
+            os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.warning(f"Failed to write cache entry: {e}")
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+
+        with self._lock:
+            self.stats["writes"] += 1
+            self._size += len(data) - old_size
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def evict(self):
+        """Drop least recently used entries until the cache is back under 90% of max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, _, size in entries)
+        target = self.max_bytes * 0.9
+        evicted = 0
+        for _, path, size in entries:
+            if total <= target:
+                break
+            if self._remove(path):
+                total -= size
+                evicted += 1
+        with self._lock:
+            self._size = total
+            self.stats["evictions"] += evicted
+        return evicted
+
+    def _entries(self):
+        """(mtime, path, size) of every cache file"""
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                yield st.st_mtime, path, st.st_size
+
+    def _remove(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return False
+        with self._lock:
+            self._size -= size
+        return True
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def snapshot(self):
+        with self._lock:
+            lookups = self.stats["hits"] + self.stats["misses"]
+            return {
+                **self.stats,
+                "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else 0.0,
+                "size_bytes": self._size,
+            }
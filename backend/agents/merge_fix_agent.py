@@ -3,7 +3,7 @@ import sys
 import logging
 import os
 import subprocess
-import requests
+from worktree_pool import WorktreePool, sandbox_enabled
 
 class MergeFixAgent:
     def __init__(self):
@@ -14,6 +14,10 @@ class MergeFixAgent:
     def run(self, fix_id, repo_path, branch_name):
         self.logger.info(f"Merging fix {fix_id} from {branch_name} into main at {repo_path}")
 
+        if sandbox_enabled():
+            self.run_sandboxed(fix_id, repo_path, branch_name)
+            return
+
         try:
             # 1. Checkout Main
             subprocess.run(["git", "checkout", "main"], cwd=repo_path, check=True)
@@ -38,6 +42,66 @@ class MergeFixAgent:
             self.logger.error(f"Merge failed: {e}")
             sys.exit(1)
 
+    def run_sandboxed(self, fix_id, repo_path, branch_name, attempts=3):
+        """
+        Merge in a pooled worktree detached at the target branch (FIX_SANDBOX=worktree),
+        then advance the branch: fast-forward where it is checked out, otherwise an
+        atomic update-ref. If another merge moved the branch meanwhile, merge again.
+        """
+        pool = WorktreePool.from_env(repo_path)
+        target = pool.default_branch()
+
+        def git(*args, cwd=repo_path, check=True):
+            return subprocess.run(["git", *args], cwd=cwd, check=check, capture_output=True, text=True)
+
+        for attempt in range(attempts):
+            # old: the branch tip the update-ref below expects; start: what the merge builds on
+            old = git("rev-parse", f"refs/heads/{target}").stdout.strip()
+            base = pool.base_commit(target)
+            start = old
+            if git("merge-base", "--is-ancestor", old, base, check=False).returncode == 0:
+                start = base  # remote is ahead: same as the pull in the shared checkout
+
+            path, lock = pool.detached(start)
+            try:
+                self.logger.info(f"Merging {branch_name} in sandbox {path}...")
+                # --no-ff preserves history of the feature branch
+                git("merge", "--no-ff", "-m", f"Merge branch '{branch_name}' into {target}", branch_name, cwd=path)
+                merged = git("rev-parse", "HEAD", cwd=path).stdout.strip()
+            except subprocess.CalledProcessError as e:
+                self.logger.error(f"Merge failed: {e.stderr or e}")
+                pool.release(path, lock)
+                sys.exit(1)
+            pool.release(path, lock)
+
+            checkout = self._checkout_of(repo_path, target)
+            if checkout:
+                # The branch is checked out (e.g. the main checkout): move it with its working tree
+                advanced = git("merge", "--ff-only", merged, cwd=checkout, check=False)
+            else:
+                advanced = git("update-ref", f"refs/heads/{target}", merged, old, check=False)
+            if advanced.returncode == 0:
+                self.logger.info(f"Merge successful: {target} -> {merged[:12]}")
+                self.logger.info("(Push skipped for safety in demo mode, uncomment in agent to enable)")
+                return
+            self.logger.warning(f"{target} moved during merge (attempt {attempt + 1}): {advanced.stderr.strip()}")
+
+        self.logger.error(f"Merge failed: could not advance {target}")
+        sys.exit(1)
+
+    @staticmethod
+    def _checkout_of(repo_path, branch):
+        """Path of the worktree that has branch checked out, or None."""
+        listing = subprocess.run(["git", "worktree", "list", "--porcelain"], cwd=repo_path,
+                                 capture_output=True, text=True).stdout
+        path = None
+        for line in listing.splitlines():
+            if line.startswith("worktree "):
+                path = line[len("worktree "):]
+            elif line == f"branch refs/heads/{branch}":
+                return path
+        return None
+
 if __name__ == "__main__":
     if len(sys.argv) < 3:
         print("Usage: python merge_fix_agent.py <fix_id> <repo_path> <branch>")
@@ -0,0 +1,159 @@
+import os
+import json
+import time
+import logging
+import subprocess
+import threading
+from streaming import first_json_value, DiffHunkChecker
+
+# Cheapest first; an agent's own model (e.g. mistral_large_3) is always the last tier
+DEFAULT_CASCADE = "ministral_3_14b,mistral_large_3"
+
+
+def cascade_tiers(model_mapping, ceiling_id):
+    """
+    Model ids to try in order, from MODEL_CASCADE (comma-separated MODEL_MAPPING names).
+    Tiers listed after the agent's own model are dropped; an agent whose model is
+    not listed (or MODEL_CASCADE=false) uses only its own model.
+    """
+    names = os.getenv("MODEL_CASCADE", DEFAULT_CASCADE)
+    if names.lower() in ("", "false", "off"):
+        return [ceiling_id]
+    tiers = []
+    for name in names.split(","):
+        model_id = model_mapping.get(name.strip(), name.strip())
+        if model_id == ceiling_id:
+            return tiers + [ceiling_id]
+        if model_id and model_id not in tiers:
+            tiers.append(model_id)
+    # The agent's model is not part of the cascade: use it alone
+    return [ceiling_id]
+
+
+def json_check(required=(), min_confidence=None):
+    """
+    Output check for JSON answers: parses, has the required non-empty fields and,
+    when min_confidence is set, a self-reported "confidence" at or above it.
+    Returns a check(text) -> reason or None.
+    """
+    def check(text):
+        try:
+            value = first_json_value(text.replace("\n", " "))
+        except ValueError as e:
+            return f"invalid JSON ({e})"
+        if not isinstance(value, dict):
+            return "not a JSON object"
+        missing = [field for field in required if not value.get(field)]
+        if missing:
+            return f"missing {', '.join(missing)}"
+        if min_confidence is not None:
+            try:
+                confidence = float(value.get("confidence"))
+            except (TypeError, ValueError):
+                return "no confidence reported"
+            if confidence < min_confidence:
+                return f"confidence {confidence:.2f} < {min_confidence:.2f}"
+        return None
+
+    check.__name__ = "json:" + ",".join(required)
+    return check
+
+
+def patch_applies(patch, file_contents, repo_path=None):
+    """
+    None if the patch applies, else the reason. Uses `git apply --check` when
+    repo_path is a git checkout, otherwise matches hunks against file_contents.
+    """
+    if not patch or not (patch.startswith("diff --git") or patch.startswith("---")):
+        return "not a unified diff"
+    if repo_path and os.path.isdir(os.path.join(repo_path, ".git")):
+        result = subprocess.run(
+            ["git", "apply", "--check", "-"],
+            cwd=repo_path, input=patch + "\n", capture_output=True, text=True,
+        )
+        if result.returncode != 0:
+            return f"git apply --check failed: {result.stderr.strip()[:200]}"
+        return None
+    problems = DiffHunkChecker(file_contents).finish(patch)
+    return "; ".join(problems) if problems else None
+
+
+def merge_check(original, patch, path=None):
+    """
+    Output check for a file rewritten by the model to include a patch: every
+    line the patch adds (to `path`, if given) is present and the file has not
+    been truncated. Returns a check(content) -> reason or None.
+    """
+    added = []
+    current = None
+    for line in patch.splitlines():
+        if line.startswith("+++ "):
+            current = line[4:].strip()
+            current = current[2:] if current.startswith("b/") else current
+        elif line.startswith("+") and line[1:].strip() and (path is None or current == path):
+            added.append(line[1:].strip())
+    original_lines = len(original.splitlines())
+
+    def check(content):
+        lines = {line.strip() for line in content.splitlines()}
+        missing = [line for line in added if line not in lines]
+        if missing:
+            return f"{len(missing)} added lines missing (e.g. {missing[0][:60]!r})"
+        if len(content.splitlines()) < original_lines // 2:
+            return "file truncated"
+        return None
+
+    check.__name__ = "merge"
+    return check
+
+
+class CascadeStats:
+    """
+    Per-model counters for cascade routing: calls, accepted answers, answers
+    rejected by the check, failed calls and latency.
+
+    Thread-safe; with MODEL_CASCADE_LOG set every routed call is also appended
+    there as one JSON line, so runs from many processes can be tuned together.
+    """
+
+    def __init__(self, log_path=None):
+        self.log_path = log_path
+        self._lock = threading.Lock()
+        self._models = {}
+
+    @classmethod
+    def from_env(cls):
+        return cls(os.getenv("MODEL_CASCADE_LOG") or None)
+
+    def record(self, task, attempts):
+        """attempts: [{"model", "latency_s", "outcome": accepted|rejected|error, "reason"}]"""
+        with self._lock:
+            for attempt in attempts:
+                stats = self._models.setdefault(attempt["model"], {
+                    "calls": 0, "accepted": 0, "rejected": 0, "errors": 0, "latency_s": 0.0,
+                })
+                stats["calls"] += 1
+                stats["latency_s"] += attempt["latency_s"]
+                key = {"accepted": "accepted", "rejected": "rejected"}.get(attempt["outcome"], "errors")
+                stats[key] += 1
+            if self.log_path:
+                line = json.dumps({"ts": time.time(), "task": task, "attempts": attempts})
+                try:
+                    with open(self.log_path, "a") as f:
+                        f.write(line + "\n")
+                except OSError as e:
+                    logging.getLogger("CascadeStats").warning(f"Could not write {self.log_path}: {e}")
+
+    def snapshot(self):
+        with self._lock:
+            models = {}
+            for model_id, stats in self._models.items():
+                calls = stats["calls"]
+                models[model_id] = {
+                    **stats,
+                    "latency_s": round(stats["latency_s"], 3),
+                    "avg_latency_s": round(stats["latency_s"] / calls, 3) if calls else None,
+                    # Share of calls whose answer was not used (the next tier was tried, if any)
+                    "escalation_rate": round((stats["rejected"] + stats["errors"]) / calls, 3) if calls else None,
+                }
+            return models
@@ -3,8 +3,11 @@ import os
 import json
 import logging
 import sys
-import requests
 from bedrock_agent import BedrockAgent
+from context_packer import ContextPacker, estimate_tokens
+from streaming import DiffHunkChecker
+from model_router import patch_applies
+from repo_index import open_index
 
 class ProposeFixAgent(BedrockAgent):
     """
@@ -16,6 +19,10 @@ class ProposeFixAgent(BedrockAgent):
         super().__init__(model_name="mistral_large_3")
         self.api_url = os.getenv("API_URL", "http://localhost:3001/api/internal")
         self.repo_path = os.getenv("REPO_PATH", "/Users/apple/Development/projects/the-night-agent")
+        # Source context is packed into this many (estimated) tokens
+        self.token_budget = int(os.getenv("PROPOSE_TOKEN_BUDGET", "6000"))
+        self.packer = ContextPacker(budget_tokens=self.token_budget)
+        self.index = open_index(self.repo_path) if os.getenv("REPO_INDEX", "true").lower() != "false" else None
 
     def run(self, anomaly_id):
         """
@@ -28,7 +35,7 @@ class ProposeFixAgent(BedrockAgent):
         self.logger.info(f"Fetching anomaly {anomaly_id}...")
         
         try:
-            res = requests.get(f"{self.api_url}/anomalies/{anomaly_id}", timeout=10)
+            res = self.http.get(f"{self.api_url}/anomalies/{anomaly_id}", timeout=10)
             if not res.ok:
                 self.logger.error(f"Failed to fetch anomaly: {res.status_code}")
                 return
@@ -50,6 +57,9 @@ class ProposeFixAgent(BedrockAgent):
         
         self.logger.info(f"Proposing fix for: {root_cause[:50]}...")
         
+        if self.index:
+            files = self._resolve_files(files, root_cause, suggested_fix, anomaly)
+
         # Read source file contents for context
         file_contents = self._read_source_files(files)
         
@@ -61,10 +71,26 @@ class ProposeFixAgent(BedrockAgent):
         else:
             self.logger.error("Failed to generate patch")
 
+    def _resolve_files(self, files: list, root_cause: str, suggested_fix: str, anomaly: dict) -> list:
+        """Map LLM-guessed paths onto real ones and add files the index locates from the logs."""
+        resolved = []
+        for file_path in files:
+            real = self.index.resolve_path(file_path)
+            if real and real not in resolved:
+                resolved.append(real)
+            elif not real:
+                self.logger.info(f"Index: no file matches {file_path}")
+        text = "\n".join([root_cause, suggested_fix, anomaly.get('message') or '', json.dumps(anomaly.get('logs', ''))])
+        for file_path in self.index.relevant_files(text, limit=5):
+            if file_path not in resolved:
+                resolved.append(file_path)
+        self.logger.info(f"Index: {len(resolved)} candidate files ({len(files)} suggested)")
+        return resolved
+
     def _read_source_files(self, files: list) -> dict:
         """Read contents of relevant source files."""
         contents = {}
-        for file_path in files[:5]:  # Limit to 5 files to avoid token limits
+        for file_path in files[:10]:  # The packer keeps the prompt within budget
             full_path = os.path.join(self.repo_path, file_path)
             try:
                 if os.path.exists(full_path):
@@ -78,12 +104,17 @@ class ProposeFixAgent(BedrockAgent):
     def _generate_fix(self, root_cause: str, suggested_fix: str, files: list, file_contents: dict, anomaly: dict) -> str:
         """Generate a unified diff patch using Bedrock LLM."""
         
-        # Build file context
-        file_context = ""
-        for path, content in file_contents.items():
-            # Truncate large files
-            truncated = content[:3000] + "\n... (truncated)" if len(content) > 3000 else content
-            file_context += f"\n--- {path} ---\n{truncated}\n"
+        # Pack the spans the root cause, fix and logs point at (stack frames, named
+        # functions, shared identifiers) into the token budget
+        hint_text = "\n".join([
+            root_cause,
+            suggested_fix,
+            json.dumps(anomaly.get('logs', '')),
+            json.dumps(anomaly.get('evidence', {})),
+            anomaly.get('message') or '',
+        ])
+        packed = self.packer.pack(file_contents, hint_text)
+        file_context = packed.text
         
         prompt = f"""You are a Senior Software Engineer fixing a production issue.
 
@@ -110,6 +141,7 @@ RULES:
 3. Include proper file paths (a/path and b/path)
 4. Be minimal - only change what's necessary
 5. Do NOT wrap in markdown code blocks
+6. Source lines are shown as "  123| code"; the number and "| " are NOT part of the file
 
 EXAMPLE FORMAT:
 diff --git a/src/service.ts b/src/service.ts
@@ -122,12 +154,43 @@ diff --git a/src/service.ts b/src/service.ts
  }}
 """
         
-        response = self.invoke(prompt, system_prompt="You are an expert software engineer. Output only valid unified diff patches.")
-        
+        report = packed.report()
+        self.logger.info(
+            f"Context: {report['tokens']}/{report['budget']} tokens from {report['files']} files, "
+            f"{len(report['spans'])} spans; prompt ~{estimate_tokens(prompt)} tokens"
+        )
+        print(f"CONTEXT_TOKENS:{json.dumps({**report, 'prompt_tokens': estimate_tokens(prompt)})}")
+
+        system_prompt = "You are an expert software engineer. Output only valid unified diff patches."
+        # Cascade: a smaller model's patch is kept if it applies. Hunks are checked while
+        # each patch streams in and the stream is cut at the first one that cannot apply.
+        def check(text):
+            return patch_applies(self._clean_patch(text), file_contents, self.repo_path)
+
+        response = self.invoke_cascade(prompt, check, system_prompt=system_prompt,
+                                       stop_when=lambda: DiffHunkChecker(file_contents).feed, task="propose")
         if not response:
             return None
-        
-        # Clean up response
+        patch = self._clean_patch(response)
+
+        problem = self.last_cascade["attempts"][-1]["reason"]
+        if problem:
+            # Even the largest model's patch does not apply: retry it once, to the end,
+            # with the mismatch spelled out
+            self.logger.warning(f"Patch does not apply: {problem}")
+            prompt += (
+                f"\nA previous attempt produced a patch that does not apply: {problem}\n"
+                "Copy context and removed lines exactly from SOURCE CODE (without the line-number prefix).\n"
+            )
+            response = self.invoke_stream(prompt, system_prompt=system_prompt, model_id=self.tiers[-1])
+            if response:
+                patch = self._clean_patch(response)
+
+        print(f"PATCH_OUTPUT:{patch[:200]}...")  # Log first 200 chars for debugging
+        return patch
+
+    def _clean_patch(self, response: str) -> str:
+        """Strip markdown fences and leading prose from a model response."""
         patch = response.strip()
         
         # Remove markdown code blocks if present
@@ -142,14 +205,12 @@ diff --git a/src/service.ts b/src/service.ts
             # Try to extract diff portion anyway
             if "diff --git" in patch:
                 patch = patch[patch.find("diff --git"):]
-        
-        print(f"PATCH_OUTPUT:{patch[:200]}...")  # Log first 200 chars for debugging
         return patch
 
     def submit_proposal(self, anomaly_id: str, analysis: dict, patch: str):
         """Submit the fix proposal to the backend."""
         try:
-            res = requests.post(
+            res = self.http.post(
                 f"{self.api_url}/anomalies/proposal",
                 json={
                     'id': anomaly_id,
@@ -0,0 +1,340 @@
+import os
+import re
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import subprocess
+
+from context_packer import ContextPacker, Hints
+
+SCHEMA_VERSION = 1
+
+SOURCE_EXTENSIONS = (".py", ".ts", ".tsx", ".js", ".jsx", ".mjs", ".go", ".java", ".kt", ".rb", ".rs", ".cs", ".php")
+MAX_FILE_BYTES = 1024 * 1024
+
+_IDENT = re.compile(r"[A-Za-z_$][A-Za-z0-9_$]{2,}")
+_STRING = re.compile(r"'((?:\\.|[^'\\])*)'|\"((?:\\.|[^\"\\])*)\"|`((?:\\.|[^`\\])*)`")
+_WORD = re.compile(r"[A-Za-z]{3,}")
+_PLACEHOLDER = re.compile(r"\$\{[^}]*\}|%[sdifr]|\{[^}]*\}|<[A-Z]+>")
+
+_KEYWORDS = {
+    "and", "for", "the", "this", "self", "def", "class", "return", "import", "from", "const", "let", "var",
+    "function", "async", "await", "new", "not", "none", "null", "true", "false", "undefined", "else",
+    "elif", "try", "catch", "except", "finally", "with", "while", "string", "number", "any", "void",
+    "export", "public", "private", "protected", "static", "readonly", "interface", "type",
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, sha TEXT, lines INTEGER);
+CREATE TABLE IF NOT EXISTS symbols (path TEXT, name TEXT, kind TEXT, start_line INTEGER, end_line INTEGER);
+CREATE INDEX IF NOT EXISTS symbols_name ON symbols (name);
+CREATE INDEX IF NOT EXISTS symbols_path ON symbols (path);
+CREATE TABLE IF NOT EXISTS identifiers (term TEXT, path TEXT, line INTEGER);
+CREATE INDEX IF NOT EXISTS identifiers_term ON identifiers (term);
+CREATE INDEX IF NOT EXISTS identifiers_path ON identifiers (path);
+CREATE TABLE IF NOT EXISTS literals (id INTEGER PRIMARY KEY, path TEXT, line INTEGER, text TEXT, nterms INTEGER);
+CREATE INDEX IF NOT EXISTS literals_path ON literals (path);
+CREATE TABLE IF NOT EXISTS literal_terms (term TEXT, literal_id INTEGER);
+CREATE INDEX IF NOT EXISTS literal_terms_term ON literal_terms (term);
+"""
+
+
+def default_index_path(repo_path):
+    """Index location outside the repository (so `git add .` never picks it up)."""
+    base = os.getenv("REPO_INDEX_DIR", os.path.join(os.path.expanduser("~"), ".cache", "night-agent"))
+    digest = hashlib.sha1(os.path.realpath(repo_path).encode()).hexdigest()[:12]
+    return os.path.join(base, f"index-{digest}.sqlite")
+
+
+def literal_terms(text):
+    return sorted({w.lower() for w in _WORD.findall(_PLACEHOLDER.sub(" ", text))} - _KEYWORDS)
+
+
+class RepoIndex:
+    """
+    Persistent SQLite index of a git repository for agents.
+
+    - files, symbol definitions (functions/classes/methods with line ranges)
+    - inverted index over identifiers (term -> file, line)
+    - inverted index over string literals (log messages) by their words
+    - incremental refresh from `git diff` between the indexed commit and HEAD
+    Lookups (log template -> source line, stack frame -> enclosing symbol,
+    symbol -> definition) are plain SQL: milliseconds, no model call.
+    """
+
+    def __init__(self, repo_path, index_path=None):
+        self.repo_path = repo_path
+        self.index_path = index_path or default_index_path(repo_path)
+        self.logger = logging.getLogger("RepoIndex")
+        self.packer = ContextPacker()
+        os.makedirs(os.path.dirname(self.index_path) or ".", exist_ok=True)
+        self.db = sqlite3.connect(self.index_path, check_same_thread=False)
+        self._lock = threading.RLock()  # one connection shared by agent threads
+        self.db.executescript(SCHEMA)
+        if self._meta("version") != str(SCHEMA_VERSION):
+            with self.db:
+                self._clear()
+                self._set_meta("version", str(SCHEMA_VERSION))
+
+    def close(self):
+        self.db.close()
+
+    # Metadata ------------------------------------------------------------------------
+
+    def _query(self, sql, params=()):
+        with self._lock:
+            return self.db.execute(sql, params).fetchall()
+
+    def _meta(self, key):
+        rows = self._query("SELECT value FROM meta WHERE key = ?", (key,))
+        return rows[0][0] if rows else None
+
+    def _set_meta(self, key, value):
+        self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    @property
+    def indexed_head(self):
+        return self._meta("head")
+
+    def _git(self, *args):
+        return subprocess.run(["git", *args], cwd=self.repo_path, check=True, capture_output=True, text=True).stdout
+
+    # Building ------------------------------------------------------------------------
+
+    def update(self):
+        """
+        Bring the index to the repository's HEAD.
+        Full build on first use (or when the indexed commit is gone), otherwise
+        only files changed between the indexed commit and HEAD are re-indexed.
+        Returns the number of files (re)indexed or removed.
+        """
+        started = time.monotonic()
+        head = self._git("rev-parse", "HEAD").strip()
+        previous = self.indexed_head
+        if previous == head:
+            return 0
+
+        changed = None
+        if previous:
+            try:
+                changed = self._changed_paths(previous, head)
+            except subprocess.CalledProcessError:
+                self.logger.info(f"Indexed commit {previous[:8]} not found, rebuilding")
+
+        with self._lock, self.db:
+            if changed is None:
+                self._clear()
+                paths = [p for p in self._git("ls-files", "-z").split("\0") if p]
+                count = sum(self._index_file(p) for p in paths if p.endswith(SOURCE_EXTENSIONS))
+                mode = "full"
+            else:
+                count = 0
+                for path in changed:
+                    self._remove_file(path)
+                    if path.endswith(SOURCE_EXTENSIONS):
+                        self._index_file(path)
+                    count += 1
+                mode = "incremental"
+            self._set_meta("head", head)
+
+        self.logger.info(f"Index {mode} update to {head[:8]}: {count} files in {time.monotonic() - started:.2f}s")
+        return count
+
+    def _changed_paths(self, old, new):
+        """Paths added, modified, deleted or renamed (both names) between two commits."""
+        out = self._git("diff", "--name-status", "-z", "--no-renames", old, new)
+        parts = [p for p in out.split("\0") if p]
+        # -z output alternates status and path
+        return sorted(set(parts[1::2]))
+
+    def _clear(self):
+        for table in ("files", "symbols", "identifiers", "literals", "literal_terms"):
+            self.db.execute(f"DELETE FROM {table}")
+        self.db.execute("DELETE FROM meta WHERE key = 'head'")
+
+    def _remove_file(self, path):
+        self.db.execute("DELETE FROM literal_terms WHERE literal_id IN (SELECT id FROM literals WHERE path = ?)", (path,))
+        for table in ("files", "symbols", "identifiers", "literals"):
+            self.db.execute(f"DELETE FROM {table} WHERE path = ?", (path,))
+
+    def _index_file(self, path):
+        full_path = os.path.join(self.repo_path, path)
+        try:
+            if os.path.getsize(full_path) > MAX_FILE_BYTES:
+                return 0
+            with open(full_path, "r", encoding="utf-8", errors="replace") as f:
+                content = f.read()
+        except OSError:
+            return 0
+
+        lines = content.splitlines()
+        self.db.execute("INSERT OR REPLACE INTO files (path, sha, lines) VALUES (?, ?, ?)",
+                        (path, hashlib.sha1(content.encode("utf-8", errors="replace")).hexdigest(), len(lines)))
+
+        spans = [s for s in self.packer.spans_for(path, content) if s.name]
+        self.db.executemany("INSERT INTO symbols (path, name, kind, start_line, end_line) VALUES (?, ?, ?, ?, ?)",
+                            [(path, s.name, s.kind, s.start, s.end) for s in spans])
+
+        identifiers = []
+        for n, line in enumerate(lines, 1):
+            code = _STRING.sub(" ", line)
+            for term in {t for t in _IDENT.findall(code) if t.lower() not in _KEYWORDS}:
+                identifiers.append((term, path, n))
+            for m in _STRING.finditer(line):
+                text = next(g for g in m.groups() if g is not None)
+                terms = literal_terms(text)
+                if len(terms) < 2:
+                    continue  # keys, paths and single words are not log messages
+                cur = self.db.execute("INSERT INTO literals (path, line, text, nterms) VALUES (?, ?, ?, ?)",
+                                      (path, n, text[:500], len(terms)))
+                self.db.executemany("INSERT INTO literal_terms (term, literal_id) VALUES (?, ?)",
+                                    [(t, cur.lastrowid) for t in terms])
+        self.db.executemany("INSERT INTO identifiers (term, path, line) VALUES (?, ?, ?)", identifiers)
+        return 1
+
+    # Lookups -------------------------------------------------------------------------
+
+    def find_symbol(self, name):
+        """Definitions of a symbol: [(path, kind, start_line, end_line)]"""
+        return self._query(
+            "SELECT path, kind, start_line, end_line FROM symbols WHERE name = ? ORDER BY path, start_line", (name,)
+        )
+
+    def enclosing_symbol(self, path_suffix, line):
+        """Innermost indexed symbol containing path:line (path may be a suffix, as in stack frames)."""
+        suffix = path_suffix.lstrip("./")
+        rows = self._query(
+            "SELECT path, name, kind, start_line, end_line FROM symbols "
+            "WHERE (path = ? OR path LIKE ?) AND start_line <= ? AND end_line >= ? "
+            "ORDER BY end_line - start_line LIMIT 1",
+            (suffix, f"%/{suffix}", line, line),
+        )
+        return rows[0] if rows else None
+
+    def resolve_path(self, path):
+        """Indexed path for a (possibly partial or absolute) path, e.g. from an LLM or a stack frame."""
+        suffix = path.lstrip("./")
+        rows = self._query("SELECT path FROM files WHERE path = ? OR path LIKE ? OR ? LIKE '%/' || path "
+                           "ORDER BY length(path) LIMIT 1", (suffix, f"%/{suffix}", path))
+        return rows[0][0] if rows else None
+
+    def locate_log(self, message, limit=5, min_coverage=0.6):
+        """
+        String literals that most likely produced a log message or template.
+        Returns [(path, line, literal, coverage)] where coverage is the share of the
+        literal's words present in the message.
+        """
+        terms = literal_terms(message)
+        if not terms:
+            return []
+        marks = ",".join("?" * len(terms))
+        rows = self._query(
+            f"SELECT l.path, l.line, l.text, COUNT(*) * 1.0 / l.nterms AS coverage, COUNT(*) AS hits "
+            f"FROM literal_terms t JOIN literals l ON l.id = t.literal_id "
+            f"WHERE t.term IN ({marks}) GROUP BY l.id "
+            f"HAVING coverage >= ? ORDER BY coverage DESC, hits DESC LIMIT ?",
+            (*terms, min_coverage, limit),
+        )
+        return [(path, line, text, round(coverage, 2)) for path, line, text, coverage, _ in rows]
+
+    def files_for_identifiers(self, identifiers, limit=10):
+        """Files ranked by how many of the identifiers they use: [(path, matched)]"""
+        identifiers = sorted(set(identifiers))
+        if not identifiers:
+            return []
+        marks = ",".join("?" * len(identifiers))
+        return self._query(
+            f"SELECT path, COUNT(DISTINCT term) AS matched FROM identifiers WHERE term IN ({marks}) "
+            f"GROUP BY path ORDER BY matched DESC, path LIMIT ?",
+            (*identifiers, limit),
+        )
+
+    def locate(self, text, limit=10):
+        """
+        Source locations for free text (anomaly message, log template, logs, root cause):
+        stack frames, log literals, then definitions of named symbols.
+        Returns [{"path", "line", "symbol", "reason"}], best first, one entry per path:line.
+        """
+        hints = Hints(text)
+        found = []
+        seen = set()
+
+        def add(path, line, symbol, reason):
+            if (path, line) not in seen:
+                seen.add((path, line))
+                found.append({"path": path, "line": line, "symbol": symbol, "reason": reason})
+
+        for frame_path, line, _ in hints.frames:
+            match = self.enclosing_symbol(frame_path, line)
+            if match:
+                add(match[0], line, match[1], "stack frame")
+        for chunk in re.split(r"[\n\"]+", text):
+            if len(literal_terms(chunk)) >= 2:
+                for path, line, _, coverage in self.locate_log(chunk, limit=3):
+                    symbol = self.enclosing_symbol(path, line)
+                    add(path, line, symbol[1] if symbol else None, f"log literal ({coverage:.0%})")
+        for name in sorted(hints.symbols):
+            for path, kind, start, _ in self.find_symbol(name)[:3]:
+                add(path, start, name, f"{kind} definition")
+        return found[:limit]
+
+    def relevant_files(self, text, limit=5):
+        """Distinct files for locate(); falls back to identifier overlap."""
+        files = []
+        for loc in self.locate(text, limit=limit * 3):
+            if loc["path"] not in files:
+                files.append(loc["path"])
+        if len(files) < limit:
+            identifiers = [t for t in _IDENT.findall(text) if t.lower() not in _KEYWORDS]
+            for path, _ in self.files_for_identifiers(identifiers, limit):
+                if path not in files:
+                    files.append(path)
+        return files[:limit]
+
+    def stats(self):
+        counts = {t: self._query(f"SELECT COUNT(*) FROM {t}")[0][0]
+                  for t in ("files", "symbols", "identifiers", "literals")}
+        return {**counts, "head": self.indexed_head, "path": self.index_path}
+
+
+_open_indexes = {}  # realpath -> RepoIndex, one connection per repository for the whole process
+_open_lock = threading.Lock()
+
+
+def open_index(repo_path):
+    """
+    Up-to-date index for repo_path, or None if it is not a git repository or indexing fails.
+    The index is opened once per process and shared by every agent (the worker builds one per job).
+    """
+    if not repo_path or not os.path.exists(os.path.join(repo_path, ".git")):
+        return None
+    try:
+        with _open_lock:
+            index = _open_indexes.get(os.path.realpath(repo_path))
+            if index is None:
+                index = _open_indexes[os.path.realpath(repo_path)] = RepoIndex(repo_path)
+        index.update()  # incremental; a no-op while HEAD has not moved
+        return index
+    except (subprocess.CalledProcessError, sqlite3.Error, OSError) as e:
+        logging.getLogger("RepoIndex").warning(f"Repository index unavailable: {e}")
+        return None
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 2:
+        print("Usage: python repo_index.py <repo_path> [query text]")
+        sys.exit(1)
+    index = RepoIndex(sys.argv[1])
+    index.update()
+    print(json.dumps(index.stats(), indent=2))
+    if len(sys.argv) > 2:
+        started = time.monotonic()
+        locations = index.locate(" ".join(sys.argv[2:]))
+        print(json.dumps(locations, indent=2))
+        print(f"Lookup took {(time.monotonic() - started) * 1000:.1f} ms")
@@ -0,0 +1,180 @@
+import re
+import json
+
+
+def _scan_json(text):
+    """
+    Walk the first top-level JSON value in text.
+    Returns (start, end) where end is the index just past the value, or None if it is not closed yet.
+    """
+    start = None
+    depth = 0
+    in_string = False
+    escaped = False
+    for i, ch in enumerate(text):
+        if start is None:
+            if ch in "{[":
+                start = i
+                depth = 1
+            continue
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch in "{[":
+            depth += 1
+        elif ch in "}]":
+            depth -= 1
+            if depth == 0:
+                return start, i + 1
+    return None
+
+
+def json_value_complete(text):
+    """Stop condition: the first JSON object/array in the stream is closed."""
+    return _scan_json(text) is not None
+
+
+def first_json_value(text):
+    """The first complete JSON value in text (markdown fences and trailing prose ignored)."""
+    span = _scan_json(text)
+    if span is None:
+        raise ValueError("no complete JSON value in response")
+    return json.loads(text[span[0]:span[1]])
+
+
+def _string_field(name):
+    return re.compile(r'"%s"\s*:\s*"((?:\\.|[^"\\])*)"' % re.escape(name))
+
+
+def json_fields_complete(*fields):
+    """
+    Stop condition factory: all named string fields have their closing quote
+    (or the JSON value closed). Lets a caller stop before the model finishes the object.
+    """
+    patterns = [_string_field(f) for f in fields]
+
+    def complete(text):
+        return json_value_complete(text) or all(p.search(text) for p in patterns)
+
+    complete.__name__ = "fields:" + ",".join(fields)
+    return complete
+
+
+def parse_json_fields(text, fields):
+    """Named string fields from a complete or truncated JSON object."""
+    try:
+        value = first_json_value(text)
+        if isinstance(value, dict):
+            return value
+    except ValueError:
+        pass
+    result = {}
+    for name in fields:
+        m = _string_field(name).search(text)
+        if m:
+            result[name] = json.loads(f'"{m.group(1)}"')
+    if not result:
+        raise ValueError("no fields found in response")
+    return result
+
+
+_HUNK_HEADER = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@")
+_FILE_HEADER = re.compile(r"^\+\+\+ b/(.+)$")
+
+
+class DiffHunkChecker:
+    """
+    Validates unified diff hunks while a patch streams in.
+
+    A hunk is checked once the next hunk or file header arrives (or at the end):
+    its context and removed lines must exist, in order, near the claimed position of
+    the original file. The first bad hunk can stop the stream so the model does not
+    keep writing a patch that will not apply.
+    """
+
+    def __init__(self, file_contents, slack=50):
+        """
+        Args:
+            file_contents: {path: content} of files the patch may touch (others are not checked)
+            slack: Lines the hunk may be away from its header's start line
+        """
+        self.files = {path: content.splitlines() for path, content in file_contents.items()}
+        self.slack = slack
+        self.checked = 0
+        self.problems = []
+        self._lines_seen = 0
+
+    def _source_for(self, path):
+        for known, lines in self.files.items():
+            if known == path or known.endswith("/" + path) or path.endswith("/" + known):
+                return lines
+        return None
+
+    def feed(self, text):
+        """Stop condition: True once a completed hunk does not match its file."""
+        lines = text.split("\n")
+        complete = lines[:-1]  # the last line may still be streaming
+        if len(complete) == self._lines_seen:
+            return False
+        self._lines_seen = len(complete)
+        self._check(complete, final=False)
+        return bool(self.problems)
+
+    def finish(self, text):
+        """Check every hunk of the complete patch; returns the list of problems."""
+        self._check(text.split("\n"), final=True)
+        return self.problems
+
+    def _check(self, lines, final):
+        self.checked = 0
+        self.problems = []
+        path = None
+        hunk = None
+        hunks = []
+        for line in lines:
+            m = _FILE_HEADER.match(line)
+            if m:
+                if hunk:
+                    hunks.append(hunk)
+                    hunk = None
+                path = m.group(1).strip()
+                continue
+            m = _HUNK_HEADER.match(line)
+            if m:
+                if hunk:
+                    hunks.append(hunk)
+                hunk = (path, int(m.group(1)), [])
+                continue
+            if line.startswith(("diff --git", "--- a/", "--- /dev/null")):
+                if hunk:
+                    hunks.append(hunk)
+                hunk = None
+                continue
+            if hunk is not None and line[:1] in (" ", "-"):
+                hunk[2].append(line[1:])
+        if hunk and final:
+            hunks.append(hunk)
+
+        for path, start, expected in hunks:
+            self.checked += 1
+            source = self._source_for(path) if path else None
+            if source is None or not expected:
+                continue
+            if not self._matches(source, start, expected):
+                self.problems.append(f"{path}: hunk at line {start} does not match the file")
+
+    def _matches(self, source, start, expected):
+        """Expected lines appear contiguously within `slack` lines of start (whitespace-insensitive)."""
+        want = [l.strip() for l in expected]
+        first = max(0, start - 1 - self.slack)
+        last = min(len(source) - len(want), start - 1 + self.slack)
+        for offset in range(first, last + 1):
+            if all(source[offset + i].strip() == w for i, w in enumerate(want)):
+                return True
+        return False
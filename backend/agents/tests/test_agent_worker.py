@@ -0,0 +1,169 @@
+import os
+import json
+import socket
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+try:
+    from agent_worker import AgentWorker, AgentWorkerServer
+except ImportError:  # boto3 not installed
+    AgentWorker = None
+
+
+class FakeAgent:
+    """Stands in for an agent class: run() behaviour is set per test."""
+
+    behaviour = staticmethod(lambda *args: None)
+
+    def run(self, *args):
+        return FakeAgent.behaviour(*args)
+
+
+@unittest.skipIf(AgentWorker is None, "boto3 not installed")
+class TestAgentWorker(unittest.TestCase):
+    def setUp(self):
+        jobs = {"fake": (FakeAgent, 0), "merge": (FakeAgent, 3), "apply": (FakeAgent, 3)}
+        for p in (
+            mock.patch.object(AgentWorker, "JOBS", jobs),
+            mock.patch.object(FakeAgent, "behaviour", staticmethod(lambda *args: None)),
+            mock.patch.dict(os.environ, {"FIX_SANDBOX": ""}),
+        ):
+            p.start()
+            self.addCleanup(p.stop)
+
+    def worker(self, **kwargs):
+        worker = AgentWorker(**kwargs)
+        self.addCleanup(worker.shutdown)
+        return worker
+
+    def test_submit_checks_job_and_arity(self):
+        worker = self.worker()
+        with self.assertRaisesRegex(ValueError, "unknown job"):
+            worker.submit("nope", [])
+        with self.assertRaisesRegex(ValueError, "expects 3 args, got 1"):
+            worker.submit("merge", ["fix-1"])
+        self.assertEqual(worker.stats["submitted"], 0)
+
+    def test_full_queue_is_rejected(self):
+        release = threading.Event()
+        FakeAgent.behaviour = staticmethod(lambda *args: release.wait(5))
+        worker = self.worker(concurrency=1, max_pending=2)
+        futures = [worker.submit("fake", [])[1] for _ in range(2)]
+        with self.assertRaisesRegex(ValueError, "queue is full"):
+            worker.submit("fake", [])
+        self.assertEqual(worker.stats["rejected"], 1)
+
+        release.set()
+        for future in futures:
+            future.result(timeout=5)
+        worker.submit("fake", [])[1].result(timeout=5)
+        self.assertEqual(worker.stats["completed"], 3)
+
+    def test_agent_exit_codes(self):
+        def run(code):
+            raise SystemExit(int(code))
+        FakeAgent.behaviour = staticmethod(run)
+        worker = self.worker()
+        with mock.patch.object(AgentWorker, "JOBS", {"fake": (FakeAgent, 1)}):
+            failed = worker.submit("fake", [1])[1].result(timeout=5)
+            completed = worker.submit("fake", [0])[1].result(timeout=5)
+
+        self.assertEqual(failed["status"], "failed")
+        self.assertEqual(failed["error"], "agent exited with code 1")
+        self.assertEqual(completed["status"], "completed")
+        self.assertEqual((worker.stats["completed"], worker.stats["failed"]), (1, 1))
+
+    def test_merge_jobs_are_serialised_per_repo(self):
+        running = {}
+        overlap = []
+        lock = threading.Lock()
+        other_repo_started = threading.Event()
+
+        def run(fix_id, repo_path, branch):
+            with lock:
+                running[repo_path] = running.get(repo_path, 0) + 1
+                overlap.append(dict(running))
+            if repo_path == "/repo/b":
+                other_repo_started.set()
+            else:
+                # Another repository is not blocked by this one
+                other_repo_started.wait(5)
+            with lock:
+                running[repo_path] -= 1
+
+        FakeAgent.behaviour = staticmethod(run)
+        worker = self.worker(concurrency=4)
+        futures = [worker.submit("merge", [f"fix-{i}", "/repo/a", "main"])[1] for i in range(3)]
+        futures.append(worker.submit("merge", ["fix-b", "/repo/b", "main"])[1])
+        for future in futures:
+            self.assertEqual(future.result(timeout=10)["status"], "completed")
+
+        self.assertTrue(other_repo_started.is_set())
+        self.assertEqual(max(state.get("/repo/a", 0) for state in overlap), 1)
+
+    def test_sandboxed_apply_jobs_are_not_serialised(self):
+        worker = self.worker()
+        with mock.patch.dict(os.environ, {"FIX_SANDBOX": "worktree"}):
+            worker.submit("apply", ["fix-1", "/repo/a", "fix/1"])[1].result(timeout=5)
+        self.assertEqual(worker._repo_locks, {})
+        worker.submit("apply", ["fix-2", "/repo/a", "fix/2"])[1].result(timeout=5)
+        self.assertEqual(list(worker._repo_locks), [os.path.realpath("/repo/a")])
+
+    def test_oldest_finished_results_are_trimmed(self):
+        worker = self.worker(keep_results=2)
+        ids = []
+        for _ in range(3):
+            job_id, future = worker.submit("fake", [])
+            future.result(timeout=5)
+            ids.append(job_id)
+
+        self.assertIsNone(worker.status(ids[0]))
+        self.assertEqual([worker.status(j)["status"] for j in ids[1:]], ["completed", "completed"])
+
+    def test_socket_round_trip(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        socket_path = os.path.join(tmpdir, "worker.sock")
+        server = AgentWorkerServer(socket_path, self.worker())
+        self.addCleanup(server.server_close)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.shutdown)
+
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(5)
+            sock.connect(socket_path)
+            replies = sock.makefile("r")
+
+            def send(request):
+                sock.sendall((json.dumps(request) + "\n").encode("utf-8"))
+                return json.loads(replies.readline())
+
+            done = send({"job": "fake", "args": [], "wait": True})
+            self.assertEqual((done["ok"], done["status"]), (True, "completed"))
+            status = send({"job": "status", "id": done["id"]})
+            self.assertEqual((status["job"], status["status"]), ("fake", "completed"))
+            self.assertEqual(send({"job": "status", "id": "missing"}), {"ok": False, "error": "unknown job id"})
+
+            stats = send({"job": "stats"})["stats"]
+            self.assertEqual((stats["submitted"], stats["completed"], stats["pending"]), (1, 1, 0))
+            self.assertIn("model_routing", stats)
+
+            sock.sendall(b"not json\n")
+            self.assertFalse(json.loads(replies.readline())["ok"])
+
+    def test_server_only_replaces_a_socket(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        socket_path = os.path.join(tmpdir, "worker.sock")
+        with open(socket_path, "w") as f:
+            f.write("not a socket")
+        with self.assertRaisesRegex(FileExistsError, "not a socket"):
+            AgentWorkerServer(socket_path, self.worker())
+        self.assertTrue(os.path.isfile(socket_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
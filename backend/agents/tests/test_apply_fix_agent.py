@@ -0,0 +1,93 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from bedrock_stub import StubBedrockClient
+
+try:
+    from bedrock_agent import BedrockAgent
+    from apply_fix_agent import ApplyFixAgent
+except ImportError:  # boto3 not installed
+    BedrockAgent = None
+
+PATCH = (
+    "diff --git a/app.py b/app.py\n--- a/app.py\n+++ b/app.py\n"
+    "@@ -1 +1 @@\n-print('v1')\n+print('v2')\n"
+)
+
+
+def git(*args, cwd):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+class FakeResponse:
+    ok = True
+    text = ""
+
+
+class FakeSession:
+    """Records POSTs to the API."""
+
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posts.append((url.rsplit("/api/", 1)[1], json))
+        return FakeResponse()
+
+
+@unittest.skipIf(BedrockAgent is None, "boto3 not installed")
+class TestSandboxValidation(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.repo = os.path.join(self.tmpdir, "repo")
+        os.makedirs(self.repo)
+        git("init", "--quiet", "-b", "main", cwd=self.repo)
+        git("config", "user.email", "test@example.com", cwd=self.repo)
+        git("config", "user.name", "Test", cwd=self.repo)
+        with open(os.path.join(self.repo, "app.py"), "w") as f:
+            f.write("print('v1')\n")
+        git("add", "app.py", cwd=self.repo)
+        git("commit", "--quiet", "-m", "initial", cwd=self.repo)
+
+        env = {"BEDROCK_GOVERNOR": "false", "FIX_SANDBOX": "worktree",
+               "WORKTREE_DIR": os.path.join(self.tmpdir, "pool"), "API_URL": "http://api/api"}
+        for p in (
+            mock.patch.dict(os.environ, env),
+            mock.patch.object(BedrockAgent, "cache", None),
+            mock.patch.object(BedrockAgent, "_governors", {}),
+            mock.patch.object(BedrockAgent, "shared_client", return_value=StubBedrockClient(lambda p, m: "")),
+        ):
+            p.start()
+            self.addCleanup(p.stop)
+        self.agent = ApplyFixAgent()
+        self.agent.http = FakeSession()
+
+    def apply(self, command):
+        with mock.patch.dict(os.environ, {"FIX_VALIDATE_COMMAND": command}):
+            self.agent.run_sandboxed("fix-1", self.repo, "fix/1", PATCH)
+
+    def test_failing_validation_fails_the_job(self):
+        with self.assertRaises(SystemExit) as raised:
+            self.apply("echo broken; exit 3")
+
+        self.assertEqual(raised.exception.code, 1)
+        self.assertEqual(self.agent.http.posts, [
+            ("fix/fix-1/validation", {"passed": False, "status": "failed (exit 3)", "output": "broken\n"}),
+        ])
+        # The commit is kept on the branch for inspection
+        self.assertEqual(git("show", "fix/1:app.py", cwd=self.repo), "print('v2')")
+
+    def test_passing_validation_is_reported(self):
+        self.apply("true")
+        self.assertEqual(self.agent.http.posts, [
+            ("fix/fix-1/validation", {"passed": True, "status": "passed", "output": ""}),
+        ])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,189 @@
+import shutil
+import tempfile
+import unittest
+
+from bedrock_stub import StubClientError
+from concurrency import (
+    AdaptiveLimiter, RateGovernor, CircuitOpenError, BedrockStreamError, is_retryable, is_throttle_error,
+)
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+class TestAdaptiveLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def limiter(self, **kwargs):
+        options = dict(initial=4, min_limit=1, max_limit=6, decrease_factor=0.5, cooldown=5.0)
+        options.update(kwargs)
+        return AdaptiveLimiter(clock=self.clock, **options)
+
+    def succeed(self, limiter, times):
+        for _ in range(times):
+            with limiter:
+                pass
+            limiter.on_success()
+
+    def test_additive_increase_after_limit_successes(self):
+        limiter = self.limiter()
+        self.succeed(limiter, 3)
+        self.assertEqual(limiter.limit, 4)
+        self.succeed(limiter, 1)
+        self.assertEqual(limiter.limit, 5)
+        self.succeed(limiter, 5)
+        self.assertEqual(limiter.limit, 6)
+        self.succeed(limiter, 20)  # capped at max_limit
+        self.assertEqual(limiter.snapshot()["limit"], 6)
+        self.assertEqual(limiter.stats["increases"], 2)
+        self.assertEqual(limiter.stats["peak_limit"], 6)
+
+    def test_one_decrease_per_cooldown(self):
+        limiter = self.limiter(initial=8, max_limit=8)
+        for _ in range(3):  # a burst of throttled in-flight calls
+            limiter.on_throttle()
+        self.assertEqual(limiter.limit, 4)
+
+        self.clock.now += 4.0
+        limiter.on_throttle()
+        self.assertEqual(limiter.limit, 4)
+        self.clock.now += 1.5
+        limiter.on_throttle()
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual((limiter.stats["throttles"], limiter.stats["decreases"]), (5, 2))
+
+    def test_no_increase_within_cooldown_of_a_decrease(self):
+        limiter = self.limiter(initial=4)
+        limiter.on_throttle()
+        self.succeed(limiter, 10)
+        self.assertEqual(limiter.limit, 2)
+        self.clock.now += 5.0
+        limiter.on_success()  # successes kept counting during the cooldown
+        self.assertEqual(limiter.limit, 3)
+
+    def test_min_limit_floor(self):
+        limiter = self.limiter(initial=3, min_limit=2)
+        for _ in range(3):
+            limiter.on_throttle()
+            self.clock.now += 10
+        self.assertEqual(limiter.limit, 2)
+        self.assertEqual(limiter.stats["decreases"], 1)
+
+
+class TestRateGovernor(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.clock = FakeClock()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def governor(self, **kwargs):
+        options = dict(rate=1.0, burst=2, threshold=3, cooldown=10.0, max_wait=60.0)
+        options.update(kwargs)
+        return RateGovernor("mistral.test-model", self.tmpdir, clock=self.clock, sleep=self.clock.sleep, **options)
+
+    def test_burst_then_refill(self):
+        governor = self.governor()
+        self.assertEqual(governor.acquire(), 0.0)
+        self.assertEqual(governor.acquire(), 0.0)
+        # Bucket empty: one token takes 1/rate seconds
+        self.assertAlmostEqual(governor.acquire(), 1.0)
+        self.assertEqual(self.clock.sleeps, [1.0])
+
+        self.clock.now += 5  # refill is capped at burst
+        governor.acquire()
+        governor.acquire()
+        self.assertEqual(len(self.clock.sleeps), 1)
+
+    def test_max_wait_fails_fast(self):
+        governor = self.governor(rate=0.1, max_wait=5.0)
+        governor.acquire()
+        governor.acquire()
+        with self.assertRaises(CircuitOpenError):
+            governor.acquire()
+        self.assertEqual(self.clock.sleeps, [])
+        self.assertEqual(governor.stats["fast_failures"], 1)
+
+    def test_circuit_opens_after_threshold_throttles(self):
+        governor = self.governor(rate=100.0)
+        for _ in range(2):
+            governor.acquire()
+            governor.on_throttle()
+        governor.acquire()  # still closed below the threshold
+        governor.on_throttle()
+
+        with self.assertRaises(CircuitOpenError) as raised:
+            governor.acquire()
+        self.assertAlmostEqual(raised.exception.retry_in, 10.0)
+        self.assertEqual(governor.snapshot()["circuit"], "open")
+
+    def test_single_half_open_probe_and_doubling_cooldown(self):
+        governor = self.governor(rate=100.0, threshold=1)
+        governor.acquire()
+        governor.on_throttle()
+
+        self.clock.now += 10.5
+        governor.acquire()  # the probe
+        with self.assertRaises(CircuitOpenError):
+            governor.acquire()  # others fail fast while it is in flight
+
+        governor.on_throttle()  # failed probe: reopen for twice as long
+        with self.assertRaises(CircuitOpenError) as raised:
+            governor.acquire()
+        self.assertAlmostEqual(raised.exception.retry_in, 20.0)
+
+        self.clock.now += 20.5
+        governor.acquire()
+        governor.on_success()
+        self.assertEqual(governor.snapshot()["circuit"], "closed")
+        governor.acquire()
+        governor.acquire()
+
+    def test_state_is_shared_between_instances(self):
+        first = self.governor(rate=0.01, max_wait=0.0)
+        second = self.governor(rate=0.01, max_wait=0.0)
+        first.acquire()
+        second.acquire()
+        with self.assertRaises(CircuitOpenError):
+            first.acquire()  # the burst of 2 is shared, not per instance
+
+        shared = self.governor(rate=100.0, threshold=1)
+        other = self.governor(rate=100.0, threshold=1)
+        self.clock.now += 1000
+        shared.acquire()
+        shared.on_throttle()
+        with self.assertRaises(CircuitOpenError):
+            other.acquire()
+
+
+class TestErrorClassification(unittest.TestCase):
+    def test_retryable(self):
+        self.assertTrue(is_retryable(StubClientError("ThrottlingException")))
+        self.assertTrue(is_retryable(StubClientError("ModelTimeoutException")))
+        self.assertTrue(is_retryable(BedrockStreamError("internalServerException")))
+        self.assertTrue(is_retryable(ConnectionResetError()))
+
+    def test_not_retryable(self):
+        self.assertFalse(is_retryable(StubClientError("ValidationException")))
+        self.assertFalse(is_retryable(StubClientError("AccessDeniedException")))
+        self.assertFalse(is_retryable(CircuitOpenError("model", 5.0)))
+        self.assertFalse(is_retryable(ValueError("bad prompt")))
+
+    def test_stream_throttle_event_is_a_throttle(self):
+        self.assertTrue(is_throttle_error(BedrockStreamError("throttlingException", "slow down")))
+
+
+if __name__ == "__main__":
+    unittest.main()
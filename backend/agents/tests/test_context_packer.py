@@ -0,0 +1,136 @@
+import unittest
+
+from context_packer import ContextPacker, Hints, estimate_tokens
+
+PY_SOURCE = """import os
+
+
+def handle_request(request):
+    payload = request.body
+    return payload.decode()
+
+
+def load_user(user_id):
+    row = db.get(user_id)
+    return row
+
+
+def format_name(customer_record):
+    return customer_record.title()
+
+
+def unrelated_helper(values):
+    return sorted(values)
+"""
+
+TS_SOURCE = """import { Repo } from './repo';
+
+export class UserService {
+  constructor(private repo: Repo) {}
+
+  async createUser(input: UserInput): Promise<User> {
+    const user = await this.repo.save(input);
+    return user;
+  }
+
+  deleteUser(id: string) {
+    if (!id) {
+      throw new Error('missing id');
+    }
+    return this.repo.delete(id);
+  }
+}
+
+export const parseInput = (raw: string) => {
+  return JSON.parse(raw);
+};
+"""
+
+HINTS = "Crash at app/service.py:5\nload_user() returned None while building customer_record"
+
+
+class TestSpans(unittest.TestCase):
+    def test_python_functions(self):
+        spans = ContextPacker().spans_for("app/service.py", PY_SOURCE)
+        functions = {s.name: (s.start, s.end) for s in spans if s.kind == "function"}
+        self.assertEqual(functions, {"handle_request": (4, 6), "load_user": (9, 11),
+                                     "format_name": (14, 15), "unrelated_helper": (18, 19)})
+        self.assertIn((1, 3), [(s.start, s.end) for s in spans if s.kind == "module"])
+
+    def test_typescript_methods_are_their_own_spans(self):
+        spans = {s.name: (s.start, s.end, s.kind) for s in ContextPacker().spans_for("src/user.ts", TS_SOURCE)}
+        self.assertEqual(spans["UserService"], (3, 3, "class"))
+        self.assertEqual(spans["createUser"], (6, 9, "function"))
+        self.assertEqual(spans["deleteUser"], (11, 16, "function"))
+        self.assertEqual(spans["parseInput"], (19, 21, "function"))
+
+
+class TestRanking(unittest.TestCase):
+    def test_stack_frame_beats_named_symbol_beats_identifier_overlap(self):
+        packer = ContextPacker()
+        spans = [s for s in packer.spans_for("app/service.py", PY_SOURCE) if s.kind == "function"]
+        ranked = packer.rank(spans, {"app/service.py": PY_SOURCE.splitlines()}, Hints(HINTS))
+
+        self.assertEqual([s.name for s in ranked],
+                         ["handle_request", "load_user", "format_name", "unrelated_helper"])
+        self.assertIn("stack frame", ranked[0].reasons)
+        self.assertIn("named", ranked[1].reasons)
+        self.assertEqual(ranked[2].reasons, ["1 identifiers"])
+        self.assertEqual(ranked[3].reasons, [])
+
+    def test_node_frames_and_backticked_symbols(self):
+        hints = Hints("TypeError\n    at UserService.createUser (src/user.ts:7:18)\nsee `parseInput`")
+        self.assertEqual(hints.frame_lines("backend/src/user.ts"), {7})
+        self.assertTrue({"UserService", "createUser", "parseInput"} <= hints.symbols)
+
+
+class TestPack(unittest.TestCase):
+    def packer(self, **kwargs):
+        # whole_file_tokens=0: never offer the small fixtures whole
+        return ContextPacker(**{"whole_file_tokens": 0, "context_lines": 0, **kwargs})
+
+    def test_unrelated_code_is_cut_off(self):
+        packed = self.packer().pack({"app/service.py": PY_SOURCE}, HINTS)
+        self.assertEqual([s.name for s in packed.spans], ["handle_request", "load_user", "format_name"])
+        self.assertNotIn("unrelated_helper", packed.text)
+        self.assertNotIn("import os", packed.text)
+        self.assertIn("    5|     payload = request.body", packed.text)
+
+    def test_text_stays_within_budget(self):
+        sources = {"app/service.py": PY_SOURCE * 20, "src/user.ts": TS_SOURCE * 20}
+        hints = HINTS + "\ncreateUser() and deleteUser() fail for every user input"
+        for budget in (100, 250, 600, 1500):
+            packed = self.packer(budget_tokens=budget, context_lines=3).pack(sources, hints)
+            self.assertTrue(packed.spans)
+            self.assertLessEqual(packed.tokens, budget)
+            self.assertEqual(packed.tokens, estimate_tokens(packed.text))
+
+    def test_overlapping_spans_are_merged_per_file(self):
+        packed = self.packer(context_lines=3).pack(
+            {"app/service.py": PY_SOURCE, "src/user.ts": TS_SOURCE},
+            "handle_request() calls load_user() and createUser()")
+
+        self.assertEqual([(s.path, s.start, s.end, s.name) for s in packed.spans], [
+            ("app/service.py", 1, 14, "handle_request, load_user"),
+            ("src/user.ts", 3, 12, "createUser"),
+        ])
+        self.assertEqual(packed.files, ["app/service.py", "src/user.ts"])
+        self.assertNotIn("...", packed.text)
+        self.assertEqual(packed.text.count("--- app/service.py (19 lines) ---"), 1)
+
+    def test_nothing_matched_fills_from_the_top(self):
+        packed = self.packer(budget_tokens=60).pack({"app/service.py": PY_SOURCE}, "quantum flux capacitor")
+        self.assertTrue(packed.spans)
+        self.assertEqual(packed.spans[0].start, 1)
+        self.assertIn("    1| import os", packed.text)
+        starts = [s.start for s in packed.spans]
+        self.assertEqual(starts, sorted(starts))
+        self.assertLessEqual(packed.tokens, 60)
+
+    def test_small_files_are_offered_whole(self):
+        packed = ContextPacker(context_lines=0).pack({"app/service.py": PY_SOURCE}, HINTS)
+        self.assertEqual([(s.start, s.end, s.kind) for s in packed.spans], [(1, 19, "file")])
+
+
+if __name__ == "__main__":
+    unittest.main()
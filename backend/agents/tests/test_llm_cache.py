@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from bedrock_stub import StubBedrockClient
+from llm_cache import LLMCache
+from streaming import json_fields_complete
+
+try:
+    from bedrock_agent import BedrockAgent
+except ImportError:  # boto3 not installed
+    BedrockAgent = None
+
+CONFIG = {"maxTokens": 2000, "temperature": 0.7}
+
+
+class TestCacheKey(unittest.TestCase):
+    def test_key_is_stable(self):
+        first = LLMCache.make_key("model", "system", "prompt", CONFIG)
+        second = LLMCache.make_key("model", "system", "prompt", dict(reversed(list(CONFIG.items()))))
+        self.assertEqual(first, second)
+
+    def test_key_depends_on_every_input(self):
+        base = LLMCache.make_key("model", "system", "prompt", CONFIG)
+        variants = [
+            LLMCache.make_key("other-model", "system", "prompt", CONFIG),
+            LLMCache.make_key("model", "other system", "prompt", CONFIG),
+            LLMCache.make_key("model", "system", "other prompt", CONFIG),
+            LLMCache.make_key("model", "system", "prompt", {**CONFIG, "temperature": 0.0}),
+        ]
+        self.assertEqual(len({base, *variants}), 5)
+
+
+class TestLLMCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_put_get_and_stats(self):
+        cache = LLMCache(self.tmpdir)
+        self.assertIsNone(cache.get("a" * 64))
+        cache.put("a" * 64, "answer", "model")
+        self.assertEqual(cache.get("a" * 64), "answer")
+
+        stats = cache.snapshot()
+        self.assertEqual((stats["hits"], stats["misses"], stats["writes"]), (1, 1, 1))
+        self.assertEqual(stats["hit_rate"], 0.5)
+        self.assertGreater(stats["size_bytes"], 0)
+
+    def test_entries_survive_reopen(self):
+        LLMCache(self.tmpdir).put("b" * 64, "kept")
+        reopened = LLMCache(self.tmpdir)
+        self.assertEqual(reopened.get("b" * 64), "kept")
+        self.assertGreater(reopened.snapshot()["size_bytes"], 0)
+
+    def test_ttl_expiry(self):
+        cache = LLMCache(self.tmpdir, ttl_seconds=60)
+        with mock.patch("llm_cache.time.time", return_value=1000.0):
+            cache.put("c" * 64, "old")
+        with mock.patch("llm_cache.time.time", return_value=1059.0):
+            self.assertEqual(cache.get("c" * 64), "old")
+        with mock.patch("llm_cache.time.time", return_value=1061.0):
+            self.assertIsNone(cache.get("c" * 64))
+        self.assertEqual(cache.snapshot()["expired"], 1)
+        self.assertIsNone(cache.get("c" * 64))  # removed, not just hidden
+
+    def test_least_recently_used_entries_are_evicted(self):
+        response = "x" * 500
+        cache = LLMCache(self.tmpdir, max_bytes=2000)
+        keys = [f"{i:02d}" * 32 for i in range(3)]
+        for i, key in enumerate(keys):
+            cache.put(key, response)
+            os.utime(cache._path(key), (1000 + i, 1000 + i))
+        # A hit makes the oldest entry the most recently used
+        self.assertEqual(cache.get(keys[0]), response)
+
+        cache.put("99" * 32, response)  # over max_bytes: evict down to 90%
+        self.assertEqual(cache.get(keys[0]), response)
+        self.assertIsNone(cache.get(keys[1]))
+        self.assertLessEqual(cache.snapshot()["size_bytes"], 2000 * 0.9)
+        self.assertGreaterEqual(cache.snapshot()["evictions"], 1)
+
+
+@unittest.skipIf(BedrockAgent is None, "boto3 not installed")
+class TestAgentCaching(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        for p in (
+            mock.patch.dict(os.environ, {"BEDROCK_GOVERNOR": "false"}),
+            mock.patch.object(BedrockAgent, "cache", LLMCache(self.tmpdir)),
+            mock.patch.object(BedrockAgent, "_governors", {}),
+        ):
+            p.start()
+            self.addCleanup(p.stop)
+        self.answers = iter(["first", "second", "third"])
+        self.client = StubBedrockClient(lambda prompt, model_id: next(self.answers))
+        self.agent = BedrockAgent("stub-model", client=self.client)
+
+    def test_repeat_prompt_is_served_from_cache(self):
+        self.assertEqual(self.agent.invoke("p"), "first")
+        self.assertEqual(self.agent.invoke("p"), "first")
+        self.assertEqual(len(self.client.calls), 1)
+
+    def test_use_cache_false_bypasses_but_stores(self):
+        self.assertEqual(self.agent.invoke("p"), "first")
+        self.assertEqual(self.agent.invoke("p", use_cache=False), "second")
+        self.assertEqual(self.agent.invoke("p"), "second")
+        self.assertEqual(len(self.client.calls), 2)
+
+    def test_early_stopped_stream_is_not_cached(self):
+        answers = iter(['{"decision": "IGNORE", "reasoning": "noise", "rest": "' + "x" * 200 + '"}'] * 2)
+        self.client.responder = lambda prompt, model_id: next(answers)
+        stop = json_fields_complete("decision", "reasoning")
+
+        self.agent.invoke_stream("p", stop_when=stop)
+        self.assertTrue(self.agent.last_stream["stopped_early"])
+        self.agent.invoke_stream("p", stop_when=stop)
+        self.assertEqual(len(self.client.calls), 2)
+
+    def test_tagged_early_stop_is_cached_for_the_same_tag(self):
+        answers = iter(['{"decision": "IGNORE", "reasoning": "noise", "rest": "' + "x" * 200 + '"}'] * 3)
+        self.client.responder = lambda prompt, model_id: next(answers)
+        stop = json_fields_complete("decision", "reasoning")
+
+        first = self.agent.invoke_stream("p", stop_when=stop, cache_tag="fields:decision,reasoning")
+        self.assertTrue(self.agent.last_stream["stopped_early"])
+        self.assertEqual(self.agent.invoke_stream("p", stop_when=stop, cache_tag="fields:decision,reasoning"), first)
+        self.assertTrue(self.agent.last_stream["cached"])
+        self.assertEqual(len(self.client.calls), 1)
+
+        # The cut-off text is not a complete answer for anyone else...
+        self.assertIn("rest", self.agent.invoke("p"))
+        self.assertEqual(len(self.client.calls), 2)
+        # ...but a complete answer serves every stop condition
+        self.assertIn("rest", self.agent.invoke_stream("p", stop_when=stop, cache_tag="fields:decision"))
+        self.assertEqual(len(self.client.calls), 2)
+
+    def test_complete_stream_is_cached_for_any_caller(self):
+        self.assertEqual(self.agent.invoke_stream("p", stop_when=json_fields_complete("decision")), "first")
+        self.assertEqual(self.agent.invoke("p"), "first")
+        self.assertEqual(len(self.client.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,165 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+from unittest import mock
+
+from tenacity import wait_none
+
+from bedrock_stub import StubBedrockClient, StubClientError
+from model_router import cascade_tiers, json_check, merge_check, patch_applies, CascadeStats
+
+try:
+    from bedrock_agent import BedrockAgent
+except ImportError:  # boto3 not installed
+    BedrockAgent = None
+
+MAPPING = {"small": "vendor.small", "medium": "vendor.medium", "large": "vendor.large"}
+SOURCE = {"src/a.py": "def f():\n    x = 1\n    return x\n"}
+PATCH = (
+    "diff --git a/src/a.py b/src/a.py\n--- a/src/a.py\n+++ b/src/a.py\n"
+    "@@ -1,3 +1,3 @@\n def f():\n-    x = 1\n+    x = 2\n     return x\n"
+)
+
+
+class TestCascadeTiers(unittest.TestCase):
+    def tiers(self, cascade, ceiling):
+        with mock.patch.dict(os.environ, {"MODEL_CASCADE": cascade}):
+            return cascade_tiers(MAPPING, ceiling)
+
+    def test_cheapest_first_up_to_the_agents_model(self):
+        self.assertEqual(self.tiers("small,medium,large", "vendor.large"),
+                         ["vendor.small", "vendor.medium", "vendor.large"])
+        # Tiers above the agent's own model are never used
+        self.assertEqual(self.tiers("small,medium,large", "vendor.medium"), ["vendor.small", "vendor.medium"])
+        self.assertEqual(self.tiers("small, small ,vendor.large", "vendor.large"), ["vendor.small", "vendor.large"])
+
+    def test_model_outside_the_cascade_runs_alone(self):
+        self.assertEqual(self.tiers("small,medium", "vendor.large"), ["vendor.large"])
+
+    def test_cascade_disabled(self):
+        for value in ("false", "off", ""):
+            self.assertEqual(self.tiers(value, "vendor.large"), ["vendor.large"])
+
+
+class TestChecks(unittest.TestCase):
+    def test_json_check_reasons(self):
+        check = json_check(("decision", "reasoning"), min_confidence=0.7)
+        self.assertIsNone(check('```json\n{"decision": "IGNORE", "reasoning": "noise", "confidence": 0.9}\n```'))
+        self.assertTrue(check("no json here").startswith("invalid JSON"))
+        self.assertEqual(check('["decision"]'), "not a JSON object")
+        self.assertEqual(check('{"decision": "IGNORE", "reasoning": ""}'), "missing reasoning")
+        self.assertEqual(check('{"decision": "IGNORE", "reasoning": "x"}'), "no confidence reported")
+        self.assertEqual(check('{"decision": "IGNORE", "reasoning": "x", "confidence": 0.4}'), "confidence 0.40 < 0.70")
+
+    def test_patch_applies(self):
+        self.assertIsNone(patch_applies(PATCH, SOURCE))
+        self.assertEqual(patch_applies("Here is the fix", SOURCE), "not a unified diff")
+        self.assertIn("does not match", patch_applies(PATCH.replace("-    x = 1", "-    y = 1"), SOURCE))
+
+    def test_merge_check(self):
+        check = merge_check(SOURCE["src/a.py"], PATCH, path="src/a.py")
+        self.assertIsNone(check("def f():\n    x = 2\n    return x\n"))
+        self.assertTrue(check(SOURCE["src/a.py"]).startswith("1 added lines missing"))
+        self.assertEqual(merge_check("\n".join(["line"] * 10), PATCH)("    x = 2\n"), "file truncated")
+
+
+class TestCascadeStats(unittest.TestCase):
+    def test_counters_and_log(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        log_path = os.path.join(tmpdir, "cascade.jsonl")
+        stats = CascadeStats(log_path)
+        stats.record("validate", [
+            {"model": "small", "latency_s": 0.5, "outcome": "rejected", "reason": "missing reasoning"},
+            {"model": "large", "latency_s": 2.0, "outcome": "accepted", "reason": None},
+        ])
+        stats.record("validate", [{"model": "small", "latency_s": 0.3, "outcome": "error", "reason": "timeout"}])
+
+        snapshot = stats.snapshot()
+        self.assertEqual({k: snapshot["small"][k] for k in ("calls", "accepted", "rejected", "errors")},
+                         {"calls": 2, "accepted": 0, "rejected": 1, "errors": 1})
+        self.assertEqual(snapshot["small"]["escalation_rate"], 1.0)
+        self.assertEqual(snapshot["small"]["avg_latency_s"], 0.4)
+        self.assertEqual(snapshot["large"]["escalation_rate"], 0.0)
+        with open(log_path) as f:
+            self.assertEqual([json.loads(line)["task"] for line in f], ["validate", "validate"])
+
+
+@unittest.skipIf(BedrockAgent is None, "boto3 not installed")
+class TestInvokeCascade(unittest.TestCase):
+    def setUp(self):
+        for p in (
+            mock.patch.dict(os.environ, {"BEDROCK_GOVERNOR": "false"}),
+            mock.patch.object(BedrockAgent, "cache", None),
+            mock.patch.object(BedrockAgent, "_governors", {}),
+            mock.patch.object(BedrockAgent, "routing", CascadeStats()),
+            mock.patch.object(BedrockAgent._converse_stream.retry, "wait", wait_none()),
+        ):
+            p.start()
+            self.addCleanup(p.stop)
+        self.answers = {}
+        self.client = StubBedrockClient(self.respond)
+        self.agent = BedrockAgent("vendor.large", client=self.client)
+        self.tiers = ["vendor.small", "vendor.medium", "vendor.large"]
+        self.check = json_check(("decision",))
+
+    def respond(self, prompt, model_id):
+        answer = self.answers[model_id]
+        if isinstance(answer, Exception):
+            raise answer
+        return answer
+
+    def models_called(self):
+        return [call["model_id"] for call in self.client.calls]
+
+    def test_first_accepted_answer_wins(self):
+        self.answers = {"vendor.small": '{"decision": "IGNORE"}'}
+        self.assertEqual(self.agent.invoke_cascade("p", self.check, tiers=self.tiers), '{"decision": "IGNORE"}')
+        self.assertEqual(self.models_called(), ["vendor.small"])
+
+    def test_rejection_and_error_both_escalate(self):
+        self.answers = {
+            "vendor.small": "I think it is fine",
+            "vendor.medium": StubClientError("ValidationException"),
+            "vendor.large": '{"decision": "CRITICAL"}',
+        }
+        result = self.agent.invoke_cascade("p", self.check, tiers=self.tiers, task="validate")
+
+        self.assertEqual(result, '{"decision": "CRITICAL"}')
+        self.assertEqual(self.models_called(), self.tiers)
+        attempts = self.agent.last_cascade["attempts"]
+        self.assertEqual([a["outcome"] for a in attempts], ["rejected", "error", "accepted"])
+        self.assertTrue(attempts[0]["reason"].startswith("invalid JSON"))
+        self.assertIn("ValidationException", attempts[1]["reason"])
+
+        routing = BedrockAgent.routing_stats()
+        self.assertEqual(routing["vendor.small"]["rejected"], 1)
+        self.assertEqual(routing["vendor.medium"]["errors"], 1)
+        self.assertEqual(routing["vendor.large"]["accepted"], 1)
+
+    def test_last_tier_answer_is_returned_even_if_rejected(self):
+        self.answers = {"vendor.small": "nope", "vendor.medium": "{}", "vendor.large": '{"other": 1}'}
+        self.assertEqual(self.agent.invoke_cascade("p", self.check, tiers=self.tiers), '{"other": 1}')
+        self.assertEqual([a["reason"] for a in self.agent.last_cascade["attempts"][1:]],
+                         ["missing decision", "missing decision"])
+
+    def test_last_tier_error_propagates(self):
+        self.answers = {"vendor.small": "nope", "vendor.large": StubClientError("AccessDeniedException")}
+        with self.assertRaises(StubClientError):
+            self.agent.invoke_cascade("p", self.check, tiers=["vendor.small", "vendor.large"])
+        # The failed run is still recorded
+        self.assertEqual([a["outcome"] for a in self.agent.last_cascade["attempts"]], ["rejected", "error"])
+        self.assertEqual(BedrockAgent.routing_stats()["vendor.large"]["errors"], 1)
+
+    def test_default_tiers_follow_model_cascade(self):
+        with mock.patch.dict(os.environ, {"MODEL_CASCADE": "false"}):
+            agent = BedrockAgent("vendor.large", client=self.client)
+        self.answers = {"vendor.large": '{"decision": "IGNORE"}'}
+        agent.invoke_cascade("p", self.check)
+        self.assertEqual(self.models_called(), ["vendor.large"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,162 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+import repo_index
+from repo_index import RepoIndex, open_index
+
+SERVICE = '''import logging
+
+logger = logging.getLogger(__name__)
+
+
+class PaymentService:
+    def charge(self, order_id, amount):
+        if amount <= 0:
+            logger.error(f"Payment declined for order {order_id}: invalid amount")
+            return False
+        return self.gateway.submit(order_id, amount)
+
+
+def refund(order_id):
+    logger.warning("Refund requested for unknown order")
+'''
+
+ROUTES = '''export function handleCheckout(req, res) {
+  const total = computeTotal(req.body.items);
+  if (!total) {
+    throw new Error("Checkout failed: cart total is empty");
+  }
+  res.json({ total });
+}
+'''
+
+
+def git(*args, cwd):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+class TestRepoIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.repo = os.path.join(self.tmpdir, "repo")
+        os.makedirs(self.repo)
+        git("init", "--quiet", "-b", "main", cwd=self.repo)
+        git("config", "user.email", "test@example.com", cwd=self.repo)
+        git("config", "user.name", "Test", cwd=self.repo)
+        self.write("app/payments/service.py", SERVICE)
+        self.write("web/routes.js", ROUTES)
+        self.write("README.md", "Payments \"service\" docs\n")
+        self.commit("initial")
+
+        self.index = RepoIndex(self.repo, index_path=os.path.join(self.tmpdir, "index.sqlite"))
+        self.addCleanup(self.index.close)
+
+    def write(self, path, content):
+        full_path = os.path.join(self.repo, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, "w") as f:
+            f.write(content)
+
+    def commit(self, message):
+        git("add", "-A", cwd=self.repo)
+        git("commit", "--quiet", "-m", message, cwd=self.repo)
+        return git("rev-parse", "HEAD", cwd=self.repo)
+
+    def paths(self, table):
+        return sorted(row[0] for row in self.index._query(f"SELECT DISTINCT path FROM {table}"))
+
+    def test_full_build(self):
+        self.assertEqual(self.index.update(), 2)  # source files only
+        self.assertEqual(self.index.update(), 0)  # already at HEAD
+        self.assertEqual(self.index.indexed_head, git("rev-parse", "HEAD", cwd=self.repo))
+        self.assertEqual(self.paths("files"), ["app/payments/service.py", "web/routes.js"])
+
+        self.assertEqual(self.index.find_symbol("charge"), [("app/payments/service.py", "function", 7, 11)])
+        self.assertEqual(self.index.find_symbol("handleCheckout"), [("web/routes.js", "function", 1, 7)])
+        stats = self.index.stats()
+        self.assertEqual(stats["files"], 2)
+        self.assertGreater(stats["literals"], 0)
+
+    def test_incremental_update_after_modify_delete_and_rename(self):
+        self.index.update()
+        self.write("app/payments/service.py", SERVICE.replace("def refund(order_id)", "def issue_refund(order_id)"))
+        os.remove(os.path.join(self.repo, "web/routes.js"))
+        self.write("web/checkout.js", ROUTES)  # rename of routes.js
+        os.remove(os.path.join(self.repo, "README.md"))
+        head = self.commit("change")
+
+        # Renames come as delete + add (both names); removed non-source files count too
+        self.assertEqual(self.index.update(), 4)
+        self.assertEqual(self.index.indexed_head, head)
+        self.assertEqual(self.index.find_symbol("refund"), [])
+        self.assertEqual(self.index.find_symbol("issue_refund")[0][0], "app/payments/service.py")
+        self.assertEqual(self.index.find_symbol("handleCheckout"), [("web/checkout.js", "function", 1, 7)])
+        for table in ("files", "symbols", "identifiers", "literals"):
+            self.assertNotIn("web/routes.js", self.paths(table))
+        self.assertEqual(self.index.locate_log("Checkout failed: cart total is empty")[0][:2], ("web/checkout.js", 4))
+        orphans = self.index._query("SELECT COUNT(*) FROM literal_terms WHERE literal_id NOT IN (SELECT id FROM literals)")
+        self.assertEqual(orphans[0][0], 0)
+
+    def test_rebuild_when_indexed_commit_is_gone(self):
+        self.index.update()
+        with self.index.db:
+            self.index._set_meta("head", "0" * 40)  # e.g. history rewritten by a force push
+        self.index.db.execute("INSERT INTO files (path, sha, lines) VALUES ('stale.py', 'x', 1)")
+
+        self.assertEqual(self.index.update(), 2)
+        self.assertEqual(self.paths("files"), ["app/payments/service.py", "web/routes.js"])
+        self.assertEqual(self.index.indexed_head, git("rev-parse", "HEAD", cwd=self.repo))
+
+    def test_locate_log(self):
+        self.index.update()
+        # Formatted message: the literal's placeholders do not count against it
+        found = self.index.locate_log("Payment declined for order 1234: invalid amount")
+        self.assertEqual(found[0][:2], ("app/payments/service.py", 9))
+        self.assertEqual(found[0][3], 1.0)
+        self.assertEqual(self.index.locate_log("disk quota exceeded on volume"), [])
+
+    def test_enclosing_symbol(self):
+        self.index.update()
+        # Innermost symbol wins; the path may be a stack-frame suffix
+        self.assertEqual(self.index.enclosing_symbol("payments/service.py", 9)[1:3], ("charge", "function"))
+        self.assertEqual(self.index.enclosing_symbol("./web/routes.js", 4)[1], "handleCheckout")
+        self.assertIsNone(self.index.enclosing_symbol("service.py", 3))
+        self.assertIsNone(self.index.enclosing_symbol("other/service.py", 9))
+
+    def test_resolve_path(self):
+        self.index.update()
+        self.assertEqual(self.index.resolve_path("routes.js"), "web/routes.js")
+        self.assertEqual(self.index.resolve_path("./app/payments/service.py"), "app/payments/service.py")
+        self.assertEqual(self.index.resolve_path("/srv/build/app/payments/service.py"), "app/payments/service.py")
+        self.assertIsNone(self.index.resolve_path("missing.py"))
+
+    def test_locate_combines_frames_logs_and_symbols(self):
+        self.index.update()
+        found = self.index.locate('Error: "Checkout failed: cart total is empty"\n    at handleCheckout (web/routes.js:4:11)')
+        self.assertEqual(found[0], {"path": "web/routes.js", "line": 4, "symbol": "handleCheckout", "reason": "stack frame"})
+        self.assertEqual(len(found), 2)  # the log literal on the same line is not repeated
+        self.assertEqual(found[1]["reason"], "function definition")
+
+    def test_open_index_is_shared_per_repository(self):
+        opened = {}
+        with mock.patch.object(repo_index, "_open_indexes", opened), \
+                mock.patch.dict(os.environ, {"REPO_INDEX_DIR": os.path.join(self.tmpdir, "shared")}):
+            first = open_index(self.repo)
+            self.addCleanup(first.close)
+            self.write("app/extra.py", "def extra():\n    return 1\n")
+            self.commit("extra")
+
+            # Same connection for the next agent, brought up to the new HEAD
+            self.assertIs(open_index(self.repo + "/"), first)
+            self.assertEqual(len(opened), 1)
+            self.assertEqual(first.find_symbol("extra")[0][0], "app/extra.py")
+        self.assertIsNone(open_index(self.tmpdir))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,116 @@
+import os
+import unittest
+from unittest import mock
+
+from tenacity import wait_none
+
+from bedrock_stub import StubBedrockClient
+from streaming import json_fields_complete, parse_json_fields, DiffHunkChecker
+
+try:
+    from bedrock_agent import BedrockAgent
+    from concurrency import BedrockStreamError
+except ImportError:  # boto3 not installed
+    BedrockAgent = None
+
+SOURCE = {"src/a.py": "def f():\n    x = 1\n    return x\n"}
+GOOD_PATCH = (
+    "diff --git a/src/a.py b/src/a.py\n--- a/src/a.py\n+++ b/src/a.py\n"
+    "@@ -1,3 +1,3 @@\n def f():\n-    x = 1\n+    x = 2\n     return x\n"
+)
+
+
+class TestDiffHunkChecker(unittest.TestCase):
+    def test_matching_patch_has_no_problems(self):
+        self.assertEqual(DiffHunkChecker(SOURCE).finish(GOOD_PATCH), [])
+
+    def test_feed_stops_once_a_bad_hunk_is_complete(self):
+        bad = GOOD_PATCH.replace("-    x = 1", "-    y = 1")
+        checker = DiffHunkChecker(SOURCE)
+        # The last hunk is only checked once something follows it
+        self.assertFalse(checker.feed(bad))
+        self.assertTrue(checker.feed(bad + "diff --git a/src/b.py b/src/b.py\n"))
+        self.assertEqual(len(checker.problems), 1)
+
+    def test_unknown_files_are_not_checked(self):
+        other = GOOD_PATCH.replace("src/a.py", "src/other.py").replace("-    x = 1", "-    nope")
+        self.assertEqual(DiffHunkChecker(SOURCE).finish(other), [])
+
+
+class TestParseJsonFields(unittest.TestCase):
+    def test_truncated_object(self):
+        text = '```json\n{"decision": "CRITICAL", "reasoning": "db \\"down\\"", "ext'
+        self.assertTrue(json_fields_complete("decision", "reasoning")(text))
+        self.assertEqual(parse_json_fields(text, ("decision", "reasoning")),
+                         {"decision": "CRITICAL", "reasoning": 'db "down"'})
+
+    def test_incomplete_field_is_not_complete(self):
+        self.assertFalse(json_fields_complete("decision", "reasoning")('{"decision": "IGNORE", "reasoning": "no'))
+
+
+@unittest.skipIf(BedrockAgent is None, "boto3 not installed")
+class TestInvokeStream(unittest.TestCase):
+    def setUp(self):
+        patches = [
+            mock.patch.dict(os.environ, {"BEDROCK_GOVERNOR": "false"}),
+            mock.patch.object(BedrockAgent, "cache", None),
+            mock.patch.object(BedrockAgent, "_governors", {}),
+            mock.patch.object(BedrockAgent._converse_stream.retry, "wait", wait_none()),
+        ]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def agent(self, text, **stub_args):
+        client = StubBedrockClient(lambda prompt, model_id: text, **stub_args)
+        return BedrockAgent("stub-model", client=client), client
+
+    def test_stops_once_fields_are_complete(self):
+        text = '{"decision": "CRITICAL", "reasoning": "db refused", "extra": "' + "x" * 400 + '"}'
+        agent, client = self.agent(text, chunk_size=5)
+        result = agent.invoke_stream("p", stop_when=json_fields_complete("decision", "reasoning"))
+
+        stream = client.streams[0]
+        self.assertTrue(stream.closed)
+        self.assertLess(stream.chunks_sent, stream.total_chunks)
+        self.assertTrue(agent.last_stream["stopped_early"])
+        self.assertEqual(parse_json_fields(result, ("decision", "reasoning"))["decision"], "CRITICAL")
+
+    def test_diff_checker_cuts_bad_hunk(self):
+        bad = GOOD_PATCH.replace("-    x = 1", "-    y = 1") + GOOD_PATCH * 10
+        agent, client = self.agent(bad, chunk_size=10)
+        checker = DiffHunkChecker(SOURCE)
+        agent.invoke_stream("p", stop_when=checker.feed)
+
+        stream = client.streams[0]
+        self.assertTrue(stream.closed)
+        self.assertLess(stream.chunks_sent, stream.total_chunks)
+        self.assertEqual(checker.problems, ["src/a.py: hunk at line 1 does not match the file"])
+
+    def test_runs_to_the_end_without_stop_condition(self):
+        agent, client = self.agent(GOOD_PATCH)
+        self.assertEqual(agent.invoke_stream("p"), GOOD_PATCH)
+        self.assertEqual(client.streams[0].chunks_sent, client.streams[0].total_chunks)
+        self.assertFalse(agent.last_stream["stopped_early"])
+
+    def test_streaming_disabled_falls_back_to_converse(self):
+        agent, client = self.agent("plain answer")
+        agent.streaming = False  # what BEDROCK_STREAMING=false sets
+        self.assertEqual(agent.invoke_stream("p", stop_when=json_fields_complete("decision")), "plain answer")
+        self.assertEqual([c["kind"] for c in client.calls], ["converse"])
+        self.assertFalse(agent.last_stream["streamed"])
+
+    def test_stream_exception_event_is_retried(self):
+        agent, client = self.agent("complete answer", stream_errors=["internalServerException"])
+        self.assertEqual(agent.invoke_stream("p"), "complete answer")
+        self.assertEqual(len(client.calls), 2)
+
+    def test_non_retryable_stream_error_fails_at_once(self):
+        agent, client = self.agent("answer", stream_errors=["validationException"])
+        with self.assertRaises(BedrockStreamError):
+            agent.invoke_stream("p")
+        self.assertEqual(len(client.calls), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,129 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+from tenacity import wait_none
+
+from bedrock_stub import StubBedrockClient, StubClientError
+from llm_cache import LLMCache
+
+try:
+    from bedrock_agent import BedrockAgent
+    from validator_agent import ValidatorAgent
+except ImportError:  # boto3 not installed
+    BedrockAgent = None
+
+ANSWER = '{"decision": "IGNORE", "reasoning": "transient blip"}'
+
+
+class FakeResponse:
+    def __init__(self, status_code=200):
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+
+class FakeSession:
+    """Records POSTs to the internal API; batch_status is returned for /review/batch."""
+
+    def __init__(self, batch_status=200):
+        self.batch_status = batch_status
+        self.posts = []
+        self._lock = threading.Lock()
+
+    def post(self, url, json=None, timeout=None):
+        with self._lock:
+            self.posts.append((url.rsplit("/anomalies/", 1)[1], json))
+        return FakeResponse(self.batch_status if url.endswith("/batch") else 200)
+
+
+@unittest.skipIf(BedrockAgent is None, "boto3 not installed")
+class TestValidatorConcurrency(unittest.TestCase):
+    def setUp(self):
+        self.throttles = {}
+        self.client = StubBedrockClient(self.respond)
+        env = {"BEDROCK_GOVERNOR": "false", "VALIDATOR_CONCURRENCY": "2", "VALIDATOR_MAX_CONCURRENCY": "2",
+               "VALIDATOR_REVIEW_BATCH": "2", "VALIDATOR_REVIEW_FLUSH": "30"}
+        for p in (
+            mock.patch.dict(os.environ, env),
+            mock.patch.object(BedrockAgent, "cache", None),
+            mock.patch.object(BedrockAgent, "_governors", {}),
+            mock.patch.object(BedrockAgent, "shared_client", return_value=self.client),
+            mock.patch.object(BedrockAgent._converse_stream.retry, "wait", wait_none()),
+        ):
+            p.start()
+            self.addCleanup(p.stop)
+        self.agent = ValidatorAgent()
+        self.agent.http = FakeSession()
+        self.anomalies = [{"id": f"a{i}", "serviceId": "api"} for i in range(5)]
+
+    def respond(self, prompt, model_id):
+        for anomaly_id, left in self.throttles.items():
+            if f'"id": "{anomaly_id}"' in prompt and left:
+                self.throttles[anomaly_id] -= 1
+                raise StubClientError("ThrottlingException")
+        return ANSWER
+
+    def run_concurrent(self):
+        self.agent.run_concurrent(self.anomalies, self.agent._review_one, lambda a: [a["id"]])
+
+    def saved(self):
+        ids = []
+        for endpoint, body in self.agent.http.posts:
+            ids.extend([r["id"] for r in body["reviews"]] if endpoint == "review/batch" else [body["id"]])
+        return sorted(ids)
+
+    def test_throttled_task_is_requeued(self):
+        # Throttled through all three in-call attempts once, then served
+        self.throttles = {"a2": 3}
+        self.run_concurrent()
+
+        self.assertEqual(self.saved(), ["a0", "a1", "a2", "a3", "a4"])
+        self.assertEqual(len(self.client.calls), 5 + 3)
+        self.assertEqual(self.agent.model_calls, 5 + 1)
+
+    def test_task_fails_after_throttle_retries(self):
+        self.throttles = {"a2": 100}
+        self.run_concurrent()
+
+        self.assertEqual(self.saved(), ["a0", "a1", "a3", "a4"])
+        # One run plus throttle_retries requeues, three attempts each
+        self.assertEqual(len(self.client.calls), 4 + 3 * 3)
+
+    def test_reviews_are_saved_in_batches(self):
+        self.client.delay = 0.005  # results arrive over time, not all at once
+        self.run_concurrent()
+
+        endpoints = [endpoint for endpoint, _ in self.agent.http.posts]
+        self.assertEqual(set(endpoints), {"review/batch"})
+        self.assertGreaterEqual(len(endpoints), 2)  # flushed every review_batch_size results, not only at the end
+        self.assertEqual(self.saved(), ["a0", "a1", "a2", "a3", "a4"])
+        self.assertEqual(self.agent.model_calls, 5)
+
+    def test_repeated_review_is_served_from_cache(self):
+        tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tmpdir)
+        self.client.responder = lambda prompt, model_id: ANSWER[:-1] + ', "notes": "' + "x" * 200 + '"}'
+        with mock.patch.object(BedrockAgent, "cache", LLMCache(tmpdir)):
+            first = self.agent.review(self.anomalies[0])
+            second = self.agent.review(self.anomalies[0])
+
+        self.assertEqual(first, ("IGNORE", "transient blip"))
+        self.assertEqual(second, first)
+        self.assertEqual(len(self.client.calls), 1)
+        self.assertTrue(self.client.streams[0].closed)  # stopped early, and still cached
+
+    def test_failed_batch_falls_back_to_single_reviews(self):
+        self.agent.http = FakeSession(batch_status=404)
+        self.agent.save_reviews([{"id": "a0", "decision": "IGNORE", "reasoning": "x"},
+                                 {"id": "a1", "decision": "CRITICAL", "reasoning": "y"}])
+        self.assertEqual([endpoint for endpoint, _ in self.agent.http.posts], ["review/batch", "review", "review"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,104 @@
+import os
+import shutil
+import subprocess
+import tempfile
+import unittest
+from unittest import mock
+
+from worktree_pool import WorktreePool
+
+
+def git(*args, cwd):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+class TestWorktreePool(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tmpdir)
+        self.repo = os.path.join(self.tmpdir, "repo")
+        self.pool_dir = os.path.join(self.tmpdir, "pool")
+        os.makedirs(self.repo)
+        git("init", "--quiet", "-b", "main", cwd=self.repo)
+        git("config", "user.email", "test@example.com", cwd=self.repo)
+        git("config", "user.name", "Test", cwd=self.repo)
+        self.commit("app.py", "print('v1')\n")
+
+    def commit(self, name, content):
+        with open(os.path.join(self.repo, name), "w") as f:
+            f.write(content)
+        git("add", name, cwd=self.repo)
+        git("commit", "--quiet", "-m", f"update {name}", cwd=self.repo)
+        return git("rev-parse", "HEAD", cwd=self.repo)
+
+    def pool(self, **kwargs):
+        # No remote in the temp repo: base_commit falls back to the local branch
+        return WorktreePool(self.repo, pool_dir=self.pool_dir, **kwargs)
+
+    def slot_locks(self):
+        return sorted(name for name in os.listdir(self.pool_dir) if name.startswith("wt-") and name.endswith(".lock"))
+
+    def test_concurrent_leases_get_different_slots(self):
+        pool = self.pool()
+        with pool.lease("fix-a") as first, pool.lease("fix-b") as second:
+            self.assertNotEqual(first, second)
+            self.assertEqual(git("rev-parse", "--abbrev-ref", "HEAD", cwd=first), "fix-a")
+            self.assertEqual(git("rev-parse", "--abbrev-ref", "HEAD", cwd=second), "fix-b")
+            self.assertEqual(pool.stats()["busy"], 2)
+        self.assertEqual(pool.stats()["idle"], 2)
+
+    def test_released_slot_is_reused_clean_and_detached(self):
+        pool = self.pool()
+        with pool.lease("fix-a") as first:
+            with open(os.path.join(first, "scratch.txt"), "w") as f:
+                f.write("left behind")
+            with open(os.path.join(first, "app.py"), "w") as f:
+                f.write("print('edited')\n")
+        self.assertEqual(git("rev-parse", "--abbrev-ref", "HEAD", cwd=first), "HEAD")
+        # The branch is free again, e.g. for the main checkout
+        git("checkout", "--quiet", "fix-a", cwd=self.repo)
+        git("checkout", "--quiet", "main", cwd=self.repo)
+
+        with pool.lease("fix-b") as second:
+            self.assertEqual(second, first)
+            self.assertFalse(os.path.exists(os.path.join(second, "scratch.txt")))
+            with open(os.path.join(second, "app.py")) as f:
+                self.assertEqual(f.read(), "print('v1')\n")
+
+    def test_slots_beyond_pool_size_are_removed(self):
+        with mock.patch.dict(os.environ, {"WORKTREE_POOL_SIZE": "1", "WORKTREE_DIR": self.pool_dir}):
+            pool = WorktreePool.from_env(self.repo)
+        self.pool_dir = pool.pool_dir
+        first = pool.acquire("fix-a")
+        second = pool.acquire("fix-b")
+        self.assertEqual(len(self.slot_locks()), 2)
+
+        pool.release(*first)
+        pool.release(*second)
+        self.assertEqual(pool.stats()["worktrees"], 1)
+        self.assertFalse(os.path.exists(second[0]))
+        self.assertEqual(self.slot_locks(), [os.path.basename(first[0]) + ".lock"])
+        self.assertNotIn(second[0], git("worktree", "list", cwd=self.repo))
+
+        self.assertEqual(pool.cleanup(), 1)
+        self.assertEqual(self.slot_locks(), [])
+
+    def test_base_commit_is_cached_within_ttl(self):
+        first = self.commit("app.py", "print('v2')\n")
+        pool = self.pool(base_ttl=300.0)
+        self.assertEqual(pool.base_commit(), first)
+        self.assertEqual(git("rev-parse", "refs/night-agent/base/main", cwd=self.repo), first)
+
+        second = self.commit("app.py", "print('v3')\n")
+        self.assertEqual(pool.base_commit(), first)
+        # The stamp is shared: another pool instance sees the same cached commit
+        self.assertEqual(self.pool(base_ttl=300.0).base_commit(), first)
+        with pool.lease("fix-a") as path:
+            self.assertEqual(git("rev-parse", "HEAD", cwd=path), first)
+
+        self.assertEqual(self.pool(base_ttl=0.0).base_commit(), second)
+        self.assertEqual(git("rev-parse", "refs/night-agent/base/main", cwd=self.repo), second)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,21 +1,55 @@
 
 from bedrock_agent import BedrockAgent
-import requests
+from concurrency import AdaptiveLimiter, is_throttle_error
+from anomaly_groups import cluster_anomalies, summaries_json
+from streaming import json_fields_complete, json_value_complete, first_json_value, parse_json_fields
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 import json
 import logging
 import os
+import time
+import threading
 
 class ValidatorAgent(BedrockAgent):
+    CRITERIA = """
+        STRICT FILTERING CRITERIA:
+        Mark as CRITICAL *ONLY* if the logs show one of these specific issues:
+        1. API Validation Errors (e.g. 400 Bad Request with validation details).
+        2. Application Server is down or restarting unexpectedly.
+        3. Database Connection failures (ORM errors, connection refused).
+        4. Critical Service-to-Service connection failures.
+        
+        IGNORE everything else, including:
+        - Single 404s or 500s without clear pattern.
+        - "Novelty" anomalies just because a log is new.
+        - Warnings or Info logs.
+        - Transient network blips.
+        """
+
     def __init__(self):
         super().__init__(model_name="gemma_3_12b_it")
         # specific to Kestra in Docker, but allow override
         self.api_url = os.getenv("API_URL", "http://localhost:3001/api/internal")
+        # Concurrent mode (VALIDATOR_CONCURRENCY=1 keeps the sequential loop)
+        self.concurrency = int(os.getenv("VALIDATOR_CONCURRENCY", "4"))
+        self.max_concurrency = int(os.getenv("VALIDATOR_MAX_CONCURRENCY", "16"))
+        self.review_batch_size = int(os.getenv("VALIDATOR_REVIEW_BATCH", "20"))
+        self.review_flush_interval = float(os.getenv("VALIDATOR_REVIEW_FLUSH", "2"))
+        self.throttle_retries = 2
+        # Cluster-then-validate: one decision per (service, type, template) group,
+        # several groups packed into one prompt
+        self.clustering = os.getenv("VALIDATOR_CLUSTERING", "true").lower() != "false"
+        self.groups_per_prompt = int(os.getenv("VALIDATOR_GROUPS_PER_PROMPT", "5"))
+        self.model_calls = 0
+        self._calls_lock = threading.Lock()  # reviews run on the run_concurrent pool threads
+        # Streamed single reviews stop once decision and reasoning are complete
+        self.decision_complete = json_fields_complete("decision", "reasoning")
 
     def run(self):
         self.logger.info("Fetching pending anomalies...")
         try:
             # In Kestra, we might pass this as input, but for script we fetch
-            res = requests.get(f"{self.api_url}/anomalies/pending")
+            res = self.http.get(f"{self.api_url}/anomalies/pending")
             anomalies = res.json()
         except Exception as e:
             self.logger.error(f"Failed to fetch anomalies: {e}")
@@ -23,29 +57,170 @@ class ValidatorAgent(BedrockAgent):
 
         self.logger.info(f"Validating {len(anomalies)} anomalies...")
         
-        for anomaly in anomalies:
-            self.validate(anomaly)
+        if not self.clustering:
+            if self.concurrency > 1 and len(anomalies) > 1:
+                self.run_concurrent(anomalies, self._review_one, lambda a: [a['id']])
+                return
+            for anomaly in anomalies:
+                self.validate(anomaly)
+            return
+
+        groups = cluster_anomalies(anomalies)
+        size = max(1, self.groups_per_prompt)
+        chunks = [groups[i:i + size] for i in range(0, len(groups), size)]
+        print(f"INFO:ValidatorAgent:{len(anomalies)} anomalies -> {len(groups)} groups -> {len(chunks)} prompts")
+
+        if self.concurrency > 1 and len(chunks) > 1:
+            self.run_concurrent(chunks, self.review_groups, lambda c: [a['id'] for g in c for a in g.members])
+        else:
+            for chunk in chunks:
+                self.submit_reviews(self.review_groups(chunk))
+        print(f"INFO:ValidatorAgent:{self.model_calls} model calls for {len(anomalies)} anomalies")
+
+    def run_concurrent(self, tasks, review_fn, ids_of):
+        """
+        Run review_fn over tasks on a thread pool whose effective size adapts to
+        Bedrock throttling. review_fn returns a list of review dicts; they are posted
+        in batches as they complete (every review_batch_size results or
+        review_flush_interval seconds, whichever comes first).
+        """
+        limiter = AdaptiveLimiter(initial=self.concurrency, max_limit=max(self.concurrency, self.max_concurrency))
+        self.throttle_listener = limiter.on_throttle
+        attempts = {}
+        reviews = []
+        failed = 0
+        last_flush = time.monotonic()
+        started = last_flush
+
+        with ThreadPoolExecutor(max_workers=limiter.max_limit, thread_name_prefix="validator") as pool:
+            futures = {pool.submit(self._review_limited, limiter, review_fn, t): t for t in tasks}
+            while futures:
+                done, _ = wait(futures, timeout=self.review_flush_interval, return_when=FIRST_COMPLETED)
+                for future in done:
+                    task = futures.pop(future)
+                    try:
+                        reviews.extend(future.result())
+                    except Exception as e:
+                        tries = attempts.get(id(task), 0)
+                        if is_throttle_error(e) and tries < self.throttle_retries:
+                            # Requeued behind the (now smaller) limit instead of failing
+                            attempts[id(task)] = tries + 1
+                            futures[pool.submit(self._review_limited, limiter, review_fn, task)] = task
+                        else:
+                            failed += 1
+                            print(f"ERROR:ValidatorAgent:Validation of {', '.join(ids_of(task))} failed: {e}")
+
+                if reviews and (len(reviews) >= self.review_batch_size
+                                or time.monotonic() - last_flush >= self.review_flush_interval):
+                    self.save_reviews(reviews)
+                    reviews = []
+                    last_flush = time.monotonic()
+
+        if reviews:
+            self.save_reviews(reviews)
+
+        stats = limiter.snapshot()
+        print(f"INFO:ValidatorAgent:Completed {len(tasks) - failed}/{len(tasks)} tasks in "
+              f"{time.monotonic() - started:.1f}s (concurrency {stats['limit']}, peak {stats['peak_limit']}, "
+              f"throttles {stats['throttles']})")
+
+    def _review_limited(self, limiter, review_fn, task):
+        with limiter:
+            result = review_fn(task)
+        limiter.on_success()
+        return result
+
+    def _count_call(self):
+        with self._calls_lock:
+            self.model_calls += 1
+
+    def _review_one(self, anomaly):
+        result = self.review(anomaly)
+        if not result:
+            return []
+        return [{"id": anomaly['id'], "decision": result[0], "reasoning": result[1]}]
+
+    def review_groups(self, groups):
+        """
+        Decide a chunk of groups and fan each decision out to every member.
+        A single group is validated through its representative; several groups
+        share one prompt. Groups the packed answer misses fall back to their representative.
+        """
+        decisions = {}
+        if len(groups) > 1:
+            decisions = self.review_packed(groups)
+        for i, group in enumerate(groups):
+            if i not in decisions:
+                result = self.review(group.representative)
+                if result:
+                    decisions[i] = result
+
+        reviews = []
+        for i, group in enumerate(groups):
+            if i not in decisions:
+                continue
+            decision, reasoning = decisions[i]
+            rep_id = group.representative['id']
+            for anomaly in group.members:
+                note = "" if anomaly['id'] == rep_id else f" (group decision from {rep_id}, {len(group)} similar anomalies)"
+                reviews.append({"id": anomaly['id'], "decision": decision, "reasoning": reasoning + note})
+        return reviews
+
+    def review_packed(self, groups):
+        """One prompt for several group summaries; returns {group index: (decision, reasoning)}."""
+        print(f"INFO:ValidatorAgent:Validating {len(groups)} anomaly groups in one prompt...")
+        prompt = f"""
+        You are a Principal Site Reliability Engineer (SRE).
+        Each item below is a GROUP of identical anomalies (same service, type and log template).
+        For EACH group decide if it is a REAL CRITICAL INCIDENT or just noise.
+        {self.CRITERIA}
+        GROUPS:
+        {summaries_json(groups)}
+        
+        OUTPUT FORMAT:
+        Return a valid JSON array only, one object per group, in any order.
+        [
+            {{"group": 0, "decision": "CRITICAL" | "IGNORE", "reasoning": "Brief explanation"}}
+        ]
+        """
+
+        self._count_call()
+        # Stop as soon as the array closes - anything after it is commentary
+        response_text = self.invoke_stream(prompt, stop_when=json_value_complete, cache_tag="json-value")
+        if not response_text: return {}
+
+        try:
+            items = first_json_value(response_text)
+            if isinstance(items, dict):
+                items = items.get('groups') or items.get('results') or []
+            decisions = {}
+            for item in items:
+                index = int(item.get('group', -1))
+                if 0 <= index < len(groups) and item.get('decision') in ('CRITICAL', 'IGNORE'):
+                    decisions[index] = (item['decision'], item.get('reasoning', 'No reasoning provided'))
+            for index, (decision, reasoning) in decisions.items():
+                group = groups[index]
+                print(f"INFO:ValidatorAgent:Service: {group.service} | Group of {len(group)} ({group.anomaly_type}) -> {decision} | {reasoning[:50]}...")
+            return decisions
+
+        except Exception as e:
+            print(f"ERROR:ValidatorAgent:Failed to parse packed LLM response: {e}")
+            print(f"DEBUG:ValidatorAgent:Raw Response: {response_text}")
+            return {}
 
     def validate(self, anomaly):
+        result = self.review(anomaly)
+        if result:
+            self.save_review(anomaly['id'], *result)
+
+    def review(self, anomaly):
+        """Ask the LLM for a decision; returns (decision, reasoning) or None if unparseable."""
         print(f"INFO:ValidatorAgent:Validating anomaly {anomaly['id']}...")
         
         prompt = f"""
         You are a Principal Site Reliability Engineer (SRE).
         Your job is to VALIDATE if a reported anomaly is a REAL CRITICAL INCIDENT or just noise.
-        
-        STRICT FILTERING CRITERIA:
-        Mark as CRITICAL *ONLY* if the logs show one of these specific issues:
-        1. API Validation Errors (e.g. 400 Bad Request with validation details).
-        2. Application Server is down or restarting unexpectedly.
-        3. Database Connection failures (ORM errors, connection refused).
-        4. Critical Service-to-Service connection failures.
-        
-        IGNORE everything else, including:
-        - Single 404s or 500s without clear pattern.
-        - "Novelty" anomalies just because a log is new.
-        - Warnings or Info logs.
-        - Transient network blips.
-        
+        {self.CRITERIA}
         CONTEXT:
         {json.dumps(anomaly, indent=2)}
         
@@ -59,27 +234,24 @@ class ValidatorAgent(BedrockAgent):
         }}
         """
         
-        response_text = self.invoke(prompt)
-        if not response_text: return
+        self._count_call()
+        # The decision is all we need: stop once both fields are closed
+        response_text = self.invoke_stream(prompt, stop_when=self.decision_complete,
+                                           cache_tag="fields:decision,reasoning")
+        if not response_text: return None
 
         try:
-            # Simple cleanup if the model acts up
-            if "```json" in response_text:
-                response_text = response_text.split("```json")[1].split("```")[0].strip()
-            elif "```" in response_text:
-                 response_text = response_text.split("```")[1].split("```")[0].strip()
-
-            result = json.loads(response_text)
+            result = parse_json_fields(response_text, ("decision", "reasoning"))
             decision = result.get('decision', 'IGNORE')
             reasoning = result.get('reasoning', 'No reasoning provided')
             
             print(f"INFO:ValidatorAgent:Service: {anomaly.get('serviceId')} | Anomaly {anomaly['id']} -> {decision} | {reasoning[:50]}...")
-            
-            self.save_review(anomaly['id'], decision, reasoning)
+            return decision, reasoning
 
         except Exception as e:
             print(f"ERROR:ValidatorAgent:Failed to parse LLM response: {e}")
             print(f"DEBUG:ValidatorAgent:Raw Response: {response_text}")
+            return None
 
     def save_review(self, anomaly_id, decision, reasoning):
         payload = {
@@ -88,11 +260,29 @@ class ValidatorAgent(BedrockAgent):
             "reasoning": reasoning
         }
         try:
-            res = requests.post(f"{self.api_url}/anomalies/review", json=payload)
+            res = self.http.post(f"{self.api_url}/anomalies/review", json=payload)
             res.raise_for_status()
             print(f"INFO:ValidatorAgent:Review saved: {res.status_code}")
         except Exception as e:
             print(f"ERROR:ValidatorAgent:Review failed ({getattr(e.response, 'status_code', 'N/A')}): {getattr(e.response, 'text', str(e))}")
 
+    def submit_reviews(self, reviews):
+        if len(reviews) == 1:
+            review = reviews[0]
+            self.save_review(review['id'], review['decision'], review['reasoning'])
+        elif reviews:
+            self.save_reviews(reviews)
+
+    def save_reviews(self, reviews):
+        """Submit several reviews in one request; falls back to one POST per review."""
+        try:
+            res = self.http.post(f"{self.api_url}/anomalies/review/batch", json={"reviews": reviews}, timeout=30)
+            res.raise_for_status()
+            print(f"INFO:ValidatorAgent:Saved {len(reviews)} reviews in one batch")
+        except Exception as e:
+            print(f"WARN:ValidatorAgent:Batch review failed ({e}), saving individually")
+            for review in reviews:
+                self.save_review(review['id'], review['decision'], review['reasoning'])
+
 if __name__ == "__main__":
     ValidatorAgent().run()
@@ -0,0 +1,264 @@
+import os
+import re
+import sys
+import json
+import time
+import uuid
+import shutil
+import hashlib
+import logging
+import subprocess
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not on POSIX: worktrees cannot be claimed safely across processes
+    fcntl = None
+
+
+def default_pool_dir(repo_path):
+    """Worktree pool location outside the repository (one pool per repository)."""
+    base = os.getenv("WORKTREE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "night-agent", "worktrees"))
+    digest = hashlib.sha1(os.path.realpath(repo_path).encode()).hexdigest()[:12]
+    return os.path.join(base, f"{os.path.basename(os.path.realpath(repo_path))}-{digest}")
+
+
+def sandbox_enabled():
+    """FIX_SANDBOX=worktree: apply/merge jobs run in pooled git worktrees instead of the repo checkout."""
+    return os.getenv("FIX_SANDBOX", "").lower() in ("worktree", "true", "1")
+
+
+class WorktreePool:
+    """
+    Pool of `git worktree`s of one repository, so several fixes can be applied
+    (and validated) at the same time without touching the main checkout.
+
+    - Base commits are cached locally: origin/<branch> is fetched at most once
+      per base_ttl seconds into refs/night-agent/base/<branch>, and every
+      worktree starts from that commit
+    - A worktree is claimed with a non-blocking flock on <slot>.lock, so claims
+      are exclusive across threads and processes and die with a crashed holder
+    - On release a worktree is reset, cleaned and detached (freeing its branch)
+      and kept for reuse; beyond max_idle idle worktrees it is removed
+    """
+
+    def __init__(self, repo_path, pool_dir=None, max_idle=4, base_ttl=300.0, remote="origin"):
+        self.repo_path = os.path.realpath(repo_path)
+        self.pool_dir = pool_dir or default_pool_dir(repo_path)
+        self.max_idle = max_idle
+        self.base_ttl = base_ttl
+        self.remote = remote
+        self.logger = logging.getLogger("WorktreePool")
+        os.makedirs(self.pool_dir, exist_ok=True)
+
+    @classmethod
+    def from_env(cls, repo_path):
+        return cls(
+            repo_path,
+            max_idle=int(os.getenv("WORKTREE_POOL_SIZE", "4")),
+            base_ttl=float(os.getenv("WORKTREE_BASE_TTL", "300")),
+        )
+
+    def _git(self, *args, cwd=None, check=True):
+        return subprocess.run(["git", *args], cwd=cwd or self.repo_path, check=check,
+                              capture_output=True, text=True)
+
+    @contextmanager
+    def _locked(self, name):
+        """Exclusive cross-process lock on <pool_dir>/<name>.lock (blocking)."""
+        with open(os.path.join(self.pool_dir, f"{name}.lock"), "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def default_branch(self):
+        """main if it exists, else master (same heuristic as the agents' checkout)."""
+        for branch in ("main", "master"):
+            if self._git("rev-parse", "--verify", "--quiet", f"refs/heads/{branch}", check=False).returncode == 0:
+                return branch
+        return "main"
+
+    def base_commit(self, branch=None):
+        """
+        Commit new worktrees start from: the remote branch, fetched at most once per
+        base_ttl (shared by all processes), or the local branch when fetching fails.
+        """
+        branch = branch or self.default_branch()
+        ref = f"refs/night-agent/base/{branch}"
+        stamp_path = os.path.join(self.pool_dir, f"base-{re.sub(r'[^A-Za-z0-9_.-]', '_', branch)}.json")
+        with self._locked("base"):
+            try:
+                with open(stamp_path) as f:
+                    stamp = json.load(f)
+            except (OSError, ValueError):
+                stamp = {}
+            if stamp.get("commit") and time.time() - stamp.get("fetched_at", 0) < self.base_ttl:
+                return stamp["commit"]
+
+            fetched = self._git("fetch", "--quiet", self.remote, branch, check=False)
+            if fetched.returncode == 0:
+                commit = self._git("rev-parse", "FETCH_HEAD").stdout.strip()
+                local = self._git("rev-parse", "--verify", "--quiet", f"refs/heads/{branch}", check=False).stdout.strip()
+                # Local commits not pushed yet win over an older remote tip
+                if local and self._git("merge-base", "--is-ancestor", commit, local, check=False).returncode == 0:
+                    commit = local
+            else:
+                self.logger.info(f"Fetching {self.remote}/{branch} failed, using the local branch")
+                commit = self._git("rev-parse", f"refs/heads/{branch}").stdout.strip()
+
+            self._git("update-ref", ref, commit)
+            with open(stamp_path, "w") as f:
+                json.dump({"commit": commit, "fetched_at": time.time()}, f)
+            return commit
+
+    def _slots(self):
+        return sorted(name for name in os.listdir(self.pool_dir)
+                      if name.startswith("wt-") and os.path.isdir(os.path.join(self.pool_dir, name)))
+
+    def _claim(self, slot):
+        """Open file holding the slot's lock, or None if another holder has it."""
+        lock = open(os.path.join(self.pool_dir, f"{slot}.lock"), "a")
+        if fcntl:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                lock.close()
+                return None
+        return lock
+
+    def _claim_worktree(self, commit):
+        """Claim an idle worktree (or add one at commit), reset and cleaned. Returns (path, lock)."""
+        with self._locked("pool"):
+            for slot in self._slots():
+                lock = self._claim(slot)
+                if not lock:
+                    continue
+                path = os.path.join(self.pool_dir, slot)
+                try:
+                    self._git("reset", "--hard", "--quiet", cwd=path)
+                    self._git("clean", "-fdq", cwd=path)
+                    self.logger.info(f"Reusing worktree {slot}")
+                    return path, lock
+                except subprocess.CalledProcessError:
+                    # Broken slot (e.g. pruned from git's side): drop it and keep looking
+                    self.logger.warning(f"Discarding broken worktree {slot}")
+                    self._remove(path)
+                    lock.close()
+
+            slot = f"wt-{uuid.uuid4().hex[:10]}"
+            path = os.path.join(self.pool_dir, slot)
+            lock = self._claim(slot)
+            try:
+                self._git("worktree", "add", "--detach", "--quiet", path, commit)
+            except subprocess.CalledProcessError:
+                lock.close()
+                raise
+            self.logger.info(f"Created worktree {slot}")
+            return path, lock
+
+    def _remove(self, path):
+        """Remove a claimed slot: worktree, directory and its lock file (caller holds the pool lock)."""
+        self._git("worktree", "remove", "--force", path, check=False)
+        shutil.rmtree(path, ignore_errors=True)
+        self._git("worktree", "prune", check=False)
+        try:
+            os.remove(f"{path}.lock")
+        except OSError:
+            pass
+
+    def acquire(self, branch_name, base_branch=None):
+        """
+        Claim a worktree (reused or new) with branch_name checked out.
+        A new branch starts from the cached base commit; an existing one is reused as is.
+        Returns (path, lock handle) - pass both to release().
+        """
+        base = self.base_commit(base_branch)
+        path, lock = self._claim_worktree(base)
+        try:
+            if self._git("rev-parse", "--verify", "--quiet", f"refs/heads/{branch_name}", check=False).returncode == 0:
+                self._git("checkout", "--quiet", branch_name, cwd=path)
+            else:
+                self._git("checkout", "--quiet", "-b", branch_name, base, cwd=path)
+        except subprocess.CalledProcessError:
+            self.release(path, lock)
+            raise
+        return path, lock
+
+    def detached(self, commit):
+        """Claim a worktree detached at commit (e.g. to merge into a branch checked out elsewhere)."""
+        path, lock = self._claim_worktree(commit)
+        try:
+            self._git("checkout", "--quiet", "--detach", commit, cwd=path)
+        except subprocess.CalledProcessError:
+            self.release(path, lock)
+            raise
+        return path, lock
+
+    def release(self, path, lock):
+        """Reset and detach the worktree, then keep it for reuse or remove it if the pool is full."""
+        try:
+            self._git("reset", "--hard", "--quiet", cwd=path, check=False)
+            self._git("clean", "-fdq", cwd=path, check=False)
+            # Detaching frees the branch for other worktrees (and the main checkout)
+            self._git("checkout", "--quiet", "--detach", cwd=path, check=False)
+            with self._locked("pool"):
+                idle = sum(1 for slot in self._slots() if self._is_idle(slot))
+                if idle >= self.max_idle:
+                    self._remove(path)
+                    self.logger.info(f"Removed worktree {os.path.basename(path)} (pool full)")
+        finally:
+            lock.close()
+
+    def _is_idle(self, slot):
+        lock = self._claim(slot)
+        if lock:
+            lock.close()
+            return True
+        return False
+
+    @contextmanager
+    def lease(self, branch_name, base_branch=None):
+        """with pool.lease(branch) as path: ... - a claimed worktree on branch, released afterwards."""
+        path, lock = self.acquire(branch_name, base_branch)
+        try:
+            yield path
+        finally:
+            self.release(path, lock)
+
+    def cleanup(self):
+        """Remove every idle worktree and prune worktrees whose directory is gone."""
+        removed = 0
+        with self._locked("pool"):
+            for slot in self._slots():
+                lock = self._claim(slot)
+                if not lock:
+                    continue
+                try:
+                    self._remove(os.path.join(self.pool_dir, slot))
+                    removed += 1
+                finally:
+                    lock.close()
+            self._git("worktree", "prune", check=False)
+        return removed
+
+    def stats(self):
+        # Under the pool lock: probing a slot being removed would recreate its lock file
+        with self._locked("pool"):
+            slots = self._slots()
+            idle = sum(1 for slot in slots if self._is_idle(slot))
+        return {"worktrees": len(slots), "idle": idle, "busy": len(slots) - idle, "pool_dir": self.pool_dir}
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if len(sys.argv) < 3 or sys.argv[2] not in ("stats", "cleanup"):
+        print("Usage: python worktree_pool.py <repo_path> stats|cleanup")
+        sys.exit(1)
+    pool = WorktreePool.from_env(sys.argv[1])
+    if sys.argv[2] == "cleanup":
+        print(f"Removed {pool.cleanup()} idle worktrees")
+    print(json.dumps(pool.stats()))
@@ -273,6 +273,12 @@ export class FrontendController {
         }
     }
 
+    @Post('fix/:id/validation')
+    async reportValidation(@Param('id') id: string, @Body() body: { passed: boolean, status: string, output?: string }) {
+        await this.anomalyService.recordValidation(id, body);
+        return { status: body.passed ? 'validated' : 'validation_failed' };
+    }
+
     @Post('fix/:id/refine')
     async refineFix(@Param('id') id: string, @Body() body: { instruction: string }) {
         try {
@@ -10,6 +10,11 @@ export class InternalController {
         return this.anomalyService.getPendingAnomalies();
     }
 
+    @Get('anomalies/validated')
+    async getValidatedAnomalies() {
+        return this.anomalyService.getValidatedAnomalies();
+    }
+
     @Get('anomalies/:id')
     async getAnomaly(@Param('id') id: string) {
         const anomaly = await this.anomalyService.getAnomaly(id);
@@ -30,11 +35,21 @@ export class InternalController {
         return this.anomalyService.processJudgeReview(review);
     }
 
+    @Post('anomalies/review/batch')
+    async reviewAnomalies(@Body() dto: { reviews: { id: string, decision: 'CRITICAL' | 'IGNORE', reasoning: string, analysis?: any }[] }) {
+        return this.anomalyService.processJudgeReviews(dto.reviews || []);
+    }
+
     @Post('anomalies/analysis')
     async submitAnalysis(@Body() dto: { id: string, analysis: any }) {
         return this.anomalyService.saveAnalysis(dto.id, dto.analysis);
     }
 
+    @Post('anomalies/analysis/batch')
+    async submitAnalyses(@Body() dto: { analyses: { id: string, analysis: any }[] }) {
+        return this.anomalyService.saveAnalyses(dto.analyses || []);
+    }
+
     @Post('anomalies/proposal')
     async submitProposal(@Body() dto: { id: string, analysis: string, patch: string, status: string }) {
         return this.anomalyService.saveProposal(dto);
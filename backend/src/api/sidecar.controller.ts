@@ -1,4 +1,4 @@
-import { Controller, Post, Body, Inject, Headers, UnauthorizedException } from '@nestjs/common';
+import { Controller, Post, Get, Param, Body, Inject, Headers, UnauthorizedException } from '@nestjs/common';
 import { AnomalyService } from '../services/anomaly.service';
 import { PrismaService } from '../prisma.service';
 import { SidecarService } from '../services/sidecar.service';
@@ -63,7 +63,31 @@ export class SidecarController {
         
         // Validate sidecar if API key provided
         const sidecar = await this.validateSidecar(apiKey, anomaly.sidecarId);
-        
+        return this.ingestAnomaly(anomaly, sidecar);
+    }
+
+    /**
+     * Batched variant used by the sidecar's background reporter.
+     * The sidecar is validated once per batch; each anomaly is ingested independently.
+     */
+    @Post('anomalies/batch')
+    async reportAnomalyBatch(
+        @Body() body: { anomalies: any[] },
+        @Headers('x-sidecar-api-key') apiKey?: string
+    ) {
+        const anomalies = Array.isArray(body?.anomalies) ? body.anomalies : [];
+        console.log(`Received anomaly batch (${anomalies.length})`);
+
+        const sidecar = await this.validateSidecar(apiKey, anomalies[0]?.sidecarId);
+        const results = [];
+        for (const anomaly of anomalies) {
+            results.push({ id: anomaly.id, ...(await this.ingestAnomaly(anomaly, sidecar)) });
+        }
+
+        return { status: 'received', count: results.length, results };
+    }
+
+    private async ingestAnomaly(anomaly: any, sidecar: any) {
         // Determine repoId
         let repoId: string;
         
@@ -118,6 +142,44 @@ export class SidecarController {
         return { status: 'received', anomalyId: savedAnomaly.id };
     }
 
+    /**
+     * Fleet template dictionary: each sidecar publishes the template IDs it knows
+     * (base64 of sorted little-endian uint64s); sets are merged per service in memory
+     * so new pods can preload them and skip "novel template" alerts for known logs.
+     */
+    private templateSets = new Map<string, Set<bigint>>();
+    private static readonly MAX_TEMPLATES_PER_SERVICE = 200_000;
+
+    @Post('templates')
+    async publishTemplates(
+        @Body() body: { serviceId?: string; sidecarId?: string; ids?: string },
+        @Headers('x-sidecar-api-key') apiKey?: string
+    ) {
+        await this.validateSidecar(apiKey, body?.sidecarId);
+        const serviceId = body?.serviceId || 'default';
+        const raw = Buffer.from(body?.ids || '', 'base64');
+
+        let known = this.templateSets.get(serviceId);
+        if (!known) {
+            known = new Set<bigint>();
+            this.templateSets.set(serviceId, known);
+        }
+        for (let offset = 0; offset + 8 <= raw.length; offset += 8) {
+            if (known.size >= SidecarController.MAX_TEMPLATES_PER_SERVICE) break;
+            known.add(raw.readBigUInt64LE(offset));
+        }
+
+        return { status: 'merged', serviceId, count: known.size };
+    }
+
+    @Get('templates/:serviceId')
+    async getTemplates(@Param('serviceId') serviceId: string) {
+        const ids = [...(this.templateSets.get(serviceId) ?? [])].sort((a, b) => (a < b ? -1 : a > b ? 1 : 0));
+        const buffer = Buffer.alloc(ids.length * 8);
+        ids.forEach((id, i) => buffer.writeBigUInt64LE(id, i * 8));
+        return { version: 1, count: ids.length, ids: buffer.toString('base64') };
+    }
+
     @Post('heartbeat')
     async heartbeat(
         @Body() body: any,
@@ -17,7 +17,7 @@ export interface FixProposal {
     diff: string;
     branch: string;
     confidence: number;
-    status: 'pending' | 'approved' | 'rejected' | 'applied' | 'applied_sandbox' | 'merged';
+    status: 'pending' | 'approved' | 'rejected' | 'applied' | 'applied_sandbox' | 'validation_failed' | 'merged';
 }
 
 export interface ApplyResult {
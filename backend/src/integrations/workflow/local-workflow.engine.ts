@@ -1,11 +1,20 @@
 import { Injectable, Logger } from '@nestjs/common';
 import { WorkflowEngine, WorkflowStatus } from './workflow-engine.interface';
 import { spawn } from 'child_process';
+import * as net from 'net';
 import * as path from 'path';
 
+// Flow -> agent worker job (see backend/agents/agent_worker.py)
+const WORKER_JOBS: Record<string, string> = {
+    apply_fix_flow: 'apply',
+    merge_fix_flow: 'merge',
+};
+
 @Injectable()
 export class LocalWorkflowEngine implements WorkflowEngine {
     private logger = new Logger(LocalWorkflowEngine.name);
+    // Long-lived Python agent worker; when unreachable we fall back to one process per job
+    private readonly workerSocket = process.env.AGENT_WORKER_SOCKET;
 
     async executeFlow(flowId: string, inputs: Record<string, any>): Promise<string> {
         this.logger.log(`[LocalWorkflow] Executing flow ${flowId} with inputs: ${JSON.stringify(inputs)}`);
@@ -25,6 +34,19 @@ export class LocalWorkflowEngine implements WorkflowEngine {
             return 'skipped-unknown-flow';
         }
 
+        if (this.workerSocket) {
+            try {
+                const reply = await this.callWorker({ job: WORKER_JOBS[flowId], args });
+                if (reply.ok) {
+                    this.logger.log(`[LocalWorkflow] Queued ${flowId} on agent worker as ${reply.id}`);
+                    return `worker-${reply.id}`;
+                }
+                this.logger.warn(`[LocalWorkflow] Agent worker rejected ${flowId}: ${reply.error}`);
+            } catch (e: any) {
+                this.logger.warn(`[LocalWorkflow] Agent worker unavailable (${e.message}), spawning process`);
+            }
+        }
+
         const projectRoot = process.cwd(); // Assumes running from project root where backend/agents exists
 
         this.logger.log(`[LocalWorkflow] Spawning: python3 ${script} ${args.join(' ')}`);
@@ -61,9 +83,48 @@ export class LocalWorkflowEngine implements WorkflowEngine {
     }
 
     async getStatus(workflowExecutionId: string): Promise<WorkflowStatus> {
+        if (this.workerSocket && workflowExecutionId.startsWith('worker-')) {
+            try {
+                const reply = await this.callWorker({ job: 'status', id: workflowExecutionId.slice('worker-'.length) });
+                if (reply.ok) {
+                    return {
+                        status: reply.status === 'failed' ? 'failed' : reply.status === 'completed' ? 'completed' : 'running',
+                        currentStep: reply.job,
+                        error: reply.error || undefined,
+                    };
+                }
+            } catch (e: any) {
+                this.logger.warn(`[LocalWorkflow] Agent worker status failed: ${e.message}`);
+            }
+        }
         return {
             status: 'completed', // Always pretend running/completed
             currentStep: 'running'
         };
     }
+
+    /**
+     * Sends one JSON request line to the agent worker and resolves with its JSON reply.
+     */
+    private callWorker(request: Record<string, any>, timeoutMs = 5000): Promise<any> {
+        return new Promise((resolve, reject) => {
+            const socket = net.createConnection(this.workerSocket!);
+            let buffer = '';
+
+            socket.setTimeout(timeoutMs, () => socket.destroy(new Error('agent worker timed out')));
+            socket.on('connect', () => socket.write(JSON.stringify(request) + '\n'));
+            socket.on('data', (chunk) => {
+                buffer += chunk.toString();
+                const newline = buffer.indexOf('\n');
+                if (newline === -1) return;
+                socket.end();
+                try {
+                    resolve(JSON.parse(buffer.slice(0, newline)));
+                } catch (e) {
+                    reject(e);
+                }
+            });
+            socket.on('error', reject);
+        });
+    }
 }
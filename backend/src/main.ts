@@ -1,9 +1,12 @@
 import { NestFactory } from '@nestjs/core';
+import { NestExpressApplication } from '@nestjs/platform-express';
 import { AppModule } from './app.module';
 
 async function bootstrap() {
-  const app = await NestFactory.create(AppModule);
+  const app = await NestFactory.create<NestExpressApplication>(AppModule);
   app.enableCors();
+  // Sidecars post batched anomalies; the default 100kb body limit is too tight
+  app.useBodyParser('json', { limit: process.env.JSON_BODY_LIMIT ?? '5mb' });
   await app.listen(process.env.PORT ?? 3001);
 }
 bootstrap();
@@ -495,6 +495,14 @@ export class AnomalyService {
         }
     }
 
+    async recordValidation(id: string, result: { passed: boolean, status: string, output?: string }) {
+        console.log(`[AnomalyService] Validation of fix ${id}: ${result.status}`);
+        if (!result.passed) {
+            // The sandbox branch is kept, but must not be merged as is
+            await this.updateFixStatus(id, 'validation_failed');
+        }
+    }
+
     async getSandboxDiff(fixId: string) {
         const fix = await this.ensureFix(fixId);
         if (!fix) return null;
@@ -607,6 +615,24 @@ export class AnomalyService {
         }));
     }
 
+    async getValidatedAnomalies() {
+        // Verified-critical anomalies waiting for root cause analysis (Analyst batch mode)
+        const anomalies = await this.prisma.anomaly.findMany({
+            where: { status: 'VALIDATED' },
+            take: 100,
+            orderBy: { createdAt: 'desc' },
+            include: { repo: true }
+        });
+
+        return anomalies.map(a => ({
+            ...JSON.parse(a.context),
+            id: a.id,
+            createdAt: a.createdAt,
+            repoUrl: a.repo ? a.repo.url : 'unknown-repo',
+            status: a.status
+        }));
+    }
+
     async saveAnalysis(id: string, analysis: any) {
         console.log(`[AnomalyService] Saving Analysis for ${id}`);
         // Update Anomaly context with Analysis
@@ -628,6 +654,19 @@ export class AnomalyService {
         return { success: true };
     }
 
+    async saveAnalyses(items: { id: string, analysis: any }[]) {
+        const results: { id: string, error?: string }[] = [];
+        for (const item of items) {
+            try {
+                await this.saveAnalysis(item.id, item.analysis);
+                results.push({ id: item.id });
+            } catch (e) {
+                results.push({ id: item.id, error: e.message });
+            }
+        }
+        return { processed: results.filter(r => !r.error).length, results };
+    }
+
     async saveProposal(dto: { id: string, analysis: string, patch: string, status: string }) {
         console.log(`[AnomalyService] Saving Proposal for ${dto.id}`);
         const { id, analysis, patch } = dto;
@@ -723,4 +762,19 @@ export class AnomalyService {
             throw new BadRequestException(`Process failed: ${e.message}`);
         }
     }
+
+    async processJudgeReviews(reviews: { id: string, decision: 'CRITICAL' | 'IGNORE', reasoning: string, analysis?: any }[]) {
+        // One request from the validator for many reviews; a bad item does not fail the batch
+        console.log(`[AnomalyService] Judge Review batch of ${reviews.length}`);
+        const results: { id: string, status?: string, error?: string }[] = [];
+        for (const review of reviews) {
+            try {
+                const { status } = await this.processJudgeReview(review);
+                results.push({ id: review.id, status });
+            } catch (e) {
+                results.push({ id: review.id, error: e.message });
+            }
+        }
+        return { processed: results.filter(r => !r.error).length, results };
+    }
 }
@@ -0,0 +1,452 @@
+"""
+Async Runtime - asyncio Event Loop for Tailing, Detection and Reporting
+
+Features:
+- One event loop runs every log source, detector worker, heartbeat and sender
+  as cooperating tasks (no thread per source)
+- Async file tailing (tail -F subprocess per path) with auto-restart
+- CPU-bound detection pushed to a small executor in batches
+- Bounded per-source queues; a slow detector back-pressures the tail pipe
+- Async HTTP via aiohttp when installed, else the pooled sync client in an executor
+- Signal handling on the loop (no sys.exit from a handler); shutdown drains
+  queued lines and anomalies before returning
+"""
+
+import time
+import asyncio
+import signal
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+
+from reporter import undelivered
+
+try:
+    import aiohttp
+except ImportError:  # Optional: fall back to the sync client in an executor
+    aiohttp = None
+
+logger = logging.getLogger("AsyncRuntime")
+
+AsyncResponse = namedtuple("AsyncResponse", ["status_code", "text"])
+
+
+class AsyncSidecarClient:
+    """
+    asyncio front for SidecarClient. Encoding, gzip, timeouts and stats are
+    shared with the sync client; only the transport differs.
+    """
+
+    def __init__(self, client, pool_size=4):
+        """
+        Args:
+            client: SidecarClient providing base URL, headers and body encoding
+            pool_size: Max concurrent connections (aiohttp connector limit)
+        """
+        self.client = client
+        self.pool_size = pool_size
+        self._session = None
+
+    @property
+    def transport(self):
+        return "aiohttp" if aiohttp else "executor"
+
+    async def post(self, endpoint, payload, timeout=None):
+        """POST JSON; returns AsyncResponse(status_code, text)"""
+        if aiohttp is None:
+            loop = asyncio.get_running_loop()
+            response = await loop.run_in_executor(None, self.client.post, endpoint, payload, timeout)
+            return AsyncResponse(response.status_code, response.text)
+
+        if self._session is None:
+            self._session = aiohttp.ClientSession(
+                headers=dict(self.client.session.headers),
+                connector=aiohttp.TCPConnector(limit=self.pool_size),
+            )
+        url, body, headers, timeout = self.client.prepare(endpoint, payload, timeout)
+        try:
+            async with self._session.post(
+                url, data=body, headers=headers, timeout=aiohttp.ClientTimeout(total=timeout)
+            ) as response:
+                return AsyncResponse(response.status, await response.text())
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            self.client.record_error()
+            raise
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+
+class AsyncReporter:
+    """
+    asyncio counterpart of AnomalyReporter: `submit` may be called from any
+    thread; batches go to the coroutine `send_batch(list)`.
+    """
+
+    def __init__(self, send_batch, batch_size=50, flush_interval=2.0, max_queue=10000, on_failure=None):
+        """
+        Args:
+            send_batch: Coroutine function taking a list of payloads, returns success bool or the failed payloads
+            batch_size: Max anomalies per batch
+            flush_interval: Max seconds an anomaly waits for its batch to fill
+            max_queue: Max anomalies buffered before new ones are dropped
+            on_failure: Blocking callable receiving undelivered payloads (run in an executor)
+        """
+        self.send_batch = send_batch
+        self.on_failure = on_failure
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_queue = max_queue
+        self._queue = None
+        self._loop = None
+        self._backlog = []  # Submitted before the loop started
+        self.stats = {"queued": 0, "sent": 0, "failed": 0, "dropped": 0, "batches": 0}
+
+    def bind(self, loop):
+        """Attach to the running loop; anything submitted earlier is queued now"""
+        self._loop = loop
+        self._queue = asyncio.Queue(maxsize=self.max_queue)
+        backlog, self._backlog = self._backlog, []
+        for payload in backlog:
+            self._offer(payload)
+
+    def submit(self, payload):
+        """Queue an anomaly without blocking (thread-safe)"""
+        if self._loop is None:
+            self._backlog.append(payload)
+            return True
+        if self._loop.is_closed():
+            self.stats["dropped"] += 1
+            return False
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._loop:
+            return self._offer(payload)
+        self._loop.call_soon_threadsafe(self._offer, payload)
+        return True
+
+    def _offer(self, payload):
+        try:
+            self._queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            logger.warning("⚠️ Reporter queue full, dropping anomaly")
+            return False
+        self.stats["queued"] += 1
+        return True
+
+    def pending(self):
+        return self._queue.qsize() if self._queue else len(self._backlog)
+
+    async def _next_batch(self, done):
+        """Wait for the first anomaly, then fill the batch until size or time bound"""
+        try:
+            first = await asyncio.wait_for(self._queue.get(), timeout=0.5)
+        except asyncio.TimeoutError:
+            return []
+
+        batch = [first]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        while len(batch) < self.batch_size and not done.is_set():
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=min(remaining, 0.1)))
+            except asyncio.TimeoutError:
+                continue
+        return batch
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def run(self, done):
+        """Send batches until `done` (asyncio.Event) is set, then flush the queue"""
+        if self._queue is None:
+            self.bind(asyncio.get_running_loop())
+        logger.info(f"📤 Async reporter started (batch {self.batch_size} / {self.flush_interval}s)")
+
+        while not done.is_set():
+            batch = await self._next_batch(done)
+            if batch:
+                await self._deliver(batch)
+
+        batch = self._drain()
+        while batch:
+            await self._deliver(batch)
+            batch = self._drain()
+        logger.info(f"📤 Reporter stopped ({self.stats['sent']} sent, {self.stats['failed']} failed)")
+
+    async def _deliver(self, batch):
+        self.stats["batches"] += 1
+        try:
+            failed = undelivered(await self.send_batch(batch), batch)
+        except Exception as e:
+            logger.error(f"❌ Error sending anomaly batch: {e}")
+            failed = list(batch)
+
+        self.stats["sent"] += len(batch) - len(failed)
+        if not failed:
+            return
+
+        self.stats["failed"] += len(failed)
+        if self.on_failure:
+            try:
+                await asyncio.get_running_loop().run_in_executor(None, self.on_failure, failed)
+            except Exception as e:
+                logger.error(f"❌ Failure handler error, {len(failed)} anomalies lost: {e}")
+
+
+class AsyncSidecarRuntime:
+    """
+    Owns the event loop tasks. Lines from every source land in a bounded
+    per-source queue; one worker per source runs `detect(line)` in the
+    detection executor and passes anomalies to `on_anomaly`.
+
+    Shutdown order: stop sources -> drain line queues through detection ->
+    run drain hooks (e.g. flush the coalescer) -> set `drained` so the
+    reporter flushes its queue -> await every task.
+    """
+
+    def __init__(self, detect, on_anomaly, detect_workers=1, queue_max=10000, detect_batch=256,
+                 line_limit=1024 * 1024, restart_delay=5):
+        """
+        Args:
+            detect: Blocking callable(line, read_at) -> anomaly dict or None
+            on_anomaly: Callable(anomaly), called on the loop thread
+            detect_workers: Executor threads for detection (1 keeps detector state serial)
+            queue_max: Lines buffered per source before the source is back-pressured
+            detect_batch: Max lines handed to the executor per hop
+            line_limit: Longest line read from a tail pipe; longer lines are skipped
+            restart_delay: Seconds before a failed tail is restarted
+        """
+        self.detect = detect
+        self.on_anomaly = on_anomaly
+        self.queue_max = queue_max
+        self.detect_batch = detect_batch
+        self.line_limit = line_limit
+        self.restart_delay = restart_delay
+        self._executor = ThreadPoolExecutor(max_workers=detect_workers, thread_name_prefix="detect")
+
+        self._files = []           # (name, path, start_offset)
+        self._thread_sources = []  # (name, factory(callback) -> source)
+        self._services = []        # coroutine functions taking the runtime
+        self._drain_hooks = []     # blocking callables run after line queues drain
+
+        self.stopping = None
+        self.drained = None
+        self._loop = None
+        self._queues = {}
+        self.stats = {"lines": 0, "anomalies": 0, "dropped": 0, "tail_restarts": 0, "errors": 0}
+
+    # Configuration -----------------------------------------------------------
+
+    def add_file(self, path, start_offset=None):
+        """Tail `path` (from `start_offset` on the first run, else from the end)"""
+        self._files.append((f"file:{path}", path, start_offset))
+
+    def add_thread_source(self, name, factory):
+        """Run an existing threaded source (stdin/unix/syslog); factory(callback) -> source"""
+        self._thread_sources.append((name, factory))
+
+    def add_service(self, coro_fn):
+        """Run `coro_fn(runtime)` alongside the sources (heartbeat, reporter, ...)"""
+        self._services.append(coro_fn)
+
+    def on_drain(self, hook):
+        """Run blocking `hook()` once all queued lines went through detection"""
+        self._drain_hooks.append(hook)
+
+    def pending(self):
+        return sum(q.qsize() for q in self._queues.values())
+
+    # Lifecycle ---------------------------------------------------------------
+
+    def request_stop(self):
+        """Begin graceful shutdown (safe from signal handlers and other threads)"""
+        if self._loop is None or self.stopping is None:
+            return
+        if not self.stopping.is_set():
+            self._loop.call_soon_threadsafe(self.stopping.set)
+
+    async def run(self, install_signals=True):
+        """Run until request_stop() or SIGTERM/SIGINT, then shut down cleanly"""
+        self._loop = asyncio.get_running_loop()
+        self.stopping = asyncio.Event()
+        self.drained = asyncio.Event()
+
+        if install_signals:
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                self._loop.add_signal_handler(sig, self._on_signal, sig)
+
+        workers, producers, thread_sources = [], [], []
+        for name, path, offset in self._files:
+            q = self._queues[name] = asyncio.Queue(maxsize=self.queue_max)
+            workers.append(asyncio.create_task(self._detect_worker(name, q), name=f"detect-{name}"))
+            producers.append(asyncio.create_task(self._tail_file(path, q, offset), name=name))
+        for name, factory in self._thread_sources:
+            q = self._queues[name] = asyncio.Queue(maxsize=self.queue_max)
+            workers.append(asyncio.create_task(self._detect_worker(name, q), name=f"detect-{name}"))
+            source = factory(self._threadsafe_feed(q))
+            source.start()
+            thread_sources.append(source)
+        services = [asyncio.create_task(fn(self)) for fn in self._services]
+        logger.info(f"⚡ Async runtime running {len(self._queues)} source(s), {len(services)} service(s)")
+
+        await self.stopping.wait()
+        logger.info("🛑 Draining async runtime...")
+
+        # 1. Stop producing lines
+        for task in producers:
+            task.cancel()
+        await asyncio.gather(*producers, return_exceptions=True)
+        for source in thread_sources:
+            await self._loop.run_in_executor(None, source.stop)
+
+        # 2. Let every worker finish what is queued
+        for q in self._queues.values():
+            await q.put(None)
+        await asyncio.gather(*workers, return_exceptions=True)
+
+        # 3. Flush anything held between detection and reporting
+        for hook in self._drain_hooks:
+            try:
+                await self._loop.run_in_executor(None, hook)
+            except Exception as e:
+                logger.error(f"❌ Drain hook failed: {e}")
+
+        # 4. Services (reporter) flush their own queues and exit
+        self.drained.set()
+        await asyncio.gather(*services, return_exceptions=True)
+
+        if install_signals:
+            for sig in (signal.SIGTERM, signal.SIGINT):
+                self._loop.remove_signal_handler(sig)
+        self._executor.shutdown(wait=True)
+        logger.info(f"✅ Async runtime stopped ({self.stats['lines']} lines, {self.stats['anomalies']} anomalies)")
+
+    def _on_signal(self, sig):
+        logger.info(f"🛑 Received {signal.Signals(sig).name}, initiating graceful shutdown...")
+        self.stopping.set()
+
+    # Sources -----------------------------------------------------------------
+
+    def _threadsafe_feed(self, q):
+        loop = self._loop
+
+        def offer(item):
+            try:
+                q.put_nowait(item)
+            except asyncio.QueueFull:
+                self.stats["dropped"] += 1
+
+        def feed(line):
+            if not self.stopping.is_set():
+                loop.call_soon_threadsafe(offer, (line, time.time()))
+        return feed
+
+    async def _tail_file(self, path, q, start_offset):
+        """tail -F one file into its queue; restarts (from the end) if tail dies"""
+        offset = start_offset
+        while not self.stopping.is_set():
+            if offset is not None:
+                cmd = ["tail", "-F", "-c", f"+{offset + 1}", path]
+                offset = None
+            else:
+                cmd = ["tail", "-F", "-n", "0", path]
+
+            try:
+                process = await asyncio.create_subprocess_exec(
+                    *cmd,
+                    stdout=asyncio.subprocess.PIPE,
+                    stderr=asyncio.subprocess.DEVNULL,
+                    limit=self.line_limit,
+                )
+            except FileNotFoundError:
+                logger.error("❌ tail command not found - is tail installed?")
+                return
+            logger.info(f"📡 Async tail started for: {path}")
+
+            try:
+                while True:
+                    try:
+                        raw = await process.stdout.readline()
+                    except ValueError:
+                        logger.warning(f"⚠️ Skipping line over {self.line_limit} bytes in {path}")
+                        continue
+                    if not raw:
+                        break
+                    line = raw.decode("utf-8", errors="replace").strip()
+                    if line:
+                        # Blocks when the detector falls behind; tail then blocks on the pipe
+                        await q.put((line, time.time()))
+            finally:
+                if process.returncode is None:
+                    process.terminate()
+                    try:
+                        await asyncio.wait_for(process.wait(), timeout=2)
+                    except asyncio.TimeoutError:
+                        process.kill()
+                        await process.wait()
+
+            if self.stopping.is_set():
+                break
+            self.stats["tail_restarts"] += 1
+            logger.warning(f"⚠️ tail exited for {path}, restarting in {self.restart_delay}s")
+            try:
+                await asyncio.wait_for(self.stopping.wait(), timeout=self.restart_delay)
+            except asyncio.TimeoutError:
+                pass
+
+    # Detection ---------------------------------------------------------------
+
+    def _detect_batch(self, lines):
+        """Runs in the executor; `lines` are (line, read_at) pairs"""
+        anomalies = []
+        for line, read_at in lines:
+            try:
+                anomaly = self.detect(line, read_at)
+            except Exception as e:
+                self.stats["errors"] += 1
+                logger.error(f"Error processing log line: {e}", exc_info=True)
+                continue
+            if anomaly:
+                anomalies.append(anomaly)
+        return anomalies
+
+    async def _detect_worker(self, name, q):
+        """Pull batches of lines, detect off-loop, dispatch anomalies; exits on None"""
+        loop = asyncio.get_running_loop()
+        finished = False
+        while not finished:
+            item = await q.get()
+            batch = []
+            if item is None:
+                finished = True
+            else:
+                batch.append(item)
+            while not finished and len(batch) < self.detect_batch and not q.empty():
+                item = q.get_nowait()
+                if item is None:
+                    finished = True
+                else:
+                    batch.append(item)
+
+            if not batch:
+                continue
+            self.stats["lines"] += len(batch)
+            anomalies = await loop.run_in_executor(self._executor, self._detect_batch, batch)
+            for anomaly in anomalies:
+                self.stats["anomalies"] += 1
+                try:
+                    self.on_anomaly(anomaly)
+                except Exception as e:
+                    logger.error(f"❌ Error dispatching anomaly from {name}: {e}")
@@ -0,0 +1,158 @@
+"""
+Anomaly Coalescer - Merge Repeats of the Same Incident Before Reporting
+
+Features:
+- Groups anomalies by (anomaly_type, log template) within a time window
+- The first anomaly of a group is reported at once (no added latency)
+- Repeats within the window become one aggregate report when it closes,
+  with their count, first/last seen and sample lines (the first anomaly,
+  already reported, is not counted again)
+- Keeps the highest-confidence anomaly of the group as the representative
+- Bounded number of open groups (oldest flushed early when exceeded)
+"""
+
+import time
+import threading
+import logging
+
+logger = logging.getLogger("Coalescer")
+
+
+def _iso(ts):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(ts))
+
+
+class AnomalyCoalescer:
+    """
+    Groups detector anomalies per (type, template) for `window` seconds.
+    The first one is handed to `emit` immediately; if it repeated, a single
+    merged anomaly covering only the repeats follows when the window closes.
+    """
+
+    def __init__(self, emit, window=30.0, max_samples=3, max_groups=1000):
+        """
+        Args:
+            emit: Callable receiving the first and the merged anomaly dicts
+            window: Seconds from a group's first anomaly until its repeats are emitted
+            max_samples: Distinct sample log lines kept per group
+            max_groups: Max open groups before the oldest is flushed early
+        """
+        self.emit = emit
+        self.window = window
+        self.max_samples = max_samples
+        self.max_groups = max_groups
+        self._groups = {}  # key -> group dict (insertion order = age)
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self.thread = None
+        self.stats = {"received": 0, "emitted": 0, "coalesced": 0}
+
+    def start(self):
+        """Start the timer thread that flushes expired groups"""
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="AnomalyCoalescer")
+        self.thread.start()
+
+    def add(self, anomaly):
+        """Add a detector anomaly to its group"""
+        key = (anomaly["anomaly_type"], anomaly["context"].get("log_template", ""))
+        now = time.time()
+        overflow = []
+        first = None
+
+        with self._lock:
+            self.stats["received"] += 1
+            group = self._groups.get(key)
+            if group is None:
+                group = {
+                    "anomaly": anomaly,
+                    "count": 0,  # repeats after the first, which add() reports itself
+                    "first_seen": now,
+                    "last_seen": now,
+                    "opened": time.monotonic(),
+                    "samples": [],
+                }
+                first = self._merged(group, anomaly["evidence"].get("log"))
+                self._groups[key] = group
+                while len(self._groups) > self.max_groups:
+                    oldest = next(iter(self._groups))
+                    overflow.append(self._groups.pop(oldest))
+            else:
+                self.stats["coalesced"] += 1
+                if not group["count"]:
+                    group["first_seen"] = now  # the aggregate starts at the first repeat
+                group["count"] += 1
+                group["last_seen"] = now
+                if anomaly["confidence"] > group["anomaly"]["confidence"]:
+                    group["anomaly"] = anomaly
+                line = anomaly["evidence"].get("log")
+                if line and len(group["samples"]) < self.max_samples and line not in group["samples"]:
+                    group["samples"].append(line)
+
+        for expired in overflow:
+            self._emit(expired)
+        if first:
+            self._send(first)
+
+    def flush_expired(self):
+        """Emit every group whose window has elapsed"""
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            expired = [k for k, g in self._groups.items() if g["opened"] <= cutoff]
+            groups = [self._groups.pop(k) for k in expired]
+        for group in groups:
+            self._emit(group)
+
+    def flush_all(self):
+        """Emit every open group (shutdown)"""
+        with self._lock:
+            groups = list(self._groups.values())
+            self._groups.clear()
+        for group in groups:
+            self._emit(group)
+
+    def open_groups(self):
+        return len(self._groups)
+
+    def _emit(self, group):
+        """Report a closed group's repeats; a lone anomaly was already sent by add()"""
+        if group["count"]:
+            self._send(self._merged(group))
+
+    def _merged(self, group, first_line=None):
+        """The first anomaly of a group (first_line given) or the aggregate of its repeats"""
+        base = group["anomaly"]
+        count = group["count"]
+        merged = {
+            **base,
+            "evidence": {
+                **base["evidence"],
+                "occurrences": count or 1,
+                "first_seen": _iso(group["first_seen"]),
+                "last_seen": _iso(group["last_seen"]),
+                "samples": [first_line] if first_line else list(group["samples"]),
+            },
+        }
+        if count:
+            span = group["last_seen"] - group["first_seen"]
+            merged["summary"] = f"{base['summary']} (x{count} more in {span:.0f}s)"
+        return merged
+
+    def _send(self, merged):
+        self.stats["emitted"] += 1
+        try:
+            self.emit(merged)
+        except Exception as e:
+            logger.error(f"❌ Error emitting coalesced anomaly: {e}")
+
+    def _run(self):
+        tick = min(1.0, max(self.window / 4, 0.05))
+        while not self._stop_event.wait(tick):
+            self.flush_expired()
+
+    def stop(self):
+        """Stop the timer and emit everything still open"""
+        self._stop_event.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=5)
+        self.flush_all()
@@ -6,6 +6,11 @@ Features:
 - Configurable thresholds via config dict
 - Consistent template hashing with hashlib
 - Warmup/learning period before alerting
+- Optional raw line buffer: anomalies carry preceding lines and same-trace lines
+- Optional lag tracking (event -> read -> detect) per line
+- Hour-of-week rate baselines so scheduled peaks do not trip the frequency rule
+- Exportable detector state (baselines) for persistence across restarts
+- Optional preloaded fleet template dictionary: known templates are not "novel"
 """
 
 import re
@@ -15,6 +20,8 @@ import logging
 import hashlib
 from collections import defaultdict, deque
 from datetime import datetime
+from seasonal import SeasonalBaselines
+from templates import template_key
 
 logger = logging.getLogger("Detector")
 
@@ -36,7 +43,12 @@ class FeatureExtractor:
         self.hex_pattern = re.compile(r'\b0x[0-9a-f]+\b', re.IGNORECASE)
 
     def extract_timestamp_value(self, text, json_data=None):
-        """Extract timestamp from log line or JSON data"""
+        """Extract timestamp from log line or JSON data (now if absent)"""
+        ts = self.extract_event_time(text, json_data)
+        return ts if ts is not None else time.time()
+
+    def extract_event_time(self, text, json_data=None):
+        """Extract timestamp from log line or JSON data (None if absent)"""
         ts_str = None
         
         if json_data:
@@ -56,7 +68,7 @@ class FeatureExtractor:
             except (ValueError, TypeError):
                 pass
         
-        return time.time()
+        return None
 
     def normalize_message(self, message):
         """Mask variable parts to create a template for grouping similar logs"""
@@ -110,10 +122,13 @@ class FeatureExtractor:
         # Extract severity
         severity = self.extract_severity(line, json_data)
         
+        event_time = self.extract_event_time(line, json_data)
+        
         # Build features dict
         features = {
             'raw': line,
-            'timestamp': self.extract_timestamp_value(line, json_data),
+            'timestamp': event_time if event_time is not None else time.time(),
+            'has_timestamp': event_time is not None,
             'severity': severity,
             'message': message,
             'module': (json_data or {}).get('module', 
@@ -144,6 +159,10 @@ class FeatureExtractor:
 class ContextEngine:
     """Maintains sliding window context for anomaly detection"""
     
+    DEFAULT_MAX_TRACES = 500
+    DEFAULT_MAX_RECENT = 5000
+    MAX_RETIRED = 100000
+    
     def __init__(self, history_window=300):
         self.template_stats = defaultdict(lambda: {
             'count': 0, 
@@ -153,9 +172,12 @@ class ContextEngine:
             'users': set()
         })
         self.request_traces = defaultdict(list)
-        self.recent_logs = deque(maxlen=5000)
+        self.recent_logs = deque(maxlen=self.DEFAULT_MAX_RECENT)
         self.history_window = history_window
         self.last_log_time = time.time()
+        self.max_traces = self.DEFAULT_MAX_TRACES
+        # Templates evicted under memory pressure (64-bit keys); not "novel" when they come back
+        self.retired_templates = set()
 
     def update(self, features):
         """Update context with new log features"""
@@ -184,9 +206,9 @@ class ContextEngine:
             
             trace.append(features)
             
-            # Cleanup old traces (keep last 500 active requests)
-            if len(self.request_traces) > 500:
-                oldest_keys = list(self.request_traces.keys())[:100]
+            # Cleanup old traces (keep last max_traces active requests)
+            if len(self.request_traces) > self.max_traces:
+                oldest_keys = list(self.request_traces.keys())[:max(1, self.max_traces // 5)]
                 for k in oldest_keys:
                     del self.request_traces[k]
 
@@ -203,6 +225,47 @@ class ContextEngine:
         """Count occurrences of a template in the current window"""
         return sum(1 for _, tid in self.recent_logs if tid == template_id)
 
+    # Memory pressure hooks (called by the resource governor) -------------------
+
+    def footprint(self):
+        """Element counts of the structures that grow with traffic"""
+        return {
+            "templates": len(self.template_stats),
+            "transitions": sum(len(s['transitions']) for s in self.template_stats.values()),
+            "users": sum(len(s['users']) for s in self.template_stats.values()),
+            "deltas": sum(len(s['deltas']) for s in self.template_stats.values()),
+            "traces": len(self.request_traces),
+            "trace_lines": sum(len(t) for t in self.request_traces.values()),
+            "window_entries": len(self.recent_logs),
+            "retired": len(self.retired_templates),
+        }
+
+    def shrink(self, factor=0.5):
+        """Cut the trace store and sliding window capacity, keeping the newest data"""
+        self.max_traces = max(50, int(self.max_traces * factor))
+        while len(self.request_traces) > self.max_traces:
+            del self.request_traces[next(iter(self.request_traces))]
+        maxlen = max(500, int(self.recent_logs.maxlen * factor))
+        self.recent_logs = deque(self.recent_logs, maxlen=maxlen)
+
+    def restore(self):
+        """Back to configured capacities once memory pressure is gone"""
+        self.max_traces = self.DEFAULT_MAX_TRACES
+        if self.recent_logs.maxlen != self.DEFAULT_MAX_RECENT:
+            self.recent_logs = deque(self.recent_logs, maxlen=self.DEFAULT_MAX_RECENT)
+
+    def evict_templates(self, keep):
+        """Drop all but the `keep` most recently seen templates; returns how many went"""
+        if len(self.template_stats) <= keep:
+            return 0
+        by_age = sorted(self.template_stats.items(), key=lambda item: item[1]['last_seen'])
+        evicted = by_age[:len(by_age) - keep]
+        for tid, _ in evicted:
+            del self.template_stats[tid]
+            if len(self.retired_templates) < self.MAX_RETIRED:
+                self.retired_templates.add(template_key(tid))
+        return len(evicted)
+
 
 class AnomalyDetector:
     """Main anomaly detection engine with configurable thresholds"""
@@ -213,12 +276,26 @@ class AnomalyDetector:
         "freq_threshold_flood": 200,
         "latency_threshold": 5.0,
         "sequence_prob_threshold": 0.05,
+        "context_lines": 20,  # Preceding raw lines attached to an anomaly
+        "trace_lines": 50,  # Same-request lines attached to an anomaly
+        "seasonal_factor": 3.0,  # Frequency must exceed this multiple of the hour-of-week baseline (0 = off)
     }
     
-    def __init__(self, config=None):
+    def __init__(self, config=None, line_buffer=None, lag=None, known_templates=None):
+        """
+        Args:
+            config: Threshold overrides merged over DEFAULT_CONFIG
+            line_buffer: Optional RawLogBuffer used to attach context to anomalies
+            lag: Optional LagTracker receiving event->read and read->detect lag
+            known_templates: Optional TemplateDictionary preloaded from the fleet
+        """
         self.config = {**self.DEFAULT_CONFIG, **(config or {})}
         self.extractor = FeatureExtractor()
         self.context = ContextEngine()
+        self.baselines = SeasonalBaselines(window_seconds=self.context.history_window)
+        self.line_buffer = line_buffer
+        self.lag = lag
+        self.known_templates = known_templates
         self.start_time = time.time()
         
         logger.info(f"🔧 Detector initialized with config: {self.config}")
@@ -227,13 +304,53 @@ class AnomalyDetector:
         """Check if we're still in the learning period"""
         return (time.time() - self.start_time) < self.config['learning_period']
 
-    def check(self, raw_log):
+    def credit_warmup(self, seconds):
+        """Count replayed history (event-time span) towards the learning period"""
+        self.start_time -= seconds
+
+    def learn(self, raw_log):
+        """Update context from a historical log line without evaluating rules"""
+        features = self.extractor.parse(raw_log)
+        self.context.update(features)
+        self.baselines.observe(features['template_id'], features['timestamp'])
+        if self.line_buffer is not None:
+            self.line_buffer.append(features['raw'], features['request_id'])
+
+    def is_known_template(self, template_id):
+        """Seen before by this sidecar (and since evicted) or by the fleet"""
+        if template_key(template_id) in self.context.retired_templates:
+            return True
+        return self.known_templates is not None and template_id in self.known_templates
+
+    def known_template_ids(self):
+        """64-bit keys of every template this detector knows (for the fleet dictionary)"""
+        keys = {template_key(tid) for tid in self.context.template_stats}
+        return keys | self.context.retired_templates
+
+    def export_state(self):
+        """Learned state worth keeping across restarts (JSON-serialisable)"""
+        return {"version": 1, "baselines": self.baselines.export()}
+
+    def load_state(self, state):
+        """Restore export_state() output; returns the number of templates with baselines"""
+        if not state or state.get("version") != 1:
+            return 0
+        return self.baselines.load(state.get("baselines"))
+
+    def check(self, raw_log, read_at=None):
         """
         Check a log line for anomalies.
+        read_at: wall-clock time the line was read (enables lag tracking).
         Returns anomaly dict if found, None otherwise.
         """
         features = self.extractor.parse(raw_log)
+        if self.lag is not None and read_at is not None and features['has_timestamp']:
+            self.lag.observe("event_to_read", read_at - features['timestamp'])
         self.context.update(features)
+        self.baselines.observe(features['template_id'], features['timestamp'])
+        seq = None
+        if self.line_buffer is not None:
+            seq = self.line_buffer.append(features['raw'], features['request_id'])
         
         anomalies = []
         is_warmup = self.is_warmup()
@@ -246,15 +363,24 @@ class AnomalyDetector:
         freq_error = self.config['freq_threshold_error']
         freq_flood = self.config['freq_threshold_flood']
         
+        # Scheduled peaks (nightly jobs, weekday traffic) raise the bar for their hour
+        expected = None
+        if self.config['seasonal_factor'] > 0:
+            expected = self.baselines.expected(tid, features['timestamp'])
+            if expected is not None:
+                freq_error = max(freq_error, expected * self.config['seasonal_factor'])
+                freq_flood = max(freq_flood, expected * self.config['seasonal_factor'])
+        
         if (freq > freq_error and features['severity_score'] >= 40) or freq > freq_flood:
+            baseline_note = f" (usual for this hour: ~{expected:.0f})" if expected is not None else ""
             anomalies.append({
                 "type": "Frequency Anomaly",
                 "confidence": 0.9 if features['severity_score'] >= 40 else 0.7,
-                "summary": f"High frequency: {freq} times in 5m. Template: {features['template'][:50]}..."
+                "summary": f"High frequency: {freq} times in 5m{baseline_note}. Template: {features['template'][:50]}..."
             })
 
         # === RULE 2: Novelty Anomaly ===
-        if stats['count'] == 1 and not is_warmup:
+        if stats['count'] == 1 and not is_warmup and not self.is_known_template(tid):
             conf = 0.8 if features['severity_score'] >= 30 else 0.5
             anomalies.append({
                 "type": "Novel Log Template",
@@ -316,10 +442,14 @@ class AnomalyDetector:
                 "summary": f"Error localized to single user: {list(stats['users'])[0]}"
             })
 
+        detected_at = time.time()
+        if self.lag is not None and read_at is not None:
+            self.lag.observe("read_to_detect", detected_at - read_at)
+
         # Return highest confidence anomaly
         if anomalies:
             top = max(anomalies, key=lambda x: x['confidence'])
-            return {
+            anomaly = {
                 "anomaly_type": top['type'],
                 "confidence": top['confidence'],
                 "context": {
@@ -332,7 +462,20 @@ class AnomalyDetector:
                     "frequency": freq,
                     "template_count": stats['count']
                 },
-                "summary": top['summary']
+                "summary": top['summary'],
+                "detected_at": detected_at
             }
+            if seq is not None:
+                self._attach_context(anomaly, seq, features['request_id'])
+            return anomaly
             
         return None
+
+    def _attach_context(self, anomaly, seq, request_id):
+        """Add the lines leading up to the anomaly and the rest of its trace"""
+        preceding = self.line_buffer.preceding(seq, self.config['context_lines'])
+        anomaly['evidence']['preceding'] = preceding
+        if request_id:
+            seen = set(preceding)
+            trace = self.line_buffer.trace(request_id, self.config['trace_lines'], exclude=seq)
+            anomaly['evidence']['trace'] = [line for line in trace if line not in seen]
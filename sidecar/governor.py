@@ -0,0 +1,211 @@
+"""
+Resource Governor - Self-Imposed Memory Limits for the Sidecar
+
+Features:
+- Periodic RSS check (/proc/self/statm, getrusage fallback)
+- Approximate per-structure sizes (templates, traces, window, line buffer, baselines)
+- Stepwise degradation above a soft limit:
+    1. shrink windows (trace store, sliding window, raw line buffer)
+    2. evict least recently seen templates
+    3. sample lines (keep 1 in N, errors always kept), N doubling per step
+- Hard limit jumps straight to the most degraded level
+- Steps back down (with hysteresis) once memory is under the soft limit
+"""
+
+import os
+import itertools
+import threading
+import logging
+
+logger = logging.getLogger("Governor")
+
+LEVELS = ("normal", "shrink_windows", "evict_templates", "sampling")
+
+# Rough CPython costs in bytes, good enough to see which structure is growing
+_COST = {
+    "templates": 1200,      # stats dict + deque + defaultdict + set
+    "transitions": 100,
+    "users": 90,
+    "deltas": 32,
+    "traces": 250,
+    "trace_lines": 1500,    # full features dict incl. raw line
+    "window_entries": 90,
+    "retired": 90,
+}
+
+_ALWAYS_KEEP = ("ERROR", "CRITICAL", "FATAL", "EXCEPTION", "TRACEBACK")
+
+
+def read_rss():
+    """Resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        import resource
+        # ru_maxrss is the peak (KB on Linux), the best we have without /proc
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ResourceGovernor:
+    """
+    Watches memory and degrades the detector step by step.
+    Mutations of detector state happen under `lock` (the detector lock).
+    """
+
+    def __init__(self, detector, soft_limit_bytes, hard_limit_bytes=None, interval=10.0, lock=None,
+                 template_keep=0.5, max_sample_every=64, recover_after=3, rss_reader=read_rss):
+        """
+        Args:
+            detector: AnomalyDetector whose context (and line buffer) is governed
+            soft_limit_bytes: RSS above which degradation starts
+            hard_limit_bytes: RSS above which the most degraded level is applied at once
+            interval: Seconds between checks
+            lock: Lock serialising access to the detector
+            template_keep: Fraction of templates kept per eviction step
+            max_sample_every: Upper bound of the 1-in-N sampling
+            recover_after: Consecutive checks under the soft limit before stepping down
+            rss_reader: Callable returning RSS bytes (tests inject a fake)
+        """
+        self.detector = detector
+        self.soft_limit = soft_limit_bytes
+        self.hard_limit = hard_limit_bytes
+        self.interval = interval
+        self.lock = lock or threading.Lock()
+        self.template_keep = template_keep
+        self.max_sample_every = max_sample_every
+        self.recover_after = recover_after
+        self.rss_reader = rss_reader
+
+        self.level = 0
+        self.sample_every = 1
+        self.rss = 0
+        self._calm_checks = 0
+        # admit() runs on every source thread: next() on a count is atomic, += is not
+        self._counter = itertools.count(1)
+        self._line_buffer_bytes = detector.line_buffer.max_bytes if detector.line_buffer else 0
+        self._stop_event = threading.Event()
+        self.thread = None
+        self.stats = {"checks": 0, "escalations": 0, "recoveries": 0, "templates_evicted": 0, "sampled_out": 0}
+
+    @property
+    def level_name(self):
+        return LEVELS[self.level]
+
+    def start(self):
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="ResourceGovernor")
+        self.thread.start()
+        logger.info(f"🧯 Governor started (soft {self.soft_limit // (1024 * 1024)} MB)")
+
+    def stop(self):
+        self._stop_event.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=5)
+
+    def _run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.check()
+            except Exception as e:
+                logger.error(f"❌ Governor check failed: {e}")
+
+    # Sampling ---------------------------------------------------------------
+
+    def admit(self, line):
+        """Whether a line should go through detection at the current sampling rate"""
+        if self.sample_every <= 1:
+            return True
+        if next(self._counter) % self.sample_every == 0:
+            return True
+        upper = line[:200].upper()
+        if any(word in upper for word in _ALWAYS_KEEP):
+            return True
+        self.stats["sampled_out"] += 1
+        return False
+
+    # Measurement ------------------------------------------------------------
+
+    def structure_sizes(self):
+        """Approximate bytes held by each growing structure"""
+        with self.lock:
+            counts = self.detector.context.footprint()
+            line_buffer = self.detector.line_buffer.size_bytes() if self.detector.line_buffer else 0
+        sizes = {name: counts[name] * _COST[name] for name in counts}
+        sizes["line_buffer"] = line_buffer
+        sizes["baselines"] = self.detector.baselines.size_bytes()
+        return sizes
+
+    def check(self):
+        """One governor tick: measure, then escalate or recover"""
+        self.stats["checks"] += 1
+        self.rss = self.rss_reader()
+
+        if self.hard_limit and self.rss >= self.hard_limit and self.level < len(LEVELS) - 1:
+            logger.warning(f"🧯 RSS {self.rss // (1024 * 1024)} MB over hard limit, degrading fully")
+            while self.level < len(LEVELS) - 1:
+                self._escalate()
+            return self.level
+
+        if self.rss >= self.soft_limit:
+            self._calm_checks = 0
+            if self.level < len(LEVELS) - 1 or self.sample_every < self.max_sample_every:
+                self._escalate()
+        elif self.level and self.rss < self.soft_limit * 0.85:
+            self._calm_checks += 1
+            if self._calm_checks >= self.recover_after:
+                self._calm_checks = 0
+                self._recover()
+        return self.level
+
+    # Degradation steps -------------------------------------------------------
+
+    def _escalate(self):
+        self.stats["escalations"] += 1
+        if self.level < len(LEVELS) - 1:
+            self.level += 1
+        context = self.detector.context
+        line_buffer = self.detector.line_buffer
+
+        with self.lock:
+            if self.level == 1:
+                context.shrink(0.5)
+                if line_buffer:
+                    line_buffer.resize(line_buffer.max_bytes // 2)
+            elif self.level == 2:
+                keep = int(len(context.template_stats) * self.template_keep)
+                self.stats["templates_evicted"] += context.evict_templates(keep)
+                context.shrink(0.5)
+            else:
+                self.sample_every = min(self.max_sample_every, self.sample_every * 2)
+
+        logger.warning(
+            f"🧯 Memory {self.rss // (1024 * 1024)} MB over soft limit: level {self.level_name}"
+            + (f", sampling 1/{self.sample_every}" if self.sample_every > 1 else "")
+        )
+
+    def _recover(self):
+        self.stats["recoveries"] += 1
+        if self.sample_every > 1:
+            self.sample_every //= 2
+            if self.sample_every > 1:
+                logger.info(f"🧯 Memory recovered, sampling 1/{self.sample_every}")
+                return
+        self.level -= 1
+        if self.level == 0:
+            with self.lock:
+                self.detector.context.restore()
+                if self.detector.line_buffer:
+                    self.detector.line_buffer.resize(self._line_buffer_bytes)
+        logger.info(f"🧯 Memory recovered, level {self.level_name}")
+
+    def snapshot(self):
+        return {
+            "level": self.level,
+            "level_name": self.level_name,
+            "rss_mb": round(self.rss / (1024 * 1024), 1),
+            "soft_limit_mb": round(self.soft_limit / (1024 * 1024), 1),
+            "sample_every": self.sample_every,
+            "structures": self.structure_sizes(),
+            **self.stats,
+        }
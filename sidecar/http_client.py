@@ -0,0 +1,144 @@
+"""
+Sidecar HTTP Client - Pooled, Keep-Alive Transport for All Backend Traffic
+
+Features:
+- One requests.Session with a bounded connection pool (keep-alive reuse)
+- gzip request bodies above a size threshold (Content-Encoding: gzip)
+- Per-endpoint timeouts (register / heartbeat / anomaly batches ...)
+- Connection-reuse and compression stats for the metrics registry
+"""
+
+import json
+import gzip
+import threading
+import logging
+import requests
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger("HttpClient")
+
+DEFAULT_TIMEOUTS = {
+    "register": 5,
+    "heartbeat": 2,
+    "anomaly": 5,
+    "anomalies/batch": 10,
+}
+
+
+def parse_timeouts(spec):
+    """Parse "heartbeat=2,anomalies/batch=10" into a dict of floats"""
+    timeouts = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            endpoint, value = item.split("=", 1)
+            timeouts[endpoint.strip()] = float(value)
+    return timeouts
+
+
+class SidecarClient:
+    """
+    Shared client for backend calls. Safe to use from the heartbeat, reporter
+    and replay threads at the same time (pool size bounds concurrent sockets).
+    """
+
+    def __init__(self, base_url, headers=None, timeouts=None, default_timeout=5,
+                 compress_min_bytes=1024, pool_maxsize=4):
+        """
+        Args:
+            base_url: Backend sidecar API root (BACKEND_URL)
+            headers: Headers sent with every request (auth)
+            timeouts: Per-endpoint timeout overrides, merged over DEFAULT_TIMEOUTS
+            default_timeout: Timeout for endpoints without an entry
+            compress_min_bytes: Bodies at least this large are gzipped (0 = always, <0 = never)
+            pool_maxsize: Max keep-alive connections held to the backend
+        """
+        self.base_url = base_url.rstrip("/")
+        self.timeouts = {**DEFAULT_TIMEOUTS, **(timeouts or {})}
+        self.default_timeout = default_timeout
+        self.compress_min_bytes = compress_min_bytes
+
+        self.session = requests.Session()
+        # Retries are handled by callers (reporter/outbox); keep the adapter single-shot
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(headers or {})
+
+        self._lock = threading.Lock()
+        self._stats = {"requests": 0, "errors": 0, "compressed": 0, "bytes_raw": 0, "bytes_sent": 0}
+
+    def prepare(self, endpoint, payload, timeout=None):
+        """
+        Serialise (and maybe gzip) a payload; shared with the asyncio transport.
+
+        Returns:
+            (url, body bytes, headers, timeout)
+        """
+        body = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        raw_size = len(body)
+        headers = {"Content-Type": "application/json"}
+
+        if 0 <= self.compress_min_bytes <= raw_size:
+            body = gzip.compress(body, compresslevel=5)
+            headers["Content-Encoding"] = "gzip"
+
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["bytes_raw"] += raw_size
+            self._stats["bytes_sent"] += len(body)
+            if "Content-Encoding" in headers:
+                self._stats["compressed"] += 1
+
+        return (
+            f"{self.base_url}/{endpoint}",
+            body,
+            headers,
+            timeout or self.timeouts.get(endpoint, self.default_timeout),
+        )
+
+    def record_error(self):
+        with self._lock:
+            self._stats["errors"] += 1
+
+    def post(self, endpoint, payload, timeout=None):
+        """POST JSON to {base_url}/{endpoint}; raises requests exceptions like requests.post"""
+        url, body, headers, timeout = self.prepare(endpoint, payload, timeout)
+        try:
+            return self.session.post(url, data=body, headers=headers, timeout=timeout)
+        except requests.exceptions.RequestException:
+            self.record_error()
+            raise
+
+    def get(self, endpoint, timeout=None):
+        """GET {base_url}/{endpoint} over the shared session"""
+        with self._lock:
+            self._stats["requests"] += 1
+        try:
+            return self.session.get(
+                f"{self.base_url}/{endpoint}",
+                timeout=timeout or self.timeouts.get(endpoint, self.default_timeout),
+            )
+        except requests.exceptions.RequestException:
+            self.record_error()
+            raise
+
+    def connection_stats(self):
+        """Requests vs. TCP connections opened, read from urllib3's pools"""
+        opened = served = 0
+        for adapter in set(self.session.adapters.values()):
+            pools = adapter.poolmanager.pools
+            for key in list(pools.keys()):
+                pool = pools.get(key)
+                if pool is not None:
+                    opened += pool.num_connections
+                    served += pool.num_requests
+
+        with self._lock:
+            stats = dict(self._stats)
+        stats["connections_opened"] = opened
+        stats["connections_reused"] = max(0, served - opened)
+        stats["reuse_ratio"] = round((served - opened) / served, 3) if served else 0.0
+        return stats
+
+    def close(self):
+        self.session.close()
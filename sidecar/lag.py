@@ -0,0 +1,131 @@
+"""
+Ingestion Lag - Streaming Histograms per Pipeline Stage
+
+Features:
+- Log-bucketed streaming histogram (constant memory, ~5% relative error)
+- p50 / p99 / max / count without keeping samples
+- Two rotating windows so percentiles reflect recent load, not process lifetime
+- Stage tracker: event->read, read->detect, detect->ack (seconds)
+"""
+
+import math
+import time
+import threading
+
+STAGES = ("event_to_read", "read_to_detect", "detect_to_ack")
+
+
+class StreamingHistogram:
+    """
+    Counts values into exponentially sized buckets: bucket 0 holds everything
+    up to `min_value`, bucket i holds (min_value * growth^(i-1), min_value * growth^i].
+    """
+
+    def __init__(self, min_value=0.001, growth=1.05):
+        self.min_value = min_value
+        self.growth = growth
+        self._log_growth = math.log(growth)
+        self.buckets = {}
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.negative = 0  # Clock skew: event stamped "in the future"
+
+    def _index(self, value):
+        if value <= self.min_value:
+            return 0
+        return int(math.ceil(math.log(value / self.min_value) / self._log_growth))
+
+    def _upper(self, index):
+        return self.min_value * (self.growth ** index)
+
+    def add(self, value):
+        if value < 0:
+            self.negative += 1
+            value = 0.0
+        i = self._index(value)
+        self.buckets[i] = self.buckets.get(i, 0) + 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def merge(self, other):
+        for i, n in other.buckets.items():
+            self.buckets[i] = self.buckets.get(i, 0) + n
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+        self.negative += other.negative
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-quantile (capped at the observed max)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i in sorted(self.buckets):
+            seen += self.buckets[i]
+            if seen >= rank:
+                return min(self._upper(i), self.max)
+        return self.max
+
+    def summary(self):
+        return {
+            "count": self.count,
+            "p50": round(self.quantile(0.5), 3),
+            "p99": round(self.quantile(0.99), 3),
+            "max": round(self.max, 3),
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+        }
+
+
+class LagTracker:
+    """
+    Thread-safe per-stage histograms. Percentiles cover the current and the
+    previous window (so between `window` and 2x`window` seconds of data).
+    """
+
+    def __init__(self, window=300, stages=STAGES, clock=time.monotonic):
+        self.window = window
+        self.stages = stages
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._current = {stage: StreamingHistogram() for stage in stages}
+        self._previous = {stage: StreamingHistogram() for stage in stages}
+        self._rotated_at = clock()
+
+    def _rotate(self):
+        now = self.clock()
+        if now - self._rotated_at >= self.window:
+            self._previous = self._current
+            self._current = {stage: StreamingHistogram() for stage in self.stages}
+            self._rotated_at = now
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            self._rotate()
+            self._current[stage].add(seconds)
+
+    def _merged(self):
+        merged = {}
+        for stage in self.stages:
+            hist = StreamingHistogram()
+            hist.merge(self._previous[stage])
+            hist.merge(self._current[stage])
+            merged[stage] = hist
+        return merged
+
+    def snapshot(self):
+        """Full per-stage summary for the metrics registry"""
+        with self._lock:
+            self._rotate()
+            merged = self._merged()
+        return {stage: hist.summary() for stage, hist in merged.items()}
+
+    def summary(self):
+        """Compact {stage: p99} for heartbeats (fleet-wide overload checks)"""
+        with self._lock:
+            self._rotate()
+            merged = self._merged()
+        return {stage: round(hist.quantile(0.99), 3) for stage, hist in merged.items() if hist.count}
@@ -0,0 +1,112 @@
+"""
+Raw Log Buffer - Memory-Bounded Ring of Recent Lines for Anomaly Context
+
+Features:
+- Fixed-slot ring of raw lines stored as UTF-8 bytes (no parsed dicts kept)
+- Byte budget and line-count cap; oldest lines evicted first
+- request_id index so a trace's earlier lines can be pulled in O(trace)
+- Preceding-N lookup by sequence number for "what happened just before"
+"""
+
+
+class RawLogBuffer:
+    """
+    Lines get a monotonically increasing sequence number; slot = seq % max_lines.
+    A line is available while oldest <= seq < next.
+    Not thread-safe on its own: the detector that owns it serialises access.
+    """
+
+    def __init__(self, max_bytes=2 * 1024 * 1024, max_lines=20000, max_line_bytes=4096, max_trace_lines=200):
+        """
+        Args:
+            max_bytes: Total bytes of line data kept
+            max_lines: Ring slots (upper bound on lines kept)
+            max_line_bytes: Longer lines are truncated before storing
+            max_trace_lines: Most recent lines indexed per request_id
+        """
+        self.max_bytes = max_bytes
+        self.max_lines = max_lines
+        self.max_line_bytes = max_line_bytes
+        self.max_trace_lines = max_trace_lines
+
+        self._lines = [None] * max_lines
+        self._rids = [None] * max_lines
+        self._oldest = 0
+        self._next = 0
+        self._bytes = 0
+        self._by_request = {}  # request_id -> list of seqs (ascending)
+        self.evicted = 0
+
+    def __len__(self):
+        return self._next - self._oldest
+
+    def size_bytes(self):
+        return self._bytes
+
+    def append(self, line, request_id=None):
+        """Store a raw line; returns its sequence number"""
+        data = line.encode("utf-8", errors="replace")[:self.max_line_bytes]
+
+        while len(self) >= self.max_lines or (len(self) and self._bytes + len(data) > self.max_bytes):
+            self._evict_oldest()
+
+        seq = self._next
+        slot = seq % self.max_lines
+        self._lines[slot] = data
+        self._rids[slot] = request_id
+        self._bytes += len(data)
+        self._next += 1
+
+        if request_id:
+            seqs = self._by_request.setdefault(request_id, [])
+            seqs.append(seq)
+            if len(seqs) > self.max_trace_lines:
+                del seqs[0]
+        return seq
+
+    def resize(self, max_bytes):
+        """Change the byte budget, evicting the oldest lines if it shrank"""
+        self.max_bytes = max_bytes
+        while len(self) and self._bytes > self.max_bytes:
+            self._evict_oldest()
+
+    def _evict_oldest(self):
+        seq = self._oldest
+        slot = seq % self.max_lines
+        self._bytes -= len(self._lines[slot])
+        rid = self._rids[slot]
+        self._lines[slot] = None
+        self._rids[slot] = None
+        self._oldest += 1
+        self.evicted += 1
+
+        if rid:
+            # Eviction runs in seq order, so an indexed line is always at the front
+            seqs = self._by_request.get(rid)
+            if seqs and seqs[0] == seq:
+                del seqs[0]
+                if not seqs:
+                    del self._by_request[rid]
+
+    def _get(self, seq):
+        if self._oldest <= seq < self._next:
+            return self._lines[seq % self.max_lines].decode("utf-8", errors="replace")
+        return None
+
+    def preceding(self, seq, count):
+        """Up to `count` lines stored right before `seq`, oldest first"""
+        start = max(self._oldest, seq - count)
+        return [self._get(s) for s in range(start, min(seq, self._next))]
+
+    def trace(self, request_id, limit=50, exclude=None):
+        """Most recent `limit` lines of a request, oldest first (optionally skipping one seq)"""
+        seqs = [s for s in self._by_request.get(request_id, ()) if s != exclude]
+        return [self._get(s) for s in seqs[-limit:] if s >= self._oldest]
+
+    def stats(self):
+        return {
+            "lines": len(self),
+            "bytes": self._bytes,
+            "requests": len(self._by_request),
+            "evicted": self.evicted,
+        }
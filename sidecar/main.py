@@ -4,11 +4,23 @@ Night Agent Sidecar - Production-Ready Log Monitoring Agent
 Features:
 - Statistical & rule-based anomaly detection
 - Graceful shutdown handling (SIGTERM/SIGINT)
-- Rate limiting for anomaly reports
+- Hierarchical token-bucket rate limiting (global -> type -> template)
 - Configurable thresholds via environment variables
 - Auto-restart on monitor failure
+- Multiple ingest sources (file tail, stdin, Unix socket, syslog)
+- Background, batched anomaly reporting (detection never waits on HTTP)
+- Pooled keep-alive HTTP client with gzip bodies and per-endpoint timeouts
+- Disk-backed outbox so anomalies survive backend outages
+- Coalescing of repeated anomalies (same type + template) into one report
+- Anomalies ship with the preceding lines and the rest of their trace
+- Ingestion lag histograms (event -> read -> detect -> backend ack)
+- Memory governor that degrades detection step by step instead of getting OOM-killed
+- Hour-of-week frequency baselines, persisted with the detector state
+- Fleet template dictionary: preload known templates, export/publish our own
+- Optional asyncio runtime (RUNTIME=asyncio) for many sources per sidecar
 """
 
+import asyncio
 import logging
 import requests
 import json
@@ -16,10 +28,24 @@ import uuid
 import time
 import os
 import signal
-import sys
-from collections import deque
+import threading
+from datetime import datetime
 from detector import AnomalyDetector
 from monitor import LogMonitor
+from sources import StdinSource, UnixSocketSource, SyslogSource
+from catchup import CatchupScanner
+from rotated import RotatedLogReplayer, ReplayCheckpoint
+from reporter import AnomalyReporter
+from http_client import SidecarClient, parse_timeouts
+from metrics import metrics, MetricsServer
+from outbox import Outbox, OutboxReplayer
+from coalescer import AnomalyCoalescer
+from linebuffer import RawLogBuffer
+from lag import LagTracker
+from governor import ResourceGovernor
+from templates import export_templates, load_template_dictionary
+from ratelimit import HierarchicalRateLimiter, parse_budgets
+from async_runtime import AsyncSidecarRuntime, AsyncReporter, AsyncSidecarClient
 
 # Setup Logging
 logging.basicConfig(
@@ -35,6 +61,46 @@ BACKEND_URL = os.getenv("BACKEND_URL", "http://host.docker.internal:3001/api/sid
 SERVICE_ID = os.getenv("SERVICE_ID", "my-service")
 LOG_PATH = os.getenv("LOG_PATH", "./test.log")
 
+# Runtime: "threads" (one thread per source) or "asyncio" (one event loop for everything)
+RUNTIME = os.getenv("RUNTIME", "threads").lower()
+# asyncio runtime only: several files tailed by one sidecar (defaults to LOG_PATH)
+LOG_PATHS = [p.strip() for p in os.getenv("LOG_PATHS", LOG_PATH).split(",") if p.strip()]
+ASYNC_QUEUE_MAX = int(os.getenv("ASYNC_QUEUE_MAX", "10000"))  # Lines buffered per source
+
+# Ingest sources: comma-separated list of file, stdin, unix, syslog
+LOG_SOURCES = [s.strip() for s in os.getenv("LOG_SOURCES", "file").split(",") if s.strip()]
+LOG_SOCKET_PATH = os.getenv("LOG_SOCKET_PATH", "/tmp/night-agent.sock")
+LOG_SOCKET_TYPE = os.getenv("LOG_SOCKET_TYPE", "dgram")  # dgram | stream
+SYSLOG_HOST = os.getenv("SYSLOG_HOST", "0.0.0.0")
+SYSLOG_PORT = int(os.getenv("SYSLOG_PORT", "5514"))
+SYSLOG_PROTOCOL = os.getenv("SYSLOG_PROTOCOL", "udp")  # udp | tcp
+INGEST_BUFFER_SIZE = int(os.getenv("INGEST_BUFFER_SIZE", "65536"))
+INGEST_BATCH_MAX = int(os.getenv("INGEST_BATCH_MAX", "64"))  # Datagrams per wakeup
+
+# Startup catch-up: replay the last N MB of LOG_PATH before tailing (0 = disabled)
+CATCHUP_MB = float(os.getenv("CATCHUP_MB", "0"))
+
+# Rotated segments (app.log.1, app.log.2.gz, ...) replayed before the live file
+REPLAY_ROTATED = os.getenv("REPLAY_ROTATED", "false").lower() == "true"
+REPLAY_MAX_SEGMENTS = int(os.getenv("REPLAY_MAX_SEGMENTS", "5"))
+
+# Local state (checkpoints etc.) survives process restarts inside the container
+STATE_DIR = os.getenv("STATE_DIR", "./state")
+DETECTOR_STATE_PATH = os.getenv("DETECTOR_STATE_PATH", os.path.join(STATE_DIR, "detector-state.json"))
+STATE_SAVE_INTERVAL = int(os.getenv("STATE_SAVE_INTERVAL", "600"))  # Seconds between state snapshots
+
+# Fleet template dictionary: file path, http(s) URL or "backend" ("" = none)
+TEMPLATE_DICT_SOURCE = os.getenv("TEMPLATE_DICT_SOURCE", "")
+TEMPLATE_DICT_EXPORT = os.getenv("TEMPLATE_DICT_EXPORT", "")  # File our known set is written to
+TEMPLATE_DICT_PUBLISH = os.getenv("TEMPLATE_DICT_PUBLISH", "false").lower() == "true"  # POST to backend
+
+# Disk outbox for anomalies the backend could not accept
+OUTBOX_ENABLED = os.getenv("OUTBOX_ENABLED", "true").lower() == "true"
+OUTBOX_DIR = os.getenv("OUTBOX_DIR", os.path.join(STATE_DIR, "outbox"))
+OUTBOX_MAX_MB = float(os.getenv("OUTBOX_MAX_MB", "64"))
+OUTBOX_SEGMENT_KB = int(os.getenv("OUTBOX_SEGMENT_KB", "1024"))
+OUTBOX_FSYNC_EVERY = int(os.getenv("OUTBOX_FSYNC_EVERY", "50"))  # Records per fsync
+
 # Sidecar Identity (for authenticated communication)
 SIDECAR_ID = os.getenv("SIDECAR_ID", "")
 SIDECAR_API_KEY = os.getenv("SIDECAR_API_KEY", "")
@@ -43,6 +109,35 @@ SIDECAR_API_KEY = os.getenv("SIDECAR_API_KEY", "")
 HEARTBEAT_INTERVAL = int(os.getenv("HEARTBEAT_INTERVAL", "30"))
 RATE_LIMIT_MAX = int(os.getenv("RATE_LIMIT_MAX", "20"))  # Max anomalies per minute
 RATE_LIMIT_WINDOW = int(os.getenv("RATE_LIMIT_WINDOW", "60"))  # Window in seconds
+RATE_LIMIT_TYPE_MAX = int(os.getenv("RATE_LIMIT_TYPE_MAX", "10"))  # Per anomaly type per window
+RATE_LIMIT_TEMPLATE_MAX = int(os.getenv("RATE_LIMIT_TEMPLATE_MAX", "3"))  # Per template per window
+RATE_LIMIT_TYPE_BUDGETS = parse_budgets(os.getenv("RATE_LIMIT_TYPE_BUDGETS", ""))  # "Novel Log Template=5,..."
+RATE_LIMIT_PRIORITY_CONFIDENCE = float(os.getenv("RATE_LIMIT_PRIORITY_CONFIDENCE", "0.8"))
+RATE_LIMIT_RESERVE = float(os.getenv("RATE_LIMIT_RESERVE", "0.25"))  # Budget share kept for high confidence
+
+# Coalescing: repeats of (anomaly_type, template) within the window become one report
+COALESCE_WINDOW = float(os.getenv("COALESCE_WINDOW", "30"))  # Seconds, 0 = disabled
+COALESCE_SAMPLES = int(os.getenv("COALESCE_SAMPLES", "3"))  # Sample lines per report
+
+# Raw line context attached to anomalies (0 = only the triggering line)
+CONTEXT_BUFFER_KB = int(os.getenv("CONTEXT_BUFFER_KB", "2048"))  # Memory for recent raw lines
+
+# Memory self-governance (0 = disabled); keep the soft limit below the container limit
+MEMORY_SOFT_LIMIT_MB = float(os.getenv("MEMORY_SOFT_LIMIT_MB", "0"))
+MEMORY_HARD_LIMIT_MB = float(os.getenv("MEMORY_HARD_LIMIT_MB", "0"))
+GOVERNOR_INTERVAL = float(os.getenv("GOVERNOR_INTERVAL", "10"))  # Seconds between RSS checks
+
+# Background reporter batching
+REPORT_BATCH_SIZE = int(os.getenv("REPORT_BATCH_SIZE", "50"))
+REPORT_FLUSH_INTERVAL = float(os.getenv("REPORT_FLUSH_INTERVAL", "2.0"))  # Seconds
+REPORT_QUEUE_MAX = int(os.getenv("REPORT_QUEUE_MAX", "10000"))
+
+# Backend HTTP transport
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "4"))
+HTTP_COMPRESS_MIN_BYTES = int(os.getenv("HTTP_COMPRESS_MIN_BYTES", "1024"))  # -1 disables gzip
+HTTP_TIMEOUTS = parse_timeouts(os.getenv("HTTP_TIMEOUTS", ""))  # e.g. "heartbeat=2,anomalies/batch=10"
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))  # 0 = only report metrics in heartbeats
+LAG_WINDOW = int(os.getenv("LAG_WINDOW", "300"))  # Seconds of lag history in percentiles (1-2 windows)
 
 # Detector configuration (passed to AnomalyDetector)
 DETECTOR_CONFIG = {
@@ -51,15 +146,41 @@ DETECTOR_CONFIG = {
     "freq_threshold_flood": int(os.getenv("FREQ_THRESHOLD_FLOOD", "200")),
     "latency_threshold": float(os.getenv("LATENCY_THRESHOLD", "5.0")),
     "sequence_prob_threshold": float(os.getenv("SEQUENCE_PROB_THRESHOLD", "0.05")),
+    "context_lines": int(os.getenv("CONTEXT_LINES", "20")),  # Preceding lines per anomaly
+    "trace_lines": int(os.getenv("CONTEXT_TRACE_LINES", "50")),  # Same-request lines per anomaly
+    "seasonal_factor": float(os.getenv("SEASONAL_FACTOR", "3.0")),  # x hour-of-week baseline, 0 = off
 }
 
 # =============================================================================
 # GLOBAL STATE
 # =============================================================================
-detector = AnomalyDetector(config=DETECTOR_CONFIG)
-monitor = None  # Will be set in main()
-anomaly_timestamps = deque(maxlen=RATE_LIMIT_MAX * 2)  # Track recent anomaly times
+line_buffer = RawLogBuffer(max_bytes=CONTEXT_BUFFER_KB * 1024) if CONTEXT_BUFFER_KB > 0 else None
+lag = LagTracker(window=LAG_WINDOW)
+detector = AnomalyDetector(config=DETECTOR_CONFIG, line_buffer=line_buffer, lag=lag)
+detector_lock = threading.Lock()  # Sources run on their own threads
+sources = []  # Will be set in main()
+checkpoint = ReplayCheckpoint(os.path.join(STATE_DIR, "replay-checkpoint.json"))
+rate_limiter = HierarchicalRateLimiter(
+    window=RATE_LIMIT_WINDOW,
+    global_max=RATE_LIMIT_MAX,
+    type_max=RATE_LIMIT_TYPE_MAX,
+    template_max=RATE_LIMIT_TEMPLATE_MAX,
+    type_budgets=RATE_LIMIT_TYPE_BUDGETS,
+    priority_confidence=RATE_LIMIT_PRIORITY_CONFIDENCE,
+    reserve=RATE_LIMIT_RESERVE,
+)
+governor = None
+if MEMORY_SOFT_LIMIT_MB > 0:
+    governor = ResourceGovernor(
+        detector,
+        soft_limit_bytes=int(MEMORY_SOFT_LIMIT_MB * 1024 * 1024),
+        hard_limit_bytes=int(MEMORY_HARD_LIMIT_MB * 1024 * 1024) or None,
+        interval=GOVERNOR_INTERVAL,
+        lock=detector_lock,
+    )
 shutdown_requested = False
+shutdown_event = threading.Event()
+batch_endpoint_available = True  # Flipped off if the backend predates /anomalies/batch
 
 
 def get_auth_headers():
@@ -70,33 +191,40 @@ def get_auth_headers():
     return headers
 
 
-def is_rate_limited():
-    """Check if we've exceeded the rate limit for anomaly reports"""
-    now = time.time()
-    cutoff = now - RATE_LIMIT_WINDOW
-    
-    # Count anomalies in the window
-    recent = sum(1 for ts in anomaly_timestamps if ts > cutoff)
-    
-    if recent >= RATE_LIMIT_MAX:
-        return True
-    return False
+client = SidecarClient(
+    BACKEND_URL,
+    headers=get_auth_headers(),
+    timeouts=HTTP_TIMEOUTS,
+    compress_min_bytes=HTTP_COMPRESS_MIN_BYTES,
+    pool_maxsize=HTTP_POOL_SIZE,
+)
+async_client = AsyncSidecarClient(client, pool_size=HTTP_POOL_SIZE) if RUNTIME == "asyncio" else None
+metrics.register("http", client.connection_stats)
+metrics.register("rate_limit", rate_limiter.stats)
+metrics.register("lag", lag.snapshot)
+if governor:
+    metrics.register("governor", governor.snapshot)
+if line_buffer:
+    metrics.register("line_buffer", line_buffer.stats)
 
 
 def send_anomaly(anomaly_data):
     """
-    Sends structured anomaly event to the backend with rate limiting.
+    Queues structured anomaly event for the background reporter with rate limiting.
     """
-    # Check rate limit
-    if is_rate_limited():
-        logger.warning(f"⚠️ Rate limit exceeded ({RATE_LIMIT_MAX}/{RATE_LIMIT_WINDOW}s), skipping anomaly")
+    # Check rate limit (template -> type -> global budgets)
+    allowed, reason = rate_limiter.allow(
+        anomaly_data['anomaly_type'],
+        anomaly_data['context'].get('log_template', ''),
+        anomaly_data['confidence'],
+    )
+    if not allowed:
+        logger.warning(f"⚠️ Rate limit exceeded ({reason}), skipping {anomaly_data['anomaly_type']}")
         return
     
-    # Record this anomaly time
-    anomaly_timestamps.append(time.time())
-    
     # Extract severity from the original log line
-    log_line = anomaly_data.get('evidence', {}).get('log', '')
+    evidence = anomaly_data.get('evidence', {})
+    log_line = evidence.get('log', '')
     detected_severity = 'INFO'  # Default
     
     # Try to detect severity from log line
@@ -118,29 +246,160 @@ def send_anomaly(anomaly_data):
         "sidecarId": SIDECAR_ID or f"sidecar-{SERVICE_ID}", 
         "serviceId": SERVICE_ID,
         "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "detectedAt": iso_millis(anomaly_data.get('detected_at', time.time())),
         "severity": detected_severity,
         "message": anomaly_data['summary'],
-        "logs": [anomaly_data['evidence']['log']],
+        "logs": build_log_context(evidence),
         "traceId": f"trace-{uuid.uuid4()}",
         "confidence": anomaly_data['confidence'],
         "anomaly_type": anomaly_data['anomaly_type'],
         "context": anomaly_data['context'],
-        "evidence": anomaly_data['evidence']
+        # Preceding and trace lines already ship in "logs"
+        "evidence": {k: v for k, v in evidence.items() if k not in ('preceding', 'trace')}
     }
     
+    # Hand off to the background sender; detection never waits on the backend
+    reporter.submit(payload)
+
+
+def iso_millis(ts):
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ts)) + f".{int(ts % 1 * 1000):03d}Z"
+
+
+def record_ack_lag(payloads):
+    """Backend accepted these payloads: record detect -> ack lag"""
+    now = time.time()
+    for payload in payloads:
+        try:
+            detected = datetime.fromisoformat(payload['detectedAt'].replace('Z', '+00:00')).timestamp()
+        except (KeyError, ValueError):
+            continue  # Spooled by an older sidecar version
+        lag.observe("detect_to_ack", now - detected)
+
+
+def build_log_context(evidence):
+    """Lines shipped with an anomaly: what came before, the rest of the trace, then the trigger(s)"""
+    triggers = evidence.get('samples') or [evidence['log']]
+    logs = []
+    seen = set(triggers)
+    for line in evidence.get('preceding', []) + evidence.get('trace', []):
+        if line not in seen:
+            seen.add(line)
+            logs.append(line)
+    return logs + triggers
+
+
+def post_anomaly_batch(batch):
+    """
+    Deliver a batch of anomaly payloads (runs on the reporter thread).
+    Returns True/False for the batch endpoint, or the payloads that failed
+    when they go one by one, so only those are spooled.
+    """
+    global batch_endpoint_available
+    
+    if not batch_endpoint_available:
+        return [payload for payload in batch if not post_single_anomaly(payload)]
+    
     try:
-        url = f"{BACKEND_URL}/anomaly"
-        response = requests.post(url, json=payload, headers=get_auth_headers(), timeout=5)
+        response = client.post("anomalies/batch", {"anomalies": batch})
         if response.status_code in [200, 201]:
-            logger.info(f"✅ Anomaly reported: {payload['id']} ({anomaly_data['anomaly_type']})")
-        else:
-            logger.error(f"❌ Failed to report anomaly: {response.status_code} - {response.text}")
+            logger.info(f"✅ Reported {len(batch)} anomal{'y' if len(batch) == 1 else 'ies'}")
+            record_ack_lag(batch)
+            return True
+        if response.status_code == 404:
+            logger.warning("⚠️ Backend has no batch endpoint, falling back to single reports")
+            batch_endpoint_available = False
+            return post_anomaly_batch(batch)
+        logger.error(f"❌ Failed to report anomaly batch: {response.status_code} - {response.text}")
+    except requests.exceptions.Timeout:
+        logger.error("❌ Timeout sending anomaly batch to backend")
+    except requests.exceptions.ConnectionError:
+        logger.error("❌ Connection error sending anomaly batch to backend")
+    except Exception as e:
+        logger.error(f"❌ Error sending anomaly batch: {e}")
+    return False
+
+
+def post_single_anomaly(payload):
+    """Legacy per-anomaly endpoint"""
+    try:
+        response = client.post("anomaly", payload)
+        if response.status_code in [200, 201]:
+            logger.info(f"✅ Anomaly reported: {payload['id']} ({payload['anomaly_type']})")
+            record_ack_lag([payload])
+            return True
+        logger.error(f"❌ Failed to report anomaly: {response.status_code} - {response.text}")
     except requests.exceptions.Timeout:
         logger.error("❌ Timeout sending anomaly to backend")
     except requests.exceptions.ConnectionError:
         logger.error("❌ Connection error sending anomaly to backend")
     except Exception as e:
         logger.error(f"❌ Error sending anomaly: {e}")
+    return False
+
+
+async def post_anomaly_batch_async(batch):
+    """asyncio runtime: deliver a batch without blocking the event loop (same result as post_anomaly_batch)"""
+    global batch_endpoint_available
+    
+    if not batch_endpoint_available:
+        return [payload for payload in batch if not await post_single_anomaly_async(payload)]
+    
+    try:
+        response = await async_client.post("anomalies/batch", {"anomalies": batch})
+        if response.status_code in [200, 201]:
+            logger.info(f"✅ Reported {len(batch)} anomal{'y' if len(batch) == 1 else 'ies'}")
+            record_ack_lag(batch)
+            return True
+        if response.status_code == 404:
+            logger.warning("⚠️ Backend has no batch endpoint, falling back to single reports")
+            batch_endpoint_available = False
+            return await post_anomaly_batch_async(batch)
+        logger.error(f"❌ Failed to report anomaly batch: {response.status_code} - {response.text}")
+    except Exception as e:
+        logger.error(f"❌ Error sending anomaly batch: {e}")
+    return False
+
+
+async def post_single_anomaly_async(payload):
+    """asyncio runtime: legacy per-anomaly endpoint"""
+    try:
+        response = await async_client.post("anomaly", payload)
+        if response.status_code in [200, 201]:
+            logger.info(f"✅ Anomaly reported: {payload['id']} ({payload['anomaly_type']})")
+            record_ack_lag([payload])
+            return True
+        logger.error(f"❌ Failed to report anomaly: {response.status_code} - {response.text}")
+    except Exception as e:
+        logger.error(f"❌ Error sending anomaly: {e}")
+    return False
+
+
+outbox = None
+outbox_replayer = None
+if OUTBOX_ENABLED:
+    outbox = Outbox(
+        OUTBOX_DIR,
+        max_bytes=int(OUTBOX_MAX_MB * 1024 * 1024),
+        segment_bytes=OUTBOX_SEGMENT_KB * 1024,
+        fsync_every=OUTBOX_FSYNC_EVERY,
+    )
+    outbox_replayer = OutboxReplayer(outbox, post_anomaly_batch, batch_size=REPORT_BATCH_SIZE)
+    metrics.register("outbox", lambda: {**outbox.stats, "bytes": outbox.size_bytes()})
+
+reporter = (AsyncReporter if RUNTIME == "asyncio" else AnomalyReporter)(
+    post_anomaly_batch_async if RUNTIME == "asyncio" else post_anomaly_batch,
+    batch_size=REPORT_BATCH_SIZE,
+    flush_interval=REPORT_FLUSH_INTERVAL,
+    max_queue=REPORT_QUEUE_MAX,
+    on_failure=outbox.append if outbox else None,
+)
+metrics.register("reporter", lambda: {**reporter.stats, "pending": reporter.pending()})
+
+coalescer = None
+if COALESCE_WINDOW > 0:
+    coalescer = AnomalyCoalescer(send_anomaly, window=COALESCE_WINDOW, max_samples=COALESCE_SAMPLES)
+    metrics.register("coalescer", lambda: {**coalescer.stats, "open_groups": coalescer.open_groups()})
 
 
 def handle_log_line(line):
@@ -148,45 +407,75 @@ def handle_log_line(line):
     if shutdown_requested:
         return
         
+    read_at = time.time()
     try:
-        anomaly = detector.check(line)
-        
+        anomaly = detect_line(line, read_at)
         if anomaly:
-            logger.info(f"🚨 ANOMALY DETECTED: {anomaly['summary']} (Conf: {anomaly['confidence']:.2f})")
-            send_anomaly(anomaly)
-        else:
-            # Debug level to avoid log spam
-            logger.debug(f"Line processed, no anomaly: {line[:60]}...")
+            dispatch_anomaly(anomaly)
     except Exception as e:
         logger.error(f"Error processing log line: {e}", exc_info=True)
 
 
+def detect_line(line, read_at=None):
+    """Run one line through the detector (any thread); read_at enables lag tracking"""
+    if governor and not governor.admit(line):
+        return None  # Sampled out under memory pressure
+    with detector_lock:
+        anomaly = detector.check(line, read_at=read_at)
+    if not anomaly:
+        # Debug level to avoid log spam
+        logger.debug(f"Line processed, no anomaly: {line[:60]}...")
+    return anomaly
+
+
+def dispatch_anomaly(anomaly):
+    """Hand a detected anomaly to the coalescer or straight to reporting"""
+    logger.info(f"🚨 ANOMALY DETECTED: {anomaly['summary']} (Conf: {anomaly['confidence']:.2f})")
+    if coalescer:
+        coalescer.add(anomaly)
+    else:
+        send_anomaly(anomaly)
+
+
 def shutdown_handler(signum, frame):
-    """Handle graceful shutdown on SIGTERM/SIGINT"""
-    global shutdown_requested, monitor
+    """Handle SIGTERM/SIGINT: only flag the shutdown, main() does the cleanup"""
+    global shutdown_requested
     
     signal_name = signal.Signals(signum).name
     logger.info(f"🛑 Received {signal_name}, initiating graceful shutdown...")
     
     shutdown_requested = True
-    
-    if monitor:
-        monitor.stop()
-        logger.info("✅ Log monitor stopped")
+    shutdown_event.set()
+
+
+def shutdown():
+    """Stop sources and flush everything queued (threaded runtime)"""
+    for source in sources:
+        source.stop()
+    if sources:
+        logger.info("✅ Log sources stopped")
+    if governor:
+        governor.stop()
+    if coalescer:
+        coalescer.stop()  # Emits open groups before the reporter drains
+    if RUNTIME != "asyncio":
+        reporter.stop()  # The asyncio runtime drains its reporter before returning
+    if outbox:
+        outbox_replayer.stop()
+        outbox.close()
+    save_checkpoint()
+    save_detector_state()
+    if TEMPLATE_DICT_EXPORT or TEMPLATE_DICT_PUBLISH:
+        export_known_templates()
+    client.close()
     
     logger.info("👋 Sidecar shutdown complete")
-    sys.exit(0)
 
 
 def register_with_backend():
     """Register sidecar with backend on startup"""
     try:
-        response = requests.post(
-            f"{BACKEND_URL}/register", 
-            json={"sidecarId": SIDECAR_ID, "serviceId": SERVICE_ID},
-            headers=get_auth_headers(),
-            timeout=5
-        )
+        response = client.post("register", {"sidecarId": SIDECAR_ID, "serviceId": SERVICE_ID})
         if response.status_code in [200, 201]:
             logger.info("✅ Registered with backend successfully")
             return True
@@ -198,34 +487,255 @@ def register_with_backend():
         return False
 
 
+def heartbeat_payload():
+    return {
+        "sidecarId": SIDECAR_ID,
+        "metrics": metrics.snapshot(),
+        "lag": lag.summary(),
+        "degradation": governor.level_name if governor else "normal",
+    }
+
+
+def heartbeat_result(failures, status_code=None, error=None):
+    """Book-keeping after one heartbeat; returns the new consecutive failure count"""
+    if error is None and status_code in [200, 201]:
+        failures = 0
+    else:
+        failures += 1
+        if failures >= 3:
+            if error is not None:
+                logger.warning(f"⚠️ Heartbeat connection failed (attempt {failures}): {error}")
+            else:
+                logger.warning(f"⚠️ Heartbeat failing (attempt {failures}): {status_code}")
+    
+    # Spooled anomalies are only replayed while the backend answers heartbeats
+    if outbox_replayer:
+        if failures == 0:
+            outbox_replayer.mark_healthy()
+        else:
+            outbox_replayer.mark_unhealthy()
+    return failures
+
+
 def heartbeat_loop():
-    """Send periodic heartbeats to backend"""
+    """Send periodic heartbeats to backend until shutdown is requested"""
     failures = 0
     
-    while not shutdown_requested:
+    while not shutdown_event.is_set():
         try:
-            response = requests.post(
-                f"{BACKEND_URL}/heartbeat", 
-                json={"sidecarId": SIDECAR_ID},
-                headers=get_auth_headers(),
-                timeout=2
-            )
-            if response.status_code in [200, 201]:
-                failures = 0
-            else:
-                failures += 1
-                if failures >= 3:
-                    logger.warning(f"⚠️ Heartbeat failing (attempt {failures}): {response.status_code}")
+            response = client.post("heartbeat", heartbeat_payload())
+            failures = heartbeat_result(failures, status_code=response.status_code)
+        except Exception as e:
+            failures = heartbeat_result(failures, error=e)
+        
+        maybe_save_state()
+        shutdown_event.wait(HEARTBEAT_INTERVAL)
+
+
+async def heartbeat_task(runtime):
+    """asyncio runtime: heartbeat until the runtime starts stopping"""
+    loop = asyncio.get_running_loop()
+    failures = 0
+    
+    while not runtime.stopping.is_set():
+        try:
+            # Snapshot reads locks held by worker threads; keep it off the loop
+            payload = await loop.run_in_executor(None, heartbeat_payload)
+            response = await async_client.post("heartbeat", payload)
+            failures = heartbeat_result(failures, status_code=response.status_code)
         except Exception as e:
-            failures += 1
-            if failures >= 3:
-                logger.warning(f"⚠️ Heartbeat connection failed (attempt {failures}): {e}")
+            failures = heartbeat_result(failures, error=e)
         
-        time.sleep(HEARTBEAT_INTERVAL)
+        await loop.run_in_executor(None, maybe_save_state)
+        try:
+            await asyncio.wait_for(runtime.stopping.wait(), timeout=HEARTBEAT_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+
+
+def load_detector_state():
+    """Restore learned detector state (baselines) from the last run"""
+    try:
+        with open(DETECTOR_STATE_PATH, "r") as f:
+            state = json.load(f)
+    except FileNotFoundError:
+        return
+    except (OSError, ValueError) as e:
+        logger.warning(f"⚠️ Ignoring unreadable detector state: {e}")
+        return
+    with detector_lock:
+        restored = detector.load_state(state)
+    logger.info(f"📈 Restored seasonal baselines for {restored} templates")
+
+
+def save_detector_state():
+    """Atomically persist learned detector state"""
+    with detector_lock:
+        state = detector.export_state()
+    try:
+        directory = os.path.dirname(DETECTOR_STATE_PATH)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{DETECTOR_STATE_PATH}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(state, f, separators=(",", ":"))
+        os.replace(tmp_path, DETECTOR_STATE_PATH)
+    except OSError as e:
+        logger.warning(f"⚠️ Could not save detector state: {e}")
+
+
+last_state_save = time.monotonic()
+
+
+def maybe_save_state():
+    """Periodic state snapshot (called from the heartbeat) so a crash loses little"""
+    global last_state_save
+    if time.monotonic() - last_state_save >= STATE_SAVE_INTERVAL:
+        last_state_save = time.monotonic()
+        save_detector_state()
+        save_checkpoint()
+        if TEMPLATE_DICT_EXPORT or TEMPLATE_DICT_PUBLISH:
+            export_known_templates()
+
+
+def load_known_templates():
+    """Preload the fleet's known templates so a fresh pod does not re-alert on them"""
+    try:
+        dictionary = load_template_dictionary(TEMPLATE_DICT_SOURCE, client=client, service_id=SERVICE_ID)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not load template dictionary from {TEMPLATE_DICT_SOURCE}: {e}")
+        return
+    with detector_lock:
+        detector.known_templates = dictionary
+    metrics.register("templates", lambda: {"preloaded": dictionary.count, "bloom_bytes": dictionary.size_bytes()})
+    logger.info(f"📚 Preloaded {dictionary.count} known templates ({dictionary.size_bytes()} bytes)")
+
+
+def export_known_templates():
+    """Write and/or publish this sidecar's known-template set"""
+    with detector_lock:
+        keys = detector.known_template_ids()
+    state = export_templates(keys)
+    if TEMPLATE_DICT_EXPORT:
+        try:
+            tmp_path = f"{TEMPLATE_DICT_EXPORT}.tmp"
+            with open(tmp_path, "w") as f:
+                json.dump(state, f, separators=(",", ":"))
+            os.replace(tmp_path, TEMPLATE_DICT_EXPORT)
+        except OSError as e:
+            logger.warning(f"⚠️ Could not export template dictionary: {e}")
+    if TEMPLATE_DICT_PUBLISH:
+        try:
+            # The backend merges ID sets per service; it rebuilds the filter itself
+            response = client.post("templates", {"serviceId": SERVICE_ID, "count": state["count"], "ids": state["ids"]})
+            if response.status_code not in [200, 201]:
+                logger.warning(f"⚠️ Template publish returned: {response.status_code}")
+        except Exception as e:
+            logger.warning(f"⚠️ Could not publish template dictionary: {e}")
+
+
+def save_checkpoint():
+    """Record the event time of the last processed line for the next startup replay"""
+    try:
+        checkpoint.save(detector.context.last_log_time)
+    except OSError as e:
+        logger.warning(f"⚠️ Could not save replay checkpoint: {e}")
+
+
+def run_replay():
+    """
+    Replay rotated segments, then the live file (only its tail with CATCHUP_MB), before live tailing.
+    After a restart only lines newer than the checkpoint are replayed, through the
+    full detection path; on a first start history is only used to pre-warm the detector.
+    Returns the byte offset the file tail should resume from (None = end of file).
+    """
+    since = checkpoint.load()
+    feed = handle_log_line if since is not None else detector.learn
+    span = 0.0
+
+    offset = None
+    if REPLAY_ROTATED:
+        replayer = RotatedLogReplayer(LOG_PATH, detector.extractor.ts_pattern, max_segments=REPLAY_MAX_SEGMENTS)
+        # Without catch-up the live file is replayed too, or lines written since the checkpoint are lost
+        result = replayer.replay(feed, since=since, include_live=CATCHUP_MB <= 0)
+        span += result["span_seconds"]
+        offset = result["offset"]
+        logger.info(f"🗜️ Replayed {result['lines']} lines from {result['segments']} rotated segment(s)")
+
+    if CATCHUP_MB > 0:
+        result = CatchupScanner(LOG_PATH, int(CATCHUP_MB * 1024 * 1024)).run(detector, feed=feed, since=since)
+        span += result["span_seconds"]
+        offset = result["offset"]
+
+    detector.credit_warmup(span)
+    if span and not detector.is_warmup():
+        logger.info("🔥 Replayed history covered the learning period, warmup skipped")
+    return offset
+
+
+def build_source(name, callback, start_offset=None):
+    """Create one ingest source by LOG_SOURCES name (None if unknown)"""
+    if name == "file":
+        return LogMonitor(LOG_PATH, callback, auto_restart=True, start_offset=start_offset)
+    if name == "stdin":
+        return StdinSource(callback, buffer_size=INGEST_BUFFER_SIZE)
+    source = None
+    if name == "unix":
+        source = UnixSocketSource(
+            LOG_SOCKET_PATH, callback, socket_type=LOG_SOCKET_TYPE,
+            buffer_size=INGEST_BUFFER_SIZE, batch_max=INGEST_BATCH_MAX
+        )
+    elif name == "syslog":
+        source = SyslogSource(
+            SYSLOG_HOST, SYSLOG_PORT, callback, protocol=SYSLOG_PROTOCOL,
+            buffer_size=INGEST_BUFFER_SIZE, batch_max=INGEST_BATCH_MAX
+        )
+    if source:
+        metrics.register(f"source_{name}", lambda: dict(source.stats))
+        return source
+    logger.warning(f"⚠️ Unknown log source '{name}', ignoring")
+    return None
+
+
+def build_sources(start_offset=None):
+    """Create the ingest sources selected via LOG_SOURCES"""
+    built = [build_source(name, handle_log_line, start_offset) for name in LOG_SOURCES]
+    return [source for source in built if source]
+
+
+async def run_asyncio(start_offset=None):
+    """
+    asyncio runtime: every file in LOG_PATHS is tailed by a task, other sources
+    keep their reader thread but feed the loop; detection runs in an executor.
+    Returns once SIGTERM/SIGINT has been handled and all queues are drained.
+    """
+    runtime = AsyncSidecarRuntime(detect_line, dispatch_anomaly, queue_max=ASYNC_QUEUE_MAX)
+    metrics.register("runtime", lambda: {**runtime.stats, "pending_lines": runtime.pending()})
+    
+    for name in LOG_SOURCES:
+        if name == "file":
+            for path in LOG_PATHS:
+                # Catch-up/replay only covers LOG_PATH
+                runtime.add_file(path, start_offset if path == LOG_PATH else None)
+        elif name in ("stdin", "unix", "syslog"):
+            runtime.add_thread_source(name, lambda callback, name=name: build_source(name, callback))
+        else:
+            logger.warning(f"⚠️ Unknown log source '{name}', ignoring")
+    
+    runtime.add_service(heartbeat_task)
+    runtime.add_service(lambda rt: reporter.run(rt.drained))
+    if coalescer:
+        runtime.on_drain(coalescer.stop)  # Emits open groups before the reporter drains
+    
+    reporter.bind(asyncio.get_running_loop())
+    try:
+        await runtime.run()
+    finally:
+        await async_client.close()
 
 
 def main():
-    global monitor
+    global sources
     
     # Setup signal handlers for graceful shutdown
     signal.signal(signal.SIGTERM, shutdown_handler)
@@ -236,34 +746,75 @@ def main():
     logger.info("=" * 60)
     logger.info(f"Sidecar ID: {SIDECAR_ID or 'Not configured'}")
     logger.info(f"Service ID: {SERVICE_ID}")
-    logger.info(f"Log Path: {LOG_PATH}")
+    logger.info(f"Log Sources: {', '.join(LOG_SOURCES)}")
+    logger.info(f"Log Path: {', '.join(LOG_PATHS) if RUNTIME == 'asyncio' else LOG_PATH}")
+    logger.info(f"Runtime: {RUNTIME}{f' ({async_client.transport} HTTP)' if async_client else ''}")
     logger.info(f"Backend URL: {BACKEND_URL}")
     logger.info(f"Auth: {'API Key configured' if SIDECAR_API_KEY else 'No API key'}")
-    logger.info(f"Rate Limit: {RATE_LIMIT_MAX} anomalies / {RATE_LIMIT_WINDOW}s")
+    logger.info(
+        f"Rate Limit: {RATE_LIMIT_MAX} global / {RATE_LIMIT_TYPE_MAX} per type / "
+        f"{RATE_LIMIT_TEMPLATE_MAX} per template per {RATE_LIMIT_WINDOW}s"
+    )
+    logger.info(f"Coalescing: {f'{COALESCE_WINDOW:g}s window' if coalescer else 'disabled'}")
+    logger.info(f"Reporting: batches of {REPORT_BATCH_SIZE} / {REPORT_FLUSH_INTERVAL}s")
+    logger.info(f"Outbox: {f'{OUTBOX_DIR} (max {OUTBOX_MAX_MB:g} MB)' if OUTBOX_ENABLED else 'disabled'}")
+    logger.info(f"Memory Governor: {f'soft {MEMORY_SOFT_LIMIT_MB:g} MB' if governor else 'disabled'}")
     logger.info(f"Learning Period: {DETECTOR_CONFIG['learning_period']}s")
+    logger.info(f"Catch-up: {f'last {CATCHUP_MB:g} MB' if CATCHUP_MB > 0 else 'disabled'}")
+    logger.info(f"Rotated Replay: {f'up to {REPLAY_MAX_SEGMENTS} segments' if REPLAY_ROTATED else 'disabled'}")
     logger.info(f"Heartbeat Interval: {HEARTBEAT_INTERVAL}s")
     logger.info("Mode: Statistical & Rule-Based Anomaly Detection")
     logger.info("=" * 60)
     
+    load_detector_state()
+    if TEMPLATE_DICT_SOURCE:
+        load_known_templates()
+    
     # Register with backend
     register_with_backend()
+    if RUNTIME != "asyncio":
+        reporter.start()
+    if governor:
+        governor.start()
+    if coalescer:
+        coalescer.start()
+    if outbox_replayer:
+        outbox_replayer.start()
+    if METRICS_PORT:
+        MetricsServer(metrics, port=METRICS_PORT).start()
     
-    # Create log file if not exists
-    if not os.path.exists(LOG_PATH):
-        log_dir = os.path.dirname(LOG_PATH)
+    # Create log file(s) if not exists
+    log_paths = LOG_PATHS if RUNTIME == "asyncio" else [LOG_PATH]
+    for path in log_paths if "file" in LOG_SOURCES else []:
+        if os.path.exists(path):
+            continue
+        log_dir = os.path.dirname(path)
         if log_dir:
             os.makedirs(log_dir, exist_ok=True)
-        with open(LOG_PATH, 'w') as f:
+        with open(path, 'w') as f:
             f.write(f'{{"timestamp": "{time.strftime("%Y-%m-%dT%H:%M:%SZ")}", "message": "Sidecar started", "level": "INFO"}}\n')
-        logger.info(f"📝 Created log file: {LOG_PATH}")
+        logger.info(f"📝 Created log file: {path}")
+
+    # Replay rotated/existing content so the file tail resumes with no gap
+    start_offset = None
+    if (CATCHUP_MB > 0 or REPLAY_ROTATED) and "file" in LOG_SOURCES:
+        start_offset = run_replay()
+
+    if RUNTIME == "asyncio":
+        # Tailing, detection, heartbeats and reporting as tasks on one loop
+        if not shutdown_event.is_set():
+            asyncio.run(run_asyncio(start_offset))
+    else:
+        # Start ingest sources (file monitor auto-restarts on failure)
+        sources = build_sources(start_offset)
+        for source in sources:
+            source.start()
+        logger.info(f"📡 Monitoring {len(sources)} source(s): {', '.join(LOG_SOURCES)}")
 
-    # Start log monitor with auto-restart
-    monitor = LogMonitor(LOG_PATH, handle_log_line, auto_restart=True)
-    monitor.start()
-    logger.info(f"📡 Monitoring: {LOG_PATH}")
+        # Heartbeat loop (blocks until SIGTERM/SIGINT)
+        heartbeat_loop()
 
-    # Heartbeat loop (blocking)
-    heartbeat_loop()
+    shutdown()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,87 @@
+"""
+Sidecar Metrics - Shared Registry for Runtime Stats
+
+Features:
+- Components register a provider callable under a name
+- snapshot() collects everything into one JSON-serialisable dict
+- Snapshot is attached to heartbeats and optionally served over HTTP (GET /metrics)
+"""
+
+import json
+import time
+import logging
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("Metrics")
+
+
+class MetricsRegistry:
+    """Named metric providers; each provider returns a number or a dict"""
+
+    def __init__(self):
+        self._providers = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def register(self, name, provider):
+        """Register (or replace) the provider for `name`"""
+        with self._lock:
+            self._providers[name] = provider
+
+    def snapshot(self):
+        """Collect current values from all providers"""
+        with self._lock:
+            providers = list(self._providers.items())
+
+        result = {"uptime": round(time.time() - self.started_at, 1)}
+        for name, provider in providers:
+            try:
+                result[name] = provider()
+            except Exception as e:
+                logger.debug(f"Metric provider {name} failed: {e}")
+        return result
+
+
+class MetricsServer:
+    """Minimal JSON endpoint exposing a registry snapshot"""
+
+    def __init__(self, registry, host="0.0.0.0", port=9100):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+
+    def start(self):
+        registry = self.registry
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.rstrip("/") != "/metrics":
+                    self.send_error(404)
+                    return
+                body = json.dumps(registry.snapshot()).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # Keep scrapes out of the sidecar log
+
+        self.server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True, name="MetricsServer")
+        self.thread.start()
+        logger.info(f"📊 Metrics served on :{self.port}/metrics")
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+# Process-wide registry used by all sidecar components
+metrics = MetricsRegistry()
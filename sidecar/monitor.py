@@ -6,6 +6,7 @@ Features:
 - Auto-restarts on process failure
 - Graceful shutdown support
 - Configurable restart delay
+- Optional start offset to resume exactly where a catch-up scan stopped
 """
 
 import time
@@ -23,18 +24,20 @@ class LogMonitor:
     Supports auto-restart on failure and graceful shutdown.
     """
     
-    def __init__(self, log_path, callback, auto_restart=True, restart_delay=5):
+    def __init__(self, log_path, callback, auto_restart=True, restart_delay=5, start_offset=None):
         """
         Args:
             log_path: Path to the log file to monitor
             callback: Function to call for each log line
             auto_restart: Whether to restart tail on failure
             restart_delay: Seconds to wait before restart
+            start_offset: Byte offset to start the first tail from (None = end of file)
         """
         self.log_path = log_path
         self.callback = callback
         self.auto_restart = auto_restart
         self.restart_delay = restart_delay
+        self.start_offset = start_offset
         
         self.process = None
         self._stop_event = threading.Event()
@@ -54,8 +57,12 @@ class LogMonitor:
         logger.debug(f"Starting tail -F on {self.log_path}")
         
         # -F follows by name and retries if file is recreated
-        # -n 0 starts from end of file (no history)
-        cmd = ["tail", "-F", "-n", "0", self.log_path]
+        # -n 0 starts from end of file (no history); -c +N resumes after a catch-up scan
+        if self.start_offset is not None:
+            cmd = ["tail", "-F", "-c", f"+{self.start_offset + 1}", self.log_path]
+            self.start_offset = None  # Restarts fall back to the end of file
+        else:
+            cmd = ["tail", "-F", "-n", "0", self.log_path]
         
         try:
             self.process = subprocess.Popen(
@@ -0,0 +1,275 @@
+"""
+Anomaly Outbox - Durable Local Spool for Backend Outages
+
+Features:
+- Append-only JSON-lines segment files under a spool directory
+- fsync batching (every N records or T seconds, whichever comes first;
+  the replayer thread syncs records left over once appends stop)
+- Size cap with oldest-segment eviction (newest data wins when full)
+- Background replay in order with jittered exponential backoff,
+  gated on heartbeat health so live detection is never blocked
+"""
+
+import os
+import json
+import time
+import random
+import threading
+import logging
+
+from reporter import undelivered
+
+logger = logging.getLogger("Outbox")
+
+SEGMENT_PREFIX = "segment-"
+SEGMENT_SUFFIX = ".jsonl"
+
+
+class Outbox:
+    """Size-capped, append-only spool of anomaly payloads"""
+
+    def __init__(self, directory, max_bytes=64 * 1024 * 1024, segment_bytes=1024 * 1024,
+                 fsync_every=50, fsync_interval=1.0):
+        """
+        Args:
+            directory: Spool directory (created if missing)
+            max_bytes: Total spool size before the oldest segments are evicted
+            segment_bytes: Active segment is sealed once it reaches this size
+            fsync_every: fsync after this many appended records
+            fsync_interval: ...or after this many seconds since the last fsync
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.segment_bytes = segment_bytes
+        self.fsync_every = fsync_every
+        self.fsync_interval = fsync_interval
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._active = None
+        self._active_path = None
+        self._active_size = 0
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+        self._next_seq = self._scan_next_seq()
+        self.stats = {"spooled": 0, "replayed": 0, "evicted_segments": 0, "evicted_records": 0}
+
+    # Segment bookkeeping ----------------------------------------------------
+
+    def _scan_next_seq(self):
+        seqs = [self._seq(name) for name in os.listdir(self.directory) if self._is_segment(name)]
+        return max(seqs) + 1 if seqs else 0
+
+    @staticmethod
+    def _is_segment(name):
+        return name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX)
+
+    @staticmethod
+    def _seq(name):
+        return int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+
+    def _segments(self):
+        names = sorted((n for n in os.listdir(self.directory) if self._is_segment(n)), key=self._seq)
+        return [os.path.join(self.directory, n) for n in names]
+
+    def _open_active(self):
+        self._active_path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{self._next_seq:012d}{SEGMENT_SUFFIX}")
+        self._next_seq += 1
+        self._active = open(self._active_path, "ab")
+        self._active_size = 0
+
+    def _seal_active(self):
+        if self._active:
+            self._sync()
+            self._active.close()
+            if self._active_size == 0:
+                os.remove(self._active_path)
+        self._active = None
+        self._active_path = None
+        self._active_size = 0
+
+    def _sync(self):
+        if self._active and self._unsynced:
+            self._active.flush()
+            os.fsync(self._active.fileno())
+        self._unsynced = 0
+        self._last_sync = time.monotonic()
+
+    # Public API --------------------------------------------------------------
+
+    def append(self, payloads):
+        """Spool payloads (e.g. a batch the backend did not accept)"""
+        with self._lock:
+            for payload in payloads:
+                if self._active is None:
+                    self._open_active()
+                record = json.dumps(payload, separators=(",", ":")).encode("utf-8") + b"\n"
+                self._active.write(record)
+                self._active_size += len(record)
+                self._unsynced += 1
+                self.stats["spooled"] += 1
+
+                if self._active_size >= self.segment_bytes:
+                    self._seal_active()
+
+            # Always hand records to the OS; only the fsync is batched
+            if self._active:
+                self._active.flush()
+            if self._unsynced >= self.fsync_every or time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+            self._enforce_cap()
+
+    def sync_if_due(self):
+        """fsync records left unsynced for fsync_interval (appends alone stop syncing when they stop)"""
+        with self._lock:
+            if self._unsynced and time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync()
+
+    def _enforce_cap(self):
+        """Evict the oldest sealed segments until the spool fits max_bytes"""
+        segments = self._segments()
+        total = sum(os.path.getsize(p) for p in segments)
+        for path in segments:
+            if total <= self.max_bytes or path == self._active_path:
+                break
+            size = os.path.getsize(path)
+            with open(path, "rb") as f:
+                records = sum(1 for _ in f)
+            os.remove(path)
+            total -= size
+            self.stats["evicted_segments"] += 1
+            self.stats["evicted_records"] += records
+            logger.warning(f"⚠️ Outbox full, evicted {records} oldest anomalies")
+
+    def take_oldest(self):
+        """
+        Return (path, payloads) for the oldest segment, sealing the active one
+        first if it is the only data left. Returns (None, []) when empty.
+        """
+        with self._lock:
+            segments = self._segments()
+            if not segments:
+                return None, []
+            if segments[0] == self._active_path:
+                self._seal_active()
+                segments = self._segments()
+                if not segments:
+                    return None, []
+            path = segments[0]
+
+        payloads = []
+        with open(path, "rb") as f:
+            for raw in f:
+                try:
+                    payloads.append(json.loads(raw))
+                except ValueError:
+                    # Torn write from a crash; skip the partial record
+                    continue
+        return path, payloads
+
+    def commit(self, path, count):
+        """Remove a fully replayed segment"""
+        with self._lock:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            self.stats["replayed"] += count
+
+    def size_bytes(self):
+        with self._lock:
+            return sum(os.path.getsize(p) for p in self._segments())
+
+    def close(self):
+        with self._lock:
+            self._seal_active()
+
+
+class OutboxReplayer:
+    """
+    Replays spooled anomalies in order on its own thread once heartbeats
+    report the backend healthy. Failures back off with full jitter.
+    """
+
+    def __init__(self, outbox, send_batch, batch_size=50, base_delay=1.0, max_delay=60.0):
+        self.outbox = outbox
+        self.send_batch = send_batch
+        self.batch_size = batch_size
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._healthy = threading.Event()
+        self._stop_event = threading.Event()
+        self._attempt = 0
+        self._progress = {}  # segment path -> records already delivered
+        self.thread = None
+
+    def start(self):
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="OutboxReplayer")
+        self.thread.start()
+
+    def mark_healthy(self):
+        """Called on heartbeat success"""
+        self._healthy.set()
+
+    def mark_unhealthy(self):
+        """Called on heartbeat failure"""
+        self._healthy.clear()
+
+    def _backoff(self):
+        self._attempt += 1
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** self._attempt)))
+        logger.info(f"⏳ Outbox replay failed, retrying in {delay:.1f}s")
+        self._wait(delay)
+
+    def _wait(self, seconds):
+        """Sleep (until stopped) in short ticks that keep the outbox's time-based fsync going"""
+        deadline = time.monotonic() + seconds
+        while not self._stop_event.is_set():
+            self.outbox.sync_if_due()
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return
+            self._stop_event.wait(min(remaining, 1.0))
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.outbox.sync_if_due()
+            if not self._healthy.wait(timeout=1.0):
+                continue
+
+            path, payloads = self.outbox.take_oldest()
+            if path is None:
+                self._stop_event.wait(1.0)
+                continue
+
+            if self._replay_segment(path, payloads):
+                self.outbox.commit(path, len(payloads))
+                self._progress.pop(path, None)
+                self._attempt = 0
+                logger.info(f"📬 Replayed {len(payloads)} spooled anomalies")
+            else:
+                self._backoff()
+
+    def _replay_segment(self, path, payloads):
+        # Resume after the batches that already went through on a previous attempt
+        for i in range(self._progress.get(path, 0), len(payloads), self.batch_size):
+            if self._stop_event.is_set():
+                return False
+            batch = payloads[i:i + self.batch_size]
+            try:
+                # A partly accepted batch is retried whole: replay is at-least-once
+                ok = not undelivered(self.send_batch(batch), batch)
+            except Exception as e:
+                logger.error(f"❌ Outbox replay error: {e}")
+                ok = False
+            if not ok:
+                return False
+            self._progress[path] = i + self.batch_size
+        return True
+
+    def stop(self):
+        self._stop_event.set()
+        self._healthy.set()  # Unblock the wait
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=5)
@@ -0,0 +1,155 @@
+"""
+Rate Limiting - Hierarchical Token Buckets for Anomaly Reports
+
+Features:
+- O(1) token buckets at three levels: global -> anomaly type -> template
+- A report must fit every level; tokens are only taken when all levels agree
+- High-confidence anomalies may use a reserved slice of the global and type
+  budgets that low-confidence ones cannot touch
+- Per-template buckets are LRU-bounded
+- Counters for what was suppressed, at which level and why
+"""
+
+import time
+import threading
+from collections import OrderedDict, defaultdict
+
+
+class TokenBucket:
+    """Classic token bucket refilled continuously at `rate` tokens/second"""
+
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = now
+
+    def refill(self, now):
+        elapsed = now - self.updated
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.updated = now
+
+    def has(self, amount, floor=0.0):
+        """True if `amount` tokens can be taken while leaving at least `floor`"""
+        return self.tokens - amount >= floor
+
+    def take(self, amount=1.0):
+        self.tokens -= amount
+
+
+def parse_budgets(spec):
+    """Parse "Novel Log Template=5,Frequency Anomaly=10" into {type: max per window}"""
+    budgets = {}
+    for item in (spec or "").split(","):
+        if "=" in item:
+            name, value = item.rsplit("=", 1)
+            budgets[name.strip()] = int(value)
+    return budgets
+
+
+class HierarchicalRateLimiter:
+    """
+    Budgets are expressed as "max reports per window"; each bucket refills
+    at max/window tokens per second with a burst of max.
+    """
+
+    def __init__(self, window=60, global_max=20, type_max=10, template_max=3, type_budgets=None,
+                 priority_confidence=0.8, reserve=0.25, max_templates=1000, clock=time.monotonic):
+        """
+        Args:
+            window: Seconds the budgets refer to
+            global_max: Reports per window across everything
+            type_max: Default reports per window per anomaly type
+            template_max: Reports per window per (type, template)
+            type_budgets: Per-type overrides of type_max
+            priority_confidence: Anomalies at or above this confidence are high priority
+            reserve: Fraction of global/type capacity only high-priority anomalies may use
+            max_templates: Template buckets kept (least recently used evicted)
+        """
+        self.window = window
+        self.global_max = global_max
+        self.type_max = type_max
+        self.template_max = template_max
+        self.type_budgets = type_budgets or {}
+        self.priority_confidence = priority_confidence
+        self.reserve = reserve
+        self.max_templates = max_templates
+        self.clock = clock
+
+        now = clock()
+        self._global = TokenBucket(global_max / window, global_max, now)
+        self._types = {}
+        self._templates = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.allowed = 0
+        self.suppressed = defaultdict(int)          # level -> count
+        self.suppressed_by_type = defaultdict(int)  # anomaly type -> count
+        self.suppressed_low_priority = 0            # blocked only by the reserve
+
+    def _type_bucket(self, anomaly_type, now):
+        bucket = self._types.get(anomaly_type)
+        if bucket is None:
+            budget = self.type_budgets.get(anomaly_type, self.type_max)
+            bucket = self._types[anomaly_type] = TokenBucket(budget / self.window, budget, now)
+        return bucket
+
+    def _template_bucket(self, key, now):
+        bucket = self._templates.get(key)
+        if bucket is None:
+            bucket = self._templates[key] = TokenBucket(self.template_max / self.window, self.template_max, now)
+            if len(self._templates) > self.max_templates:
+                self._templates.popitem(last=False)
+        else:
+            self._templates.move_to_end(key)
+        return bucket
+
+    def allow(self, anomaly_type, template, confidence):
+        """
+        Decide whether a report may be sent.
+
+        Returns:
+            (allowed, reason) where reason is None or the suppressing level
+            ("template", "type", "global", optionally suffixed with ":reserve")
+        """
+        now = self.clock()
+        high_priority = confidence >= self.priority_confidence
+
+        with self._lock:
+            levels = (
+                ("template", self._template_bucket((anomaly_type, template), now), 0.0),
+                ("type", self._type_bucket(anomaly_type, now), self.reserve),
+                ("global", self._global, self.reserve),
+            )
+
+            for level, bucket, reserve in levels:
+                bucket.refill(now)
+                floor = 0.0 if high_priority else reserve * bucket.capacity
+                if not bucket.has(1.0, floor):
+                    reason = level
+                    if bucket.has(1.0):
+                        # Tokens exist, but they are held back for high-confidence anomalies
+                        reason = f"{level}:reserve"
+                        self.suppressed_low_priority += 1
+                    self.suppressed[level] += 1
+                    self.suppressed_by_type[anomaly_type] += 1
+                    return False, reason
+
+            for _, bucket, _ in levels:
+                bucket.take()
+            self.allowed += 1
+            return True, None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "allowed": self.allowed,
+                "suppressed": dict(self.suppressed),
+                "suppressed_by_type": dict(self.suppressed_by_type),
+                "suppressed_low_priority": self.suppressed_low_priority,
+                "global_tokens": round(self._global.tokens, 2),
+                "template_buckets": len(self._templates),
+            }
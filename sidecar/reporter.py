@@ -0,0 +1,145 @@
+"""
+Anomaly Reporter - Background, Batched Delivery to the Backend
+
+Features:
+- Detection thread only enqueues; HTTP happens on a dedicated sender thread
+- Batches bounded by size and by time since the first queued anomaly
+- Bounded queue: drops (and counts) new anomalies instead of blocking detection
+- Drains the queue on shutdown
+- Optional failure hook (e.g. spool undelivered anomalies to the disk outbox);
+  a partially accepted batch only hands over the anomalies that failed
+"""
+
+import time
+import queue
+import threading
+import logging
+
+logger = logging.getLogger("Reporter")
+
+
+def undelivered(result, batch):
+    """
+    Payloads of `batch` the backend did not accept, from a send_batch result:
+    True (all accepted), False (none) or the list of payloads that failed.
+    """
+    if result is True:
+        return []
+    if result is False or result is None:
+        return list(batch)
+    return list(result)
+
+
+class AnomalyReporter:
+    """
+    Collects anomaly payloads and hands them to `send_batch(list)` in batches.
+    `send_batch` returns True when the backend accepted the batch, False when it
+    did not, or the list of payloads that failed when only some went through.
+    """
+
+    def __init__(self, send_batch, batch_size=50, flush_interval=2.0, max_queue=10000, on_failure=None):
+        """
+        Args:
+            send_batch: Callable taking a list of payloads, returns success bool or the failed payloads
+            batch_size: Max anomalies per batch
+            flush_interval: Max seconds an anomaly waits for its batch to fill
+            max_queue: Max anomalies buffered before new ones are dropped
+            on_failure: Callable receiving the payloads the backend did not accept
+        """
+        self.send_batch = send_batch
+        self.on_failure = on_failure
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._stop_event = threading.Event()
+        self.thread = None
+        self.stats = {"queued": 0, "sent": 0, "failed": 0, "dropped": 0, "batches": 0}
+
+    def start(self):
+        """Start the sender thread"""
+        self._stop_event.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="AnomalyReporter")
+        self.thread.start()
+        logger.info(f"📤 Reporter started (batch {self.batch_size} / {self.flush_interval}s)")
+
+    def submit(self, payload):
+        """Queue an anomaly without blocking; returns False if it had to be dropped"""
+        try:
+            self._queue.put_nowait(payload)
+        except queue.Full:
+            self.stats["dropped"] += 1
+            logger.warning("⚠️ Reporter queue full, dropping anomaly")
+            return False
+        self.stats["queued"] += 1
+        return True
+
+    def pending(self):
+        """Number of anomalies waiting to be sent"""
+        return self._queue.qsize()
+
+    def _next_batch(self):
+        """Block for the first anomaly, then fill the batch until size or time bound"""
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stop_event.is_set():
+                break
+            try:
+                # Short waits so stop() is noticed without waiting out the interval
+                batch.append(self._queue.get(timeout=min(remaining, 0.1)))
+            except queue.Empty:
+                continue
+        return batch
+
+    def _drain(self):
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._deliver(batch)
+
+        # Shutdown: flush whatever is still queued
+        batch = self._drain()
+        while batch:
+            self._deliver(batch)
+            batch = self._drain()
+
+    def _deliver(self, batch):
+        self.stats["batches"] += 1
+        try:
+            failed = undelivered(self.send_batch(batch), batch)
+        except Exception as e:
+            logger.error(f"❌ Error sending anomaly batch: {e}")
+            failed = list(batch)
+
+        self.stats["sent"] += len(batch) - len(failed)
+        if not failed:
+            return
+
+        self.stats["failed"] += len(failed)
+        if self.on_failure:
+            try:
+                self.on_failure(failed)
+            except Exception as e:
+                logger.error(f"❌ Failure handler error, {len(failed)} anomalies lost: {e}")
+
+    def stop(self, timeout=10):
+        """Stop accepting work and flush the queue (bounded by timeout)"""
+        self._stop_event.set()
+        if self.thread and self.thread.is_alive():
+            self.thread.join(timeout=timeout)
+        logger.info(f"📤 Reporter stopped ({self.stats['sent']} sent, {self.stats['failed']} failed)")
@@ -0,0 +1,204 @@
+"""
+Rotated Log Replay - Stream Rotated (and Compressed) Segments Before Tailing
+
+Features:
+- Discovers logrotate-style segments next to LOG_PATH (app.log.1, app.log.2.gz, app.log-20240101.zst)
+- Streams gzip (and zstd when the `zstandard` package is installed) in fixed-size chunks
+- Memory stays bounded by the chunk size, independent of segment size
+- Checkpoint of the last processed event time so restarts only replay what was missed
+"""
+
+import os
+import re
+import gzip
+import json
+import logging
+from datetime import datetime
+from sources import LineSplitter
+
+try:
+    import zstandard
+except ImportError:  # Optional dependency
+    zstandard = None
+
+logger = logging.getLogger("Rotated")
+
+DEFAULT_CHUNK_SIZE = 65536
+
+# Suffixes produced by logrotate: .1 / .2.gz / -20240101 / .2024-01-01.gz / .1.zst
+_SEGMENT_SUFFIX = re.compile(r'^[.-](\d+|\d{4}-?\d{2}-?\d{2}(?:[-_]?\d+)?)(\.\d+)?(\.gz|\.zst)?$')
+
+
+def open_segment(path):
+    """Open a segment as a binary stream, decompressing on the fly"""
+    if path.endswith(".gz"):
+        return gzip.open(path, "rb")
+    if path.endswith(".zst"):
+        if zstandard is None:
+            raise RuntimeError("zstandard package not installed")
+        raw = open(path, "rb")
+        return zstandard.ZstdDecompressor().stream_reader(raw, read_across_frames=True, closefd=True)
+    return open(path, "rb")
+
+
+def iter_segment_lines(path, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Yield decoded lines from a (possibly compressed) segment, one chunk in memory at a time"""
+    splitter = LineSplitter()
+    with open_segment(path) as stream:
+        while True:
+            chunk = stream.read(chunk_size)
+            if not chunk:
+                break
+            yield from splitter.feed(chunk)
+    yield from splitter.flush()
+
+
+def find_rotated_segments(log_path):
+    """Return rotated segments of log_path, oldest first"""
+    directory = os.path.dirname(log_path) or "."
+    base = os.path.basename(log_path)
+    segments = []
+
+    try:
+        names = os.listdir(directory)
+    except FileNotFoundError:
+        return segments
+
+    for name in names:
+        if name == base or not name.startswith(base):
+            continue
+        if not _SEGMENT_SUFFIX.match(name[len(base):]):
+            continue
+        path = os.path.join(directory, name)
+        if name.endswith(".zst") and zstandard is None:
+            logger.warning(f"⚠️ Skipping {name}: install 'zstandard' to read zstd segments")
+            continue
+        segments.append((os.path.getmtime(path), path))
+
+    # Oldest first by mtime; the rotation number breaks ties (higher = older)
+    return [path for _, path in sorted(segments, key=lambda s: (s[0], -_rotation_index(s[1])))]
+
+
+def _rotation_index(path):
+    match = re.search(r'\.(\d+)(?:\.gz|\.zst)?$', path)
+    return int(match.group(1)) if match else 0
+
+
+class ReplayCheckpoint:
+    """Persists the event time of the last processed log line"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        """Return the last processed event timestamp, or None on first run"""
+        try:
+            with open(self.path, "r") as f:
+                return float(json.load(f)["last_event_ts"])
+        except (FileNotFoundError, KeyError, ValueError, TypeError):
+            return None
+
+    def save(self, last_event_ts):
+        """Atomically record the last processed event timestamp"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"last_event_ts": last_event_ts}, f)
+        os.replace(tmp_path, self.path)
+
+
+class RotatedLogReplayer:
+    """
+    Streams rotated segments of a log file, oldest first, into a line callback.
+    Lines at or before `since` (event time) are skipped.
+    """
+
+    def __init__(self, log_path, ts_pattern, max_segments=5, chunk_size=DEFAULT_CHUNK_SIZE):
+        """
+        Args:
+            log_path: Path to the live log file
+            ts_pattern: Compiled timestamp regex (FeatureExtractor.ts_pattern)
+            max_segments: Only the newest N segments are replayed
+            chunk_size: Decompressed bytes read per chunk
+        """
+        self.log_path = log_path
+        self.ts_pattern = ts_pattern
+        self.max_segments = max_segments
+        self.chunk_size = chunk_size
+
+    def replay(self, feed, since=None, include_live=False):
+        """
+        Feed rotated lines to `feed` in order. With include_live, the complete lines
+        of the live file follow as the last segment, so nothing written between the
+        checkpoint and the restart is lost when tailing starts.
+
+        Returns:
+            dict with segment/line counts, the event-time span covered and (with
+            include_live) the live-file offset tailing should resume from
+        """
+        result = {"segments": 0, "lines": 0, "skipped": 0, "span_seconds": 0.0, "offset": None}
+        segments = find_rotated_segments(self.log_path)[-self.max_segments:] if self.max_segments else []
+        bounds = [None, None]  # first/last event time fed
+
+        for path in segments:
+            # Whole segment predates the checkpoint
+            if since is not None and os.path.getmtime(path) < since:
+                continue
+
+            result["segments"] += 1
+            try:
+                self._feed_lines(iter_segment_lines(path, self.chunk_size), feed, since, result, bounds)
+            except (OSError, EOFError, RuntimeError) as e:
+                # Truncated/corrupt archives still contribute what was readable
+                logger.warning(f"⚠️ Stopped reading {path}: {e}")
+
+            logger.info(f"🗜️ Replayed rotated segment {os.path.basename(path)}")
+
+        if include_live:
+            result["offset"] = self._replay_live(feed, since, result, bounds)
+
+        if bounds[0] is not None:
+            result["span_seconds"] = bounds[1] - bounds[0]
+        return result
+
+    def _replay_live(self, feed, since, result, bounds):
+        """Feed the live file's complete lines; returns the offset after the last one"""
+        splitter = LineSplitter()
+        read = 0
+        try:
+            with open(self.log_path, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                while read < size:
+                    chunk = f.read(min(self.chunk_size, size - read))
+                    if not chunk:
+                        break
+                    read += len(chunk)
+                    self._feed_lines(splitter.feed(chunk), feed, since, result, bounds)
+        except FileNotFoundError:
+            return 0
+        # A trailing partial line is left for the tail to pick up once it is complete
+        return read - splitter.pending_bytes
+
+    def _feed_lines(self, lines, feed, since, result, bounds):
+        ts = None
+        for line in lines:
+            ts = self._event_time(line) or ts
+            if since is not None and ts is not None and ts <= since:
+                result["skipped"] += 1
+                continue
+            if ts is not None:
+                bounds[0] = ts if bounds[0] is None else min(bounds[0], ts)
+                bounds[1] = ts if bounds[1] is None else max(bounds[1], ts)
+            feed(line)
+            result["lines"] += 1
+
+    def _event_time(self, line):
+        match = self.ts_pattern.search(line[:256])
+        if not match:
+            return None
+        try:
+            return datetime.fromisoformat(match.group(0).replace("Z", "+00:00")).timestamp()
+        except ValueError:
+            return None
@@ -0,0 +1,142 @@
+"""
+Seasonal Baselines - Hour-of-Week Expected Rates per Template
+
+Features:
+- 168 float32 slots per template (one per hour of the week, UTC): 672 bytes fixed
+- Tracks the busiest detection window of each hour (bursty batch jobs are
+  not averaged away) and folds it into an EWMA when the hour rolls over;
+  silent hours decay towards zero
+- Expected peak count per detection window for the current slot (None if never observed)
+- Bounded number of templates (least recently updated evicted)
+- Compact export/import (base64 float32 arrays) for persisted detector state
+"""
+
+import math
+import time
+import base64
+from array import array
+from collections import OrderedDict
+
+SLOTS = 168  # 7 days x 24 hours
+_NAN = float("nan")
+
+
+def hour_of_week(ts):
+    """Slot index for an epoch timestamp (Monday 00:00 UTC = 0)"""
+    t = time.gmtime(ts)
+    return t.tm_wday * 24 + t.tm_hour
+
+
+def _hour_index(ts):
+    """Absolute hour number, used to count skipped hours between updates"""
+    return int(ts // 3600)
+
+
+def _slot_of_hour(hour):
+    """hour_of_week() for an absolute hour (epoch hour 0 was a Thursday)"""
+    return (hour + 72) % SLOTS
+
+
+class SeasonalBaselines:
+    """
+    Per-template expected rates. Within the template's current hour, counts are
+    kept per fixed detection window; the hour's peak window count is folded
+    into the slot's EWMA when the next hour starts.
+    Not thread-safe on its own: the owning detector serialises access.
+    """
+
+    def __init__(self, window_seconds=300, alpha=0.3, max_templates=5000):
+        """
+        Args:
+            window_seconds: Detection window the expected rate is expressed in
+            alpha: EWMA weight of the newest week's observation
+            max_templates: Templates tracked before the least recently updated is dropped
+        """
+        self.window_seconds = window_seconds
+        self.alpha = alpha
+        self.max_templates = max_templates
+        self._rates = OrderedDict()  # template_id -> array('f', SLOTS), NaN = never observed
+        self._current = {}           # template_id -> [absolute hour, window index, window count, peak]
+
+    def __len__(self):
+        return len(self._rates)
+
+    def size_bytes(self):
+        return len(self._rates) * SLOTS * 4
+
+    def observe(self, template_id, ts):
+        """Count one occurrence of a template at event time `ts`"""
+        hour = _hour_index(ts)
+        window = int(ts // self.window_seconds)
+        current = self._current.get(template_id)
+        if current is None:
+            self._slots(template_id)
+            self._current[template_id] = [hour, window, 1, 1]
+            return
+        if hour > current[0]:
+            self._fold(template_id, current[0], current[3], hour)
+            current[:] = [hour, window, 1, 1]
+        elif hour == current[0]:
+            if window == current[1]:
+                current[2] += 1
+            elif window > current[1]:
+                current[1], current[2] = window, 1
+            current[3] = max(current[3], current[2])
+        # Out-of-order lines from an earlier hour are ignored
+
+    def _slots(self, template_id):
+        slots = self._rates.get(template_id)
+        if slots is None:
+            slots = self._rates[template_id] = array("f", [_NAN]) * SLOTS
+            if len(self._rates) > self.max_templates:
+                evicted, _ = self._rates.popitem(last=False)
+                self._current.pop(evicted, None)
+        else:
+            self._rates.move_to_end(template_id)
+        return slots
+
+    def _fold(self, template_id, hour, peak, next_hour):
+        """Close `hour` with its peak window count; hours with no occurrences count as zero"""
+        slots = self._slots(template_id)
+        self._update(slots, _slot_of_hour(hour), float(peak))
+        # Hours with no occurrence at all (at most one week matters)
+        for h in range(hour + 1, min(next_hour, hour + 1 + SLOTS)):
+            self._update(slots, _slot_of_hour(h), 0.0)
+
+    def _update(self, slots, slot, rate):
+        old = slots[slot]
+        slots[slot] = rate if math.isnan(old) else (1 - self.alpha) * old + self.alpha * rate
+
+    def expected(self, template_id, ts):
+        """Expected peak occurrences per detection window in ts's hour-of-week slot (None if unknown)"""
+        slots = self._rates.get(template_id)
+        if slots is None:
+            return None
+        value = slots[hour_of_week(ts)]
+        return None if math.isnan(value) else value
+
+    def export(self):
+        return {
+            "slots": SLOTS,
+            "window_seconds": self.window_seconds,
+            "templates": {
+                tid: base64.b64encode(slots.tobytes()).decode("ascii") for tid, slots in self._rates.items()
+            },
+            "current": {tid: list(cur) for tid, cur in self._current.items()},
+        }
+
+    def load(self, state):
+        """Restore from export(); ignores state written with a different layout"""
+        if not state or state.get("slots") != SLOTS or state.get("window_seconds") != self.window_seconds:
+            return 0
+        self._rates.clear()
+        self._current.clear()
+        for tid, encoded in state.get("templates", {}).items():
+            slots = array("f")
+            slots.frombytes(base64.b64decode(encoded))
+            if len(slots) == SLOTS:
+                self._rates[tid] = slots
+        for tid, current in state.get("current", {}).items():
+            if tid in self._rates and len(current) == 4:
+                self._current[tid] = [int(v) for v in current]
+        return len(self._rates)
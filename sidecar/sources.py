@@ -0,0 +1,384 @@
+"""
+Log Sources - Alternative Ingest Modes for the Sidecar
+
+Features:
+- stdin ingest (pipe the application straight into the sidecar)
+- Unix domain socket listener (datagram or stream)
+- Syslog listener over UDP or TCP (RFC 3164 / RFC 5424, newline framed)
+- Batched reads: drains many datagrams / large stream chunks per wakeup
+- Same callback contract and lifecycle (start/stop/is_running) as LogMonitor
+"""
+
+import os
+import re
+import sys
+import stat
+import socket
+import select
+import selectors
+import threading
+import logging
+
+logger = logging.getLogger("Sources")
+
+DEFAULT_BUFFER_SIZE = 65536  # Bytes per recv/read call
+DEFAULT_BATCH_MAX = 64       # Max datagrams drained per wakeup (recvmmsg-style)
+
+
+class LineSplitter:
+    """
+    Reassembles newline-delimited lines from arbitrary byte chunks.
+    Keeps the trailing partial line until the next chunk completes it.
+    """
+
+    def __init__(self, max_line_bytes=DEFAULT_BUFFER_SIZE * 4):
+        self._partial = b""
+        self.max_line_bytes = max_line_bytes
+
+    def feed(self, chunk):
+        """Add a chunk and return the complete lines it finished (decoded, stripped)"""
+        data = self._partial + chunk if self._partial else chunk
+        parts = data.split(b"\n")
+        self._partial = parts.pop()
+
+        # Guard against a producer that never sends a newline
+        if len(self._partial) > self.max_line_bytes:
+            parts.append(self._partial)
+            self._partial = b""
+
+        return [line for line in (_decode(p) for p in parts) if line]
+
+    @property
+    def pending_bytes(self):
+        """Size of the partial line still waiting for its newline"""
+        return len(self._partial)
+
+    def flush(self):
+        """Return the pending partial line (used on EOF / connection close)"""
+        line = _decode(self._partial)
+        self._partial = b""
+        return [line] if line else []
+
+
+def _decode(raw):
+    return raw.decode("utf-8", errors="replace").strip()
+
+
+# Syslog header parsing -------------------------------------------------------
+
+_SYSLOG_PRI = re.compile(r'^<(\d{1,3})>')
+_RFC5424 = re.compile(
+    r'^1 (?P<ts>\S+) (?P<host>\S+) (?P<app>\S+) (?P<procid>\S+) (?P<msgid>\S+) '
+    r'(?P<sd>-|(?:\[.*?\])+) ?(?P<msg>.*)$'
+)
+_RFC3164 = re.compile(
+    r'^(?P<ts>[A-Z][a-z]{2} [ \d]\d \d{2}:\d{2}:\d{2}) (?P<host>\S+) (?P<tag>[^:\s]+):? ?(?P<msg>.*)$'
+)
+# Syslog severity (PRI & 7) -> level understood by FeatureExtractor
+_SYSLOG_LEVELS = ['CRITICAL', 'CRITICAL', 'CRITICAL', 'ERROR', 'WARN', 'INFO', 'INFO', 'DEBUG']
+
+
+def parse_syslog_line(line):
+    """
+    Strip the syslog envelope and return a line the detector already understands.
+
+    JSON payloads are passed through untouched. Plain-text payloads are prefixed
+    with the header timestamp (RFC 5424 only, since RFC 3164 has no year/zone)
+    and the PRI severity, e.g. "2024-01-01T00:00:00Z ERROR: disk full".
+    """
+    match = _SYSLOG_PRI.match(line)
+    if not match:
+        return line
+
+    level = _SYSLOG_LEVELS[int(match.group(1)) & 7]
+    rest = line[match.end():]
+    timestamp = None
+
+    m5424 = _RFC5424.match(rest)
+    if m5424:
+        msg = m5424.group('msg')
+        if m5424.group('ts') != '-':
+            timestamp = m5424.group('ts')
+    else:
+        m3164 = _RFC3164.match(rest)
+        msg = m3164.group('msg') if m3164 else rest
+
+    msg = msg.lstrip('\ufeff').strip()
+    if msg.startswith('{'):
+        return msg
+    return f"{timestamp} {level}: {msg}" if timestamp else f"{level}: {msg}"
+
+
+# Sources ----------------------------------------------------------------------
+
+class LineSource:
+    """
+    Base class for push-style log sources.
+    Subclasses implement _run(); lines are delivered one at a time to the callback.
+    """
+
+    name = "source"
+
+    def __init__(self, callback, buffer_size=DEFAULT_BUFFER_SIZE, transform=None):
+        self.callback = callback
+        self.buffer_size = buffer_size
+        self.transform = transform
+        self._stop_event = threading.Event()
+        self.thread = None
+
+    def start(self):
+        """Start the reader thread"""
+        self._stop_event.clear()
+        self._setup()
+        self.thread = threading.Thread(target=self._safe_run, daemon=True, name=f"Source-{self.name}")
+        self.thread.start()
+        logger.info(f"📡 {self.describe()} started")
+
+    def _setup(self):
+        """Open sockets/handles before the thread starts (errors surface to the caller)"""
+
+    def _safe_run(self):
+        try:
+            self._run()
+        except Exception as e:
+            logger.error(f"❌ {self.describe()} failed: {e}")
+        finally:
+            self._teardown()
+            logger.info(f"📴 {self.describe()} exited")
+
+    def _run(self):
+        raise NotImplementedError
+
+    def _teardown(self):
+        """Release sockets/handles"""
+
+    def _emit(self, lines):
+        for line in lines:
+            if self.transform:
+                line = self.transform(line)
+            if not line:
+                continue
+            try:
+                self.callback(line)
+            except Exception as e:
+                logger.error(f"Callback error: {e}")
+
+    def describe(self):
+        return self.name
+
+    def stop(self):
+        """Stop the source gracefully"""
+        self._stop_event.set()
+        if self.thread and self.thread.is_alive() and self.thread is not threading.current_thread():
+            self.thread.join(timeout=5)
+
+    def is_running(self):
+        """Check if the source is still running"""
+        return self.thread and self.thread.is_alive()
+
+
+class StdinSource(LineSource):
+    """Reads newline-delimited logs from stdin in large chunks until EOF"""
+
+    name = "stdin"
+
+    def __init__(self, callback, stream=None, **kwargs):
+        super().__init__(callback, **kwargs)
+        self.stream = stream or sys.stdin.buffer
+
+    def _run(self):
+        fd = self.stream.fileno()
+        splitter = LineSplitter()
+
+        while not self._stop_event.is_set():
+            ready, _, _ = select.select([fd], [], [], 0.5)
+            if not ready:
+                continue
+            chunk = os.read(fd, self.buffer_size)
+            if not chunk:
+                self._emit(splitter.flush())
+                logger.info("stdin reached EOF")
+                return
+            self._emit(splitter.feed(chunk))
+
+
+class _SocketSource(LineSource):
+    """
+    Shared selector loop for datagram and stream listeners.
+    Datagram sockets are drained up to batch_max packets per wakeup;
+    stream connections are read in buffer_size chunks with per-connection reassembly.
+    """
+
+    def __init__(self, callback, socket_type="dgram", batch_max=DEFAULT_BATCH_MAX, **kwargs):
+        super().__init__(callback, **kwargs)
+        if socket_type not in ("dgram", "stream"):
+            raise ValueError(f"Unsupported socket type: {socket_type}")
+        self.socket_type = socket_type
+        self.batch_max = batch_max
+        self.sock = None
+        self._selector = None
+        self._connections = {}  # conn -> LineSplitter
+        self.stats = {"truncated_datagrams": 0}
+
+    def _bind(self):
+        raise NotImplementedError
+
+    def _setup(self):
+        self.sock = self._bind()
+        if self.socket_type == "stream":
+            self.sock.listen(64)
+        self.sock.setblocking(False)
+        self._selector = selectors.DefaultSelector()
+        self._selector.register(self.sock, selectors.EVENT_READ)
+
+    def _run(self):
+        buf = bytearray(self.buffer_size)
+        view = memoryview(buf)
+
+        while not self._stop_event.is_set():
+            for key, _ in self._selector.select(timeout=0.5):
+                sock = key.fileobj
+                if sock is self.sock and self.socket_type == "dgram":
+                    self._drain_datagrams(view)
+                elif sock is self.sock:
+                    self._accept()
+                else:
+                    self._read_connection(sock)
+
+    def _drain_datagrams(self, view):
+        """Read up to batch_max queued datagrams into one reused buffer"""
+        lines = []
+        truncated = 0
+        for _ in range(self.batch_max):
+            try:
+                nbytes, cut = self._recv_datagram(view)
+            except (BlockingIOError, InterruptedError):
+                break
+            # Each datagram is a complete record; it may still carry several lines
+            parts = bytes(view[:nbytes]).split(b"\n")
+            if cut:
+                # Larger than the buffer: the last line lost its end, drop it rather than pass it on
+                parts.pop()
+                truncated += 1
+            lines.extend(line for line in (_decode(p) for p in parts) if line)
+        if truncated:
+            self.stats["truncated_datagrams"] += truncated
+            logger.warning(f"⚠️ {self.describe()}: {truncated} datagram(s) over {self.buffer_size} bytes "
+                           f"truncated, partial lines dropped (raise INGEST_BUFFER_SIZE)")
+        self._emit(lines)
+
+    def _recv_datagram(self, view):
+        """Receive one datagram into view; returns (nbytes, truncated)"""
+        if hasattr(self.sock, "recvmsg_into"):
+            nbytes, _, flags, _ = self.sock.recvmsg_into([view])
+            return nbytes, bool(flags & socket.MSG_TRUNC)
+        # No recvmsg (Windows): a datagram filling the whole buffer was probably cut
+        nbytes = self.sock.recv_into(view)
+        return nbytes, nbytes == len(view)
+
+    def _accept(self):
+        try:
+            conn, _ = self.sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        conn.setblocking(False)
+        self._connections[conn] = LineSplitter()
+        self._selector.register(conn, selectors.EVENT_READ)
+
+    def _read_connection(self, conn):
+        splitter = self._connections[conn]
+        try:
+            chunk = conn.recv(self.buffer_size)
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError:
+            chunk = b""
+
+        if chunk:
+            self._emit(splitter.feed(chunk))
+            return
+
+        # Peer closed the connection
+        self._emit(splitter.flush())
+        self._selector.unregister(conn)
+        del self._connections[conn]
+        conn.close()
+
+    def _teardown(self):
+        for conn in list(self._connections):
+            try:
+                conn.close()
+            except OSError:
+                pass
+        self._connections.clear()
+        if self._selector:
+            self._selector.close()
+        if self.sock:
+            self.sock.close()
+
+
+class UnixSocketSource(_SocketSource):
+    """Listens on a Unix domain socket (datagram or stream)"""
+
+    name = "unix"
+
+    def __init__(self, path, callback, socket_type="dgram", **kwargs):
+        super().__init__(callback, socket_type=socket_type, **kwargs)
+        self.path = path
+
+    def _bind(self):
+        # Remove a stale socket file left by a previous run, never anything else
+        try:
+            mode = os.lstat(self.path).st_mode
+        except FileNotFoundError:
+            pass
+        else:
+            if not stat.S_ISSOCK(mode):
+                raise FileExistsError(f"{self.path} exists and is not a socket; refusing to replace it")
+            os.unlink(self.path)
+        kind = socket.SOCK_DGRAM if self.socket_type == "dgram" else socket.SOCK_STREAM
+        sock = socket.socket(socket.AF_UNIX, kind)
+        if kind == socket.SOCK_DGRAM:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.buffer_size * self.batch_max)
+        sock.bind(self.path)
+        return sock
+
+    def _teardown(self):
+        super()._teardown()
+        try:
+            os.unlink(self.path)
+        except OSError:
+            pass
+
+    def describe(self):
+        return f"Unix {self.socket_type} socket {self.path}"
+
+
+class SyslogSource(_SocketSource):
+    """Listens for syslog messages over UDP or TCP and strips the syslog envelope"""
+
+    name = "syslog"
+
+    def __init__(self, host, port, callback, protocol="udp", **kwargs):
+        if protocol not in ("udp", "tcp"):
+            raise ValueError(f"Unsupported syslog protocol: {protocol}")
+        kwargs.setdefault("transform", parse_syslog_line)
+        super().__init__(callback, socket_type="dgram" if protocol == "udp" else "stream", **kwargs)
+        self.host = host
+        self.port = port
+        self.protocol = protocol
+
+    def _bind(self):
+        family = socket.AF_INET6 if ":" in self.host else socket.AF_INET
+        kind = socket.SOCK_DGRAM if self.protocol == "udp" else socket.SOCK_STREAM
+        sock = socket.socket(family, kind)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        if kind == socket.SOCK_DGRAM:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, self.buffer_size * self.batch_max)
+        sock.bind((self.host, self.port))
+        # Pick up the real port when bound to 0 (tests, ephemeral listeners)
+        self.port = sock.getsockname()[1]
+        return sock
+
+    def describe(self):
+        return f"Syslog {self.protocol.upper()} listener {self.host}:{self.port}"
@@ -0,0 +1,136 @@
+"""
+Template Dictionary - Fleet-Wide Known Templates for Warm Starts
+
+Features:
+- Compact 64-bit template IDs (the detector's 16-hex-digit template_id as an int)
+- Bloom filter over known IDs: O(1) membership, ~1.2 bytes per template at 1% FPR
+- Export of a sidecar's known set (sorted uint64 IDs + Bloom filter, base64 JSON)
+- Preload from a file, an http(s) URL or the backend (sidecar API)
+"""
+
+import sys
+import json
+import math
+import base64
+from array import array
+
+FORMAT_VERSION = 1
+
+
+def template_key(template_id):
+    """16-hex-digit template_id -> unsigned 64-bit int"""
+    return int(template_id, 16)
+
+
+def encode_ids(keys):
+    """Sorted uint64 little-endian, base64"""
+    ids = array("Q", sorted(keys))
+    if sys.byteorder == "big":
+        ids.byteswap()
+    return base64.b64encode(ids.tobytes()).decode("ascii")
+
+
+def decode_ids(encoded):
+    ids = array("Q")
+    ids.frombytes(base64.b64decode(encoded))
+    if sys.byteorder == "big":
+        ids.byteswap()
+    return ids
+
+
+class BloomFilter:
+    """
+    Bit array with k probes derived from the key by double hashing.
+    Keys are already uniform hashes (md5 prefix), so no rehashing is needed.
+    """
+
+    def __init__(self, bits, hashes, data=None):
+        self.bits = bits
+        self.hashes = hashes
+        self.data = bytearray(data) if data is not None else bytearray((bits + 7) // 8)
+
+    @classmethod
+    def for_capacity(cls, capacity, error_rate=0.01):
+        capacity = max(1, capacity)
+        bits = max(64, int(math.ceil(-capacity * math.log(error_rate) / (math.log(2) ** 2))))
+        hashes = max(1, int(round(bits / capacity * math.log(2))))
+        return cls(bits, hashes)
+
+    def _probes(self, key):
+        h1 = key & 0xFFFFFFFF
+        h2 = (key >> 32) | 1
+        for i in range(self.hashes):
+            yield (h1 + i * h2) % self.bits
+
+    def add(self, key):
+        for bit in self._probes(key):
+            self.data[bit >> 3] |= 1 << (bit & 7)
+
+    def __contains__(self, key):
+        return all(self.data[bit >> 3] & (1 << (bit & 7)) for bit in self._probes(key))
+
+    def export(self):
+        return {"bits": self.bits, "hashes": self.hashes, "data": base64.b64encode(bytes(self.data)).decode("ascii")}
+
+    @classmethod
+    def from_export(cls, state):
+        return cls(int(state["bits"]), int(state["hashes"]), base64.b64decode(state["data"]))
+
+
+class TemplateDictionary:
+    """Preloaded known-template set; only the Bloom filter is kept in memory"""
+
+    def __init__(self, bloom, count=0, source=""):
+        self.bloom = bloom
+        self.count = count
+        self.source = source
+
+    def __contains__(self, template_id):
+        return template_key(template_id) in self.bloom
+
+    def size_bytes(self):
+        return len(self.bloom.data)
+
+    @classmethod
+    def from_ids(cls, keys, error_rate=0.01, source=""):
+        keys = set(keys)
+        bloom = BloomFilter.for_capacity(len(keys), error_rate)
+        for key in keys:
+            bloom.add(key)
+        return cls(bloom, len(keys), source)
+
+    @classmethod
+    def from_export(cls, state, source=""):
+        """Build from export_templates() output (or a backend response with only ids)"""
+        if not state or state.get("version") != FORMAT_VERSION:
+            raise ValueError("unsupported template dictionary format")
+        if state.get("bloom"):
+            return cls(BloomFilter.from_export(state["bloom"]), int(state.get("count", 0)), source)
+        return cls.from_ids(decode_ids(state.get("ids", "")), source=source)
+
+
+def export_templates(template_ids, error_rate=0.01):
+    """Known-template set as JSON-serialisable dict (compact IDs + Bloom filter)"""
+    keys = sorted({template_key(tid) if isinstance(tid, str) else tid for tid in template_ids})
+    bloom = TemplateDictionary.from_ids(keys, error_rate).bloom
+    return {"version": FORMAT_VERSION, "count": len(keys), "ids": encode_ids(keys), "bloom": bloom.export()}
+
+
+def load_template_dictionary(source, client=None, service_id=""):
+    """
+    Load a dictionary from a file path, an http(s) URL, or "backend"
+    (GET templates/<service_id> through the sidecar client).
+    """
+    if source == "backend":
+        response = client.get(f"templates/{service_id}")
+        response.raise_for_status()
+        state = response.json()
+    elif source.startswith(("http://", "https://")):
+        import requests
+        response = requests.get(source, timeout=10)
+        response.raise_for_status()
+        state = response.json()
+    else:
+        with open(source, "r") as f:
+            state = json.load(f)
+    return TemplateDictionary.from_export(state, source=source)
@@ -0,0 +1,135 @@
+import asyncio
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from async_runtime import AsyncSidecarRuntime, AsyncReporter
+
+
+class TestAsyncReporter(unittest.TestCase):
+    def test_batches_and_drains_on_done(self):
+        batches = []
+
+        async def send(batch):
+            batches.append(list(batch))
+            return True
+
+        async def scenario():
+            reporter = AsyncReporter(send, batch_size=4, flush_interval=5.0)
+            for i in range(10):
+                reporter.submit({"id": i})  # Before bind: kept in the backlog
+            done = asyncio.Event()
+            done.set()
+            await reporter.run(done)
+            return reporter
+
+        reporter = asyncio.run(scenario())
+        self.assertEqual([len(b) for b in batches], [4, 4, 2])
+        self.assertEqual(reporter.stats["sent"], 10)
+
+    def test_submit_from_other_thread_and_failure_hook(self):
+        spooled = []
+
+        async def send(batch):
+            return False
+
+        async def scenario():
+            reporter = AsyncReporter(send, batch_size=10, flush_interval=0.05, on_failure=spooled.extend)
+            reporter.bind(asyncio.get_running_loop())
+            done = asyncio.Event()
+            task = asyncio.create_task(reporter.run(done))
+            thread = threading.Thread(target=lambda: [reporter.submit({"id": i}) for i in range(5)])
+            thread.start()
+            thread.join()
+            await asyncio.sleep(0.3)
+            done.set()
+            await task
+            return reporter
+
+        reporter = asyncio.run(scenario())
+        self.assertEqual(len(spooled), 5)
+        self.assertEqual(reporter.stats["failed"], 5)
+
+
+class TestAsyncSidecarRuntime(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    @unittest.skipUnless(shutil.which("tail"), "tail not available")
+    def test_tails_many_files_and_drains_before_reporting_stops(self):
+        paths = [os.path.join(self.tmp, f"app{i}.log") for i in range(3)]
+        for path in paths:
+            open(path, "w").close()
+
+        seen = []
+        events = []
+
+        def detect(line, read_at):
+            seen.append(line)
+            return {"line": line} if "ERROR" in line else None
+
+        async def scenario():
+            runtime = AsyncSidecarRuntime(detect, lambda anomaly: events.append(anomaly["line"]), restart_delay=1)
+            for path in paths:
+                runtime.add_file(path)
+
+            async def reporter_service(rt):
+                await rt.drained.wait()
+                events.append("reporter-drained")
+
+            runtime.add_service(reporter_service)
+            runtime.on_drain(lambda: events.append("drain-hook"))
+
+            task = asyncio.create_task(runtime.run(install_signals=False))
+            await asyncio.sleep(0.5)  # Let the tails start
+            for i, path in enumerate(paths):
+                with open(path, "a") as f:
+                    f.write(f"INFO ok {i}\nERROR failed {i}\n")
+
+            for _ in range(50):
+                if len(seen) == 6:
+                    break
+                await asyncio.sleep(0.1)
+            runtime.request_stop()
+            await task
+            return runtime
+
+        runtime = asyncio.run(scenario())
+        self.assertEqual(len(seen), 6)
+        self.assertEqual(runtime.stats["anomalies"], 3)
+        self.assertEqual(sorted(events[:3]), ["ERROR failed 0", "ERROR failed 1", "ERROR failed 2"])
+        self.assertEqual(events[3:], ["drain-hook", "reporter-drained"])
+
+    def test_thread_source_lines_are_drained_on_stop(self):
+        seen = []
+
+        class FakeSource:
+            def __init__(self, callback):
+                self.callback = callback
+
+            def start(self):
+                for i in range(100):
+                    self.callback(f"line {i}")
+
+            def stop(self):
+                pass
+
+        async def scenario():
+            runtime = AsyncSidecarRuntime(lambda line, read_at: seen.append(line), lambda anomaly: None,
+                                          detect_batch=16)
+            runtime.add_thread_source("fake", FakeSource)
+            task = asyncio.create_task(runtime.run(install_signals=False))
+            await asyncio.sleep(0)
+            runtime.request_stop()
+            await task
+
+        asyncio.run(scenario())
+        self.assertEqual(len(seen), 100)
+
+
+if __name__ == "__main__":
+    unittest.main()
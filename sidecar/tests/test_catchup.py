@@ -0,0 +1,70 @@
+import unittest
+import os
+import tempfile
+from catchup import CatchupScanner
+from detector import AnomalyDetector
+
+
+class RecordingDetector(AnomalyDetector):
+    def __init__(self):
+        super().__init__()
+        self.learned = []
+
+    def learn(self, raw_log):
+        self.learned.append(raw_log)
+        super().learn(raw_log)
+
+
+class TestCatchupScanner(unittest.TestCase):
+    def setUp(self):
+        fd, self.path = tempfile.mkstemp(suffix='.log')
+        os.close(fd)
+
+    def tearDown(self):
+        os.unlink(self.path)
+
+    def write(self, content):
+        with open(self.path, 'w') as f:
+            f.write(content)
+
+    def test_replays_in_event_time_order_and_skips_trailing_partial(self):
+        self.write(
+            '{"timestamp": "2024-01-01T10:00:02Z", "message": "second"}\n'
+            '{"timestamp": "2024-01-01T10:00:01Z", "message": "first"}\n'
+            '{"timestamp": "2024-01-01T10:00:03Z", "message": "partial'
+        )
+        detector = RecordingDetector()
+        result = CatchupScanner(self.path, 1024 * 1024).run(detector)
+
+        self.assertEqual([l.split('"message": "')[1][:-2] for l in detector.learned], ['first', 'second'])
+        self.assertEqual(result['lines'], 2)
+        self.assertEqual(result['span_seconds'], 1.0)
+        # Live tail must resume at the start of the unfinished line
+        with open(self.path, 'rb') as f:
+            self.assertEqual(f.read()[result['offset']:][:15], b'{"timestamp": "')
+
+    def test_window_skips_leading_partial_line(self):
+        lines = [f'2024-01-01T10:00:{i:02d}Z INFO: request {i} handled\n' for i in range(50)]
+        self.write(''.join(lines))
+        detector = RecordingDetector()
+        CatchupScanner(self.path, 100).run(detector)
+
+        self.assertTrue(detector.learned)
+        self.assertTrue(all(l.startswith('2024-01-01T') for l in detector.learned))
+        self.assertEqual(detector.learned[-1], lines[-1].strip())
+
+    def test_prewarmed_templates_are_not_novel(self):
+        self.write(''.join(
+            f'{{"timestamp": "2024-01-01T10:{m:02d}:00Z", "level": "WARN", "message": "Cache miss for key {m}"}}\n'
+            for m in range(10)
+        ))
+        detector = AnomalyDetector(config={"learning_period": 300})
+        result = CatchupScanner(self.path, 1024 * 1024).run(detector)
+        detector.credit_warmup(result['span_seconds'])
+
+        self.assertFalse(detector.is_warmup())
+        self.assertIsNone(detector.check('{"level": "WARN", "message": "Cache miss for key 99"}'))
+
+
+if __name__ == '__main__':
+    unittest.main()
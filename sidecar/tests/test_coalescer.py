@@ -0,0 +1,79 @@
+import unittest
+import time
+from unittest import mock
+from coalescer import AnomalyCoalescer
+
+
+def anomaly(kind, template, log, confidence=0.9):
+    return {
+        "anomaly_type": kind,
+        "confidence": confidence,
+        "context": {"log_template": template, "severity": "ERROR"},
+        "evidence": {"log": log},
+        "summary": f"{kind}: {template}",
+    }
+
+
+class TestAnomalyCoalescer(unittest.TestCase):
+    def setUp(self):
+        self.emitted = []
+
+    def test_first_anomaly_is_reported_at_once(self):
+        coalescer = AnomalyCoalescer(self.emitted.append, window=60)
+        coalescer.add(anomaly("Frequency Anomaly", "DB down <NUM>", "DB down 0"))
+        self.assertEqual(len(self.emitted), 1)
+        self.assertEqual(self.emitted[0]["evidence"]["occurrences"], 1)
+        self.assertEqual(self.emitted[0]["summary"], "Frequency Anomaly: DB down <NUM>")
+
+        coalescer.flush_all()  # nothing repeated: no second report
+        self.assertEqual(len(self.emitted), 1)
+
+    def test_repeats_become_one_aggregate(self):
+        coalescer = AnomalyCoalescer(self.emitted.append, window=60, max_samples=2)
+        with mock.patch("coalescer.time.time", side_effect=[1000.0 + i for i in range(100)]):
+            for i in range(100):
+                coalescer.add(anomaly("Frequency Anomaly", "DB down <NUM>", f"DB down {i}",
+                                      confidence=0.7 if i else 0.9))
+        self.assertEqual(len(self.emitted), 1)
+        coalescer.flush_all()
+
+        self.assertEqual(len(self.emitted), 2)
+        first, report = self.emitted
+        self.assertEqual(first["evidence"]["samples"], ["DB down 0"])
+        # Only the repeats: the first anomaly was already reported and is not counted twice
+        self.assertEqual(report["evidence"]["occurrences"], 99)
+        self.assertEqual(first["evidence"]["occurrences"] + report["evidence"]["occurrences"], 100)
+        self.assertEqual(report["evidence"]["first_seen"], "1970-01-01T00:16:41Z")
+        self.assertEqual(report["evidence"]["last_seen"], "1970-01-01T00:18:19Z")
+        self.assertEqual(report["evidence"]["samples"], ["DB down 1", "DB down 2"])
+        self.assertEqual(report["confidence"], 0.9)
+        self.assertEqual(report["summary"], "Frequency Anomaly: DB down <NUM> (x99 more in 98s)")
+
+    def test_distinct_incidents_are_kept_apart(self):
+        coalescer = AnomalyCoalescer(self.emitted.append, window=60)
+        coalescer.add(anomaly("Frequency Anomaly", "DB down", "DB down"))
+        coalescer.add(anomaly("Novel Log Template", "Disk full", "Disk full"))
+        coalescer.add(anomaly("Frequency Anomaly", "DB down", "DB down"))
+        self.assertEqual([r["context"]["log_template"] for r in self.emitted], ["DB down", "Disk full"])
+        coalescer.flush_all()
+        self.assertEqual([r["evidence"]["occurrences"] for r in self.emitted], [1, 1, 1])
+
+    def test_window_expiry_and_group_cap(self):
+        coalescer = AnomalyCoalescer(self.emitted.append, window=0.05, max_groups=2)
+        for template in ("t1", "t1", "t2", "t2", "t3"):  # t3 pushes t1 out early
+            coalescer.add(anomaly("A", template, template))
+        self.assertEqual([(r["context"]["log_template"], r["evidence"]["occurrences"]) for r in self.emitted],
+                         [("t1", 1), ("t2", 1), ("t1", 1), ("t3", 1)])
+
+        coalescer.flush_expired()  # window still open
+        self.assertEqual(len(self.emitted), 4)
+        time.sleep(0.06)
+        coalescer.flush_expired()
+        self.assertEqual(self.emitted[-1]["evidence"]["occurrences"], 1)  # t2's one repeat
+        self.assertEqual(len(self.emitted), 5)
+        self.assertEqual(coalescer.open_groups(), 0)
+        self.assertEqual(coalescer.stats["emitted"], 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+from detector import AnomalyDetector
+from linebuffer import RawLogBuffer
+from governor import ResourceGovernor, read_rss
+
+MB = 1024 * 1024
+
+
+class FakeRss:
+    def __init__(self, value):
+        self.value = value
+
+    def __call__(self):
+        return self.value
+
+
+class TestResourceGovernor(unittest.TestCase):
+    def setUp(self):
+        self.detector = AnomalyDetector(config={"learning_period": 0}, line_buffer=RawLogBuffer(max_bytes=64 * 1024))
+        for i in range(200):
+            self.detector.check(f'{{"message": "event kind {chr(65 + i % 26)}{i // 26}", "request_id": "r{i}"}}')
+
+    def test_read_rss_is_positive(self):
+        self.assertGreater(read_rss(), 0)
+
+    def test_degrades_in_steps_and_recovers(self):
+        rss = FakeRss(300 * MB)
+        governor = ResourceGovernor(self.detector, soft_limit_bytes=200 * MB, rss_reader=rss, recover_after=1)
+        context = self.detector.context
+
+        self.assertEqual(governor.check(), 1)
+        self.assertEqual(context.max_traces, 250)
+        self.assertEqual(self.detector.line_buffer.max_bytes, 32 * 1024)
+
+        templates = len(context.template_stats)
+        self.assertEqual(governor.check(), 2)
+        self.assertEqual(len(context.template_stats), templates // 2)
+        self.assertEqual(governor.stats["templates_evicted"], templates - templates // 2)
+
+        self.assertEqual(governor.check(), 3)
+        self.assertEqual(governor.sample_every, 2)
+        admitted = sum(governor.admit(f"INFO: line {i}") for i in range(100))
+        self.assertEqual(admitted, 50)
+        self.assertTrue(governor.admit("ERROR: always kept"))
+
+        rss.value = 100 * MB
+        while governor.level:
+            governor.check()
+        self.assertEqual(governor.sample_every, 1)
+        self.assertEqual(context.max_traces, context.DEFAULT_MAX_TRACES)
+        self.assertEqual(self.detector.line_buffer.max_bytes, 64 * 1024)
+
+    def test_hard_limit_degrades_fully(self):
+        governor = ResourceGovernor(self.detector, soft_limit_bytes=200 * MB, hard_limit_bytes=250 * MB,
+                                    rss_reader=FakeRss(260 * MB))
+        self.assertEqual(governor.check(), 3)
+        self.assertEqual(governor.snapshot()["level_name"], "sampling")
+
+    def test_evicted_templates_are_not_novel_again(self):
+        context = self.detector.context
+        context.evict_templates(10)
+        anomaly = self.detector.check('{"message": "event kind A0", "request_id": "again"}')
+        self.assertIsNone(anomaly)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import gzip
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from http_client import SidecarClient, parse_timeouts
+
+
+class StubSidecarApi(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    received = []
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.headers.get("Content-Encoding") == "gzip":
+            body = gzip.decompress(body)
+        self.received.append((self.path, self.headers.get("Content-Encoding"), json.loads(body)))
+        reply = b'{"status": "ok"}'
+        self.send_response(201)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestSidecarClient(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubSidecarApi)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.base_url = f"http://127.0.0.1:{cls.server.server_address[1]}/api/sidecar"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        StubSidecarApi.received = []
+
+    def test_connections_are_reused(self):
+        client = SidecarClient(self.base_url, compress_min_bytes=-1)
+        for _ in range(5):
+            self.assertEqual(client.post("heartbeat", {"sidecarId": "s1"}).status_code, 201)
+        stats = client.connection_stats()
+        self.assertEqual(stats["connections_opened"], 1)
+        self.assertEqual(stats["connections_reused"], 4)
+        client.close()
+
+    def test_large_bodies_are_gzipped(self):
+        client = SidecarClient(self.base_url, compress_min_bytes=256)
+        client.post("heartbeat", {"sidecarId": "s1"})
+        client.post("anomalies/batch", {"anomalies": [{"evidence": {"log": "x" * 2000}}]})
+
+        (_, enc_small, _), (path, enc_large, body) = StubSidecarApi.received
+        self.assertIsNone(enc_small)
+        self.assertEqual(enc_large, "gzip")
+        self.assertEqual(path, "/api/sidecar/anomalies/batch")
+        self.assertEqual(len(body["anomalies"][0]["evidence"]["log"]), 2000)
+        stats = client.connection_stats()
+        self.assertLess(stats["bytes_sent"], stats["bytes_raw"])
+        client.close()
+
+    def test_parse_timeouts(self):
+        self.assertEqual(parse_timeouts("heartbeat=2, anomalies/batch=7.5"), {"heartbeat": 2.0, "anomalies/batch": 7.5})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,52 @@
+import json
+import time
+import unittest
+from lag import StreamingHistogram, LagTracker
+from detector import AnomalyDetector
+
+
+class TestStreamingHistogram(unittest.TestCase):
+    def test_quantiles_within_bucket_error(self):
+        hist = StreamingHistogram()
+        for i in range(1, 1001):
+            hist.add(i / 100.0)  # 0.01 .. 10.0 seconds
+        summary = hist.summary()
+        self.assertEqual(summary["count"], 1000)
+        self.assertAlmostEqual(summary["p50"], 5.0, delta=5.0 * 0.06)
+        self.assertAlmostEqual(summary["p99"], 9.9, delta=9.9 * 0.06)
+        self.assertEqual(summary["max"], 10.0)
+
+    def test_negative_values_count_as_skew(self):
+        hist = StreamingHistogram()
+        hist.add(-2.0)
+        self.assertEqual(hist.negative, 1)
+        self.assertEqual(hist.quantile(0.5), 0.0)
+
+
+class TestLagTracker(unittest.TestCase):
+    def test_windows_rotate_out_old_samples(self):
+        now = [0.0]
+        tracker = LagTracker(window=10, clock=lambda: now[0])
+        tracker.observe("event_to_read", 30.0)
+        now[0] = 11
+        tracker.observe("event_to_read", 1.0)
+        self.assertEqual(tracker.snapshot()["event_to_read"]["max"], 30.0)
+        now[0] = 22
+        tracker.observe("event_to_read", 1.0)
+        self.assertEqual(tracker.snapshot()["event_to_read"]["max"], 1.0)
+
+    def test_detector_records_event_and_detect_lag(self):
+        tracker = LagTracker()
+        detector = AnomalyDetector(lag=tracker)
+        stamp = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(time.time() - 120))
+        detector.check(json.dumps({"timestamp": stamp, "message": "late line"}), read_at=time.time())
+        detector.check("no timestamp here", read_at=time.time())
+        snapshot = tracker.snapshot()
+        self.assertEqual(snapshot["event_to_read"]["count"], 1)
+        self.assertGreater(snapshot["event_to_read"]["max"], 100)
+        self.assertEqual(snapshot["read_to_detect"]["count"], 2)
+        self.assertNotIn("detect_to_ack", tracker.summary())
+
+
+if __name__ == "__main__":
+    unittest.main()
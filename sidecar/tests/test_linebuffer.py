@@ -0,0 +1,51 @@
+import json
+import unittest
+from linebuffer import RawLogBuffer
+from detector import AnomalyDetector
+
+
+class TestRawLogBuffer(unittest.TestCase):
+    def test_byte_budget_evicts_oldest(self):
+        buf = RawLogBuffer(max_bytes=100, max_lines=1000)
+        for i in range(50):
+            buf.append(f"line-{i:04d}")  # 9 bytes each
+        self.assertLessEqual(buf.size_bytes(), 100)
+        self.assertEqual(len(buf), 11)
+        self.assertEqual(buf.evicted, 39)
+        self.assertEqual(buf.preceding(50, 3), ["line-0047", "line-0048", "line-0049"])
+
+    def test_ring_wraps_and_preceding_stops_at_oldest(self):
+        buf = RawLogBuffer(max_bytes=10**6, max_lines=8)
+        seqs = [buf.append(f"l{i}") for i in range(20)]
+        self.assertEqual(len(buf), 8)
+        self.assertEqual(buf.preceding(seqs[-1], 100), [f"l{i}" for i in range(12, 19)])
+
+    def test_trace_index_survives_eviction(self):
+        buf = RawLogBuffer(max_bytes=10**6, max_lines=6)
+        buf.append("a1", "req-a")
+        buf.append("b1", "req-b")
+        buf.append("a2", "req-a")
+        for i in range(4):
+            buf.append(f"noise{i}")
+        # a1 is evicted, a2 still in the ring
+        self.assertEqual(buf.trace("req-a"), ["a2"])
+        for i in range(4):
+            buf.append(f"more{i}")
+        self.assertEqual(buf.trace("req-a"), [])
+        self.assertEqual(buf.stats()["requests"], 0)
+
+
+class TestDetectorContext(unittest.TestCase):
+    def test_anomaly_carries_preceding_and_trace_lines(self):
+        detector = AnomalyDetector(config={"learning_period": 0, "context_lines": 2}, line_buffer=RawLogBuffer())
+        detector.check(json.dumps({"message": "request start", "request_id": "r1", "level": "INFO"}))
+        for i in range(3):
+            detector.learn(f"INFO: filler {i}")
+        anomaly = detector.check(json.dumps({"message": "db exploded", "request_id": "r1", "level": "ERROR"}))
+        self.assertIsNotNone(anomaly)
+        self.assertEqual(len(anomaly["evidence"]["preceding"]), 2)
+        self.assertIn("request start", anomaly["evidence"]["trace"][0])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,110 @@
+import unittest
+import os
+import shutil
+import tempfile
+import time
+from unittest import mock
+from outbox import Outbox, OutboxReplayer
+
+
+class TestOutbox(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_replay_order_survives_reopen(self):
+        outbox = Outbox(self.tmpdir, segment_bytes=64)
+        outbox.append([{"id": i} for i in range(5)])
+        outbox.append([{"id": 5}])
+        outbox.close()
+
+        # New process: picks up the existing segments oldest first
+        reopened = Outbox(self.tmpdir, segment_bytes=64)
+        seen = []
+        while True:
+            path, payloads = reopened.take_oldest()
+            if path is None:
+                break
+            seen.extend(p["id"] for p in payloads)
+            reopened.commit(path, len(payloads))
+        self.assertEqual(seen, list(range(6)))
+
+    def test_cap_evicts_oldest_segments(self):
+        outbox = Outbox(self.tmpdir, max_bytes=200, segment_bytes=50)
+        for i in range(20):
+            outbox.append([{"id": i, "pad": "x" * 20}])
+        self.assertLessEqual(outbox.size_bytes(), 200 + 50)
+        self.assertGreater(outbox.stats["evicted_records"], 0)
+
+        path, payloads = outbox.take_oldest()
+        self.assertGreater(payloads[0]["id"], 0)
+
+    def test_torn_record_is_skipped(self):
+        outbox = Outbox(self.tmpdir)
+        outbox.append([{"id": 1}])
+        outbox.close()
+        segment = os.path.join(self.tmpdir, os.listdir(self.tmpdir)[0])
+        with open(segment, "ab") as f:
+            f.write(b'{"id": 2, "trunc')
+        _, payloads = Outbox(self.tmpdir).take_oldest()
+        self.assertEqual(payloads, [{"id": 1}])
+
+
+class TestOutboxReplayer(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_idle_outbox_is_synced_after_interval(self):
+        outbox = Outbox(self.tmpdir, fsync_every=1000, fsync_interval=0.05)
+        replayer = OutboxReplayer(outbox, lambda batch: True)
+        with mock.patch("outbox.os.fsync", wraps=os.fsync) as fsync:
+            outbox.append([{"id": 1}])
+            outbox.sync_if_due()
+            self.assertEqual(fsync.call_count, 0)  # interval not over yet
+
+            replayer.start()  # backend unhealthy: the replayer only ticks
+            try:
+                deadline = time.time() + 3
+                while not fsync.call_count and time.time() < deadline:
+                    time.sleep(0.01)
+            finally:
+                replayer.stop()
+        self.assertEqual(fsync.call_count, 1)
+        self.assertEqual(outbox._unsynced, 0)
+
+    def test_waits_for_health_then_resumes_after_failure(self):
+        outbox = Outbox(self.tmpdir)
+        outbox.append([{"id": i} for i in range(4)])
+        delivered = []
+        calls = {"n": 0}
+
+        def send(batch):
+            calls["n"] += 1
+            if calls["n"] == 2:
+                return False  # Backend blips after the first batch
+            delivered.extend(p["id"] for p in batch)
+            return True
+
+        replayer = OutboxReplayer(outbox, send, batch_size=2, base_delay=0.01, max_delay=0.02)
+        replayer.start()
+        try:
+            time.sleep(0.2)
+            self.assertEqual(delivered, [])  # No heartbeat success yet
+            replayer.mark_healthy()
+            deadline = time.time() + 3
+            while outbox.size_bytes() and time.time() < deadline:
+                time.sleep(0.01)
+        finally:
+            replayer.stop()
+
+        self.assertEqual(delivered, [0, 1, 2, 3])
+        self.assertEqual(outbox.stats["replayed"], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
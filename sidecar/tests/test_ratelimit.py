@@ -0,0 +1,61 @@
+import unittest
+from ratelimit import HierarchicalRateLimiter, parse_budgets
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestHierarchicalRateLimiter(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+
+    def limiter(self, **kwargs):
+        defaults = dict(window=60, global_max=8, type_max=4, template_max=2, reserve=0.25, clock=self.clock)
+        return HierarchicalRateLimiter(**{**defaults, **kwargs})
+
+    def test_template_budget_suppresses_only_that_template(self):
+        limiter = self.limiter()
+        results = [limiter.allow("Frequency Anomaly", "db down", 0.9)[0] for _ in range(3)]
+        self.assertEqual(results, [True, True, False])
+        self.assertTrue(limiter.allow("Frequency Anomaly", "disk full", 0.9)[0])
+        self.assertEqual(limiter.stats()["suppressed"], {"template": 1})
+
+    def test_low_confidence_cannot_starve_high_confidence(self):
+        limiter = self.limiter(global_max=8, type_max=100, template_max=100)
+        novelty = [limiter.allow("Novel Log Template", f"t{i}", 0.5) for i in range(10)]
+        # 25% of the global budget (2 tokens) is held back for high confidence
+        self.assertEqual(sum(ok for ok, _ in novelty), 6)
+        self.assertEqual(novelty[-1], (False, "global:reserve"))
+
+        self.assertTrue(limiter.allow("Frequency Anomaly", "db down", 0.9)[0])
+        self.assertTrue(limiter.allow("Frequency Anomaly", "db down 2", 0.9)[0])
+        self.assertEqual(limiter.allow("Frequency Anomaly", "db down 3", 0.9), (False, "global"))
+        self.assertEqual(limiter.stats()["suppressed_low_priority"], 4)
+
+    def test_per_type_budget_override_and_refill(self):
+        limiter = self.limiter(type_budgets={"Latency Anomaly": 1}, reserve=0.0)
+        self.assertTrue(limiter.allow("Latency Anomaly", "a", 0.6)[0])
+        self.assertEqual(limiter.allow("Latency Anomaly", "b", 0.6), (False, "type"))
+
+        self.clock.now += 60  # One full window refills the type bucket
+        self.assertTrue(limiter.allow("Latency Anomaly", "b", 0.6)[0])
+
+    def test_rejection_does_not_consume_other_levels(self):
+        limiter = self.limiter(template_max=1)
+        limiter.allow("A", "t", 0.9)
+        for _ in range(5):
+            limiter.allow("A", "t", 0.9)
+        self.assertEqual(limiter.stats()["global_tokens"], 7.0)
+
+    def test_parse_budgets(self):
+        self.assertEqual(parse_budgets("Novel Log Template=5, Frequency Anomaly=10"),
+                         {"Novel Log Template": 5, "Frequency Anomaly": 10})
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,84 @@
+import unittest
+import threading
+import time
+from reporter import AnomalyReporter
+
+
+class StubBackend:
+    """Stands in for the batch endpoint; optionally slow to respond"""
+
+    def __init__(self, delay=0.0, ok=True):
+        self.delay = delay
+        self.ok = ok
+        self.batches = []
+        self.lock = threading.Lock()
+
+    def __call__(self, batch):
+        time.sleep(self.delay)
+        with self.lock:
+            self.batches.append(list(batch))
+        return self.ok
+
+
+class TestAnomalyReporter(unittest.TestCase):
+    def test_submit_does_not_wait_for_backend(self):
+        backend = StubBackend(delay=0.2)
+        reporter = AnomalyReporter(backend, batch_size=10, flush_interval=0.05)
+        reporter.start()
+        try:
+            started = time.monotonic()
+            for i in range(25):
+                reporter.submit({"id": i})
+            self.assertLess(time.monotonic() - started, 0.1)
+        finally:
+            reporter.stop()
+        self.assertEqual(sum(len(b) for b in backend.batches), 25)
+
+    def test_batches_bounded_by_size(self):
+        backend = StubBackend()
+        reporter = AnomalyReporter(backend, batch_size=4, flush_interval=5.0)
+        for i in range(10):
+            reporter.submit({"id": i})
+        reporter.start()
+        reporter.stop()
+        self.assertEqual([len(b) for b in backend.batches], [4, 4, 2])
+        self.assertEqual(reporter.stats["sent"], 10)
+
+    def test_batches_bounded_by_time(self):
+        backend = StubBackend()
+        reporter = AnomalyReporter(backend, batch_size=100, flush_interval=0.1)
+        reporter.start()
+        try:
+            reporter.submit({"id": 1})
+            deadline = time.monotonic() + 2
+            while not backend.batches and time.monotonic() < deadline:
+                time.sleep(0.01)
+            self.assertEqual(backend.batches, [[{"id": 1}]])
+        finally:
+            reporter.stop()
+
+    def test_full_queue_drops_and_failures_counted(self):
+        reporter = AnomalyReporter(StubBackend(ok=False), max_queue=2)
+        self.assertTrue(reporter.submit({"id": 1}))
+        self.assertTrue(reporter.submit({"id": 2}))
+        self.assertFalse(reporter.submit({"id": 3}))
+        reporter.start()
+        reporter.stop()
+        self.assertEqual(reporter.stats["dropped"], 1)
+        self.assertEqual(reporter.stats["failed"], 2)
+
+    def test_partial_failure_spools_only_failed_payloads(self):
+        spooled = []
+        # Legacy per-anomaly delivery: the backend refused the odd ids
+        backend = lambda batch: [p for p in batch if p["id"] % 2]
+        reporter = AnomalyReporter(backend, batch_size=4, on_failure=spooled.extend)
+        for i in range(4):
+            reporter.submit({"id": i})
+        reporter.start()
+        reporter.stop()
+        self.assertEqual(spooled, [{"id": 1}, {"id": 3}])
+        self.assertEqual((reporter.stats["sent"], reporter.stats["failed"]), (2, 2))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,81 @@
+import unittest
+import os
+import gzip
+import shutil
+import tempfile
+from detector import FeatureExtractor
+from rotated import RotatedLogReplayer, ReplayCheckpoint, find_rotated_segments, iter_segment_lines
+
+
+def line(minute, msg):
+    return f'{{"timestamp": "2024-01-01T10:{minute:02d}:00Z", "level": "INFO", "message": "{msg}"}}\n'
+
+
+class TestRotatedReplay(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.log_path = os.path.join(self.tmpdir, 'app.log')
+        # app.log.2.gz (oldest) -> app.log.1 -> app.log (live)
+        with gzip.open(self.log_path + '.2.gz', 'wt') as f:
+            f.write(line(0, 'oldest') + line(1, 'older'))
+        with open(self.log_path + '.1', 'w') as f:
+            f.write(line(2, 'recent'))
+        with open(self.log_path, 'w') as f:
+            f.write(line(3, 'live'))
+        with open(os.path.join(self.tmpdir, 'app.log.bak.txt'), 'w') as f:
+            f.write('not a segment\n')
+        # mtimes match the last line written to each segment
+        extractor = FeatureExtractor()
+        for path, ts in ((self.log_path + '.2.gz', '2024-01-01T10:01:00Z'), (self.log_path + '.1', '2024-01-01T10:02:00Z')):
+            mtime = extractor.extract_timestamp_value(ts)
+            os.utime(path, (mtime, mtime))
+        self.replayer = RotatedLogReplayer(self.log_path, FeatureExtractor().ts_pattern, chunk_size=16)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_segments_oldest_first(self):
+        names = [os.path.basename(p) for p in find_rotated_segments(self.log_path)]
+        self.assertEqual(names, ['app.log.2.gz', 'app.log.1'])
+
+    def test_small_chunks_reassemble_lines(self):
+        lines = list(iter_segment_lines(self.log_path + '.2.gz', chunk_size=7))
+        self.assertEqual(lines, [line(0, 'oldest').strip(), line(1, 'older').strip()])
+
+    def test_replay_in_order(self):
+        seen = []
+        result = self.replayer.replay(seen.append)
+        self.assertEqual([s.split('"message": "')[1][:-2] for s in seen], ['oldest', 'older', 'recent'])
+        self.assertEqual(result['segments'], 2)
+        self.assertEqual(result['span_seconds'], 120.0)
+
+    def test_since_skips_processed_lines(self):
+        seen = []
+        since = FeatureExtractor().extract_timestamp_value('2024-01-01T10:00:30Z')
+        result = self.replayer.replay(seen.append, since=since)
+        self.assertEqual(len(seen), 2)
+        self.assertEqual(result['skipped'], 1)
+
+    def test_live_file_is_the_last_segment(self):
+        # Written to the live file after the checkpoint, before the restart; the last line is still partial
+        with open(self.log_path, 'a') as f:
+            f.write(line(4, 'missed') + line(5, 'partial').rstrip('\n'))
+        seen = []
+        since = FeatureExtractor().extract_timestamp_value('2024-01-01T10:01:30Z')
+        result = self.replayer.replay(seen.append, since=since, include_live=True)
+
+        self.assertEqual([s.split('"message": "')[1][:-2] for s in seen], ['recent', 'live', 'missed'])
+        self.assertEqual(result['span_seconds'], 120.0)
+        # Tailing resumes at the partial line, so it is read once it is complete
+        self.assertEqual(result['offset'], len(line(3, 'live') + line(4, 'missed')))
+        self.assertIsNone(self.replayer.replay(seen.append)['offset'])
+
+    def test_checkpoint_roundtrip(self):
+        checkpoint = ReplayCheckpoint(os.path.join(self.tmpdir, 'state', 'cp.json'))
+        self.assertIsNone(checkpoint.load())
+        checkpoint.save(1234.5)
+        self.assertEqual(checkpoint.load(), 1234.5)
+
+
+if __name__ == '__main__':
+    unittest.main()
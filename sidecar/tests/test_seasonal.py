@@ -0,0 +1,88 @@
+import json
+import math
+import unittest
+from seasonal import SeasonalBaselines, hour_of_week, SLOTS
+from detector import AnomalyDetector
+
+MONDAY = 1704067200  # 2024-01-01 00:00 UTC, a Monday
+HOUR = 3600
+WEEK = 7 * 24 * HOUR
+
+
+class TestSeasonalBaselines(unittest.TestCase):
+    def test_hour_of_week_slots(self):
+        self.assertEqual(hour_of_week(MONDAY), 0)
+        self.assertEqual(hour_of_week(MONDAY + 2 * 24 * HOUR + 3 * HOUR), 51)
+        self.assertEqual(hour_of_week(MONDAY + WEEK - 1), SLOTS - 1)
+
+    def test_expected_peak_per_window_and_silent_hours_decay(self):
+        baselines = SeasonalBaselines(window_seconds=300, alpha=0.5)
+        tid = "t1"
+        # 120 occurrences during Monday 02:00, then nothing until Monday 05:00
+        for i in range(120):
+            baselines.observe(tid, MONDAY + 2 * HOUR + i * 30)
+        baselines.observe(tid, MONDAY + 5 * HOUR)
+        self.assertAlmostEqual(baselines.expected(tid, MONDAY + 2 * HOUR + 10), 10.0, places=3)
+        self.assertEqual(baselines.expected(tid, MONDAY + 3 * HOUR), 0.0)
+        self.assertIsNone(baselines.expected(tid, MONDAY + 9 * HOUR))
+
+        # Next week the same hour is quiet: EWMA moves halfway
+        baselines.observe(tid, MONDAY + WEEK + 2 * HOUR)
+        baselines.observe(tid, MONDAY + WEEK + 3 * HOUR)
+        self.assertAlmostEqual(baselines.expected(tid, MONDAY + 2 * HOUR), (10.0 + 1.0) / 2, places=3)
+
+    def test_memory_is_fixed_and_bounded(self):
+        baselines = SeasonalBaselines(max_templates=10)
+        for i in range(50):
+            baselines.observe(f"t{i}", MONDAY)
+        self.assertEqual(len(baselines), 10)
+        self.assertEqual(baselines.size_bytes(), 10 * SLOTS * 4)
+
+    def test_export_round_trip(self):
+        baselines = SeasonalBaselines()
+        baselines.observe("t", MONDAY)
+        baselines.observe("t", MONDAY + HOUR)
+        restored = SeasonalBaselines()
+        self.assertEqual(restored.load(json.loads(json.dumps(baselines.export()))), 1)
+        self.assertEqual(restored.expected("t", MONDAY), baselines.expected("t", MONDAY))
+        self.assertTrue(math.isnan(restored._rates["t"][100]))
+
+
+class TestSeasonalFrequencyRule(unittest.TestCase):
+    def _burst(self, detector, start, count):
+        result = None
+        for i in range(count):
+            ts = start + i * (240 / count)
+            line = json.dumps({"timestamp": ts_iso(ts), "message": "nightly batch row done", "level": "INFO"})
+            result = detector.check(line) or result
+        return result
+
+    def test_weekly_batch_stops_alerting_once_learned(self):
+        config = {"learning_period": 0, "freq_threshold_flood": 200}
+        naive = AnomalyDetector(config={**config, "seasonal_factor": 0})
+        seasonal = AnomalyDetector(config=config)
+        for detector in (naive, seasonal):
+            # Last week's batch at Monday 02:00 and a line an hour later to close the slot
+            self._burst(detector, MONDAY + 2 * HOUR, 300)
+            self._burst(detector, MONDAY + 3 * HOUR, 1)
+            detector.context.recent_logs.clear()
+
+        this_week = MONDAY + WEEK + 2 * HOUR
+        self.assertEqual(self._burst(naive, this_week, 300)["anomaly_type"], "Frequency Anomaly")
+        self.assertIsNone(self._burst(seasonal, this_week, 300))
+
+    def test_detector_state_round_trip(self):
+        detector = AnomalyDetector()
+        self._burst(detector, MONDAY, 10)
+        self._burst(detector, MONDAY + HOUR, 1)
+        restored = AnomalyDetector()
+        self.assertEqual(restored.load_state(json.loads(json.dumps(detector.export_state()))), 1)
+
+
+def ts_iso(ts):
+    import time
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(ts)) + f".{int(ts % 1 * 1000):03d}Z"
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,119 @@
+import unittest
+import os
+import socket
+import tempfile
+import time
+from sources import LineSplitter, UnixSocketSource, SyslogSource, parse_syslog_line
+
+
+def wait_for(predicate, timeout=2.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestLineSplitter(unittest.TestCase):
+    def test_reassembles_partial_lines(self):
+        splitter = LineSplitter()
+        self.assertEqual(splitter.feed(b'first\nsec'), ['first'])
+        self.assertEqual(splitter.feed(b'ond\nthird'), ['second'])
+        self.assertEqual(splitter.flush(), ['third'])
+
+
+class TestSyslogParsing(unittest.TestCase):
+    def test_rfc5424_plain_text(self):
+        line = '<11>1 2024-01-01T10:00:00Z host app 123 - - Database connection failed'
+        self.assertEqual(parse_syslog_line(line), '2024-01-01T10:00:00Z ERROR: Database connection failed')
+
+    def test_rfc3164_json_passthrough(self):
+        line = '<14>Jan  1 10:00:00 host app[42]: {"level": "INFO", "message": "ok"}'
+        self.assertEqual(parse_syslog_line(line), '{"level": "INFO", "message": "ok"}')
+
+
+class TestSocketSources(unittest.TestCase):
+    def setUp(self):
+        self.lines = []
+        self.tmpdir = tempfile.mkdtemp()
+
+    def test_unix_datagram_batch(self):
+        path = os.path.join(self.tmpdir, 'dgram.sock')
+        source = UnixSocketSource(path, self.lines.append, socket_type='dgram')
+        source.start()
+        try:
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            for i in range(10):
+                client.sendto(f'line {i}\n'.encode(), path)
+            client.sendto(b'multi a\nmulti b', path)
+            client.close()
+            self.assertTrue(wait_for(lambda: len(self.lines) == 12))
+            self.assertEqual(self.lines[-2:], ['multi a', 'multi b'])
+        finally:
+            source.stop()
+
+    def test_oversized_datagram_is_counted_not_passed_partially(self):
+        path = os.path.join(self.tmpdir, 'trunc.sock')
+        source = UnixSocketSource(path, self.lines.append, socket_type='dgram', buffer_size=64)
+        source.start()
+        try:
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            client.sendto(b'complete line\n' + b'x' * 100, path)
+            client.sendto(b'y' * 64, path)  # exactly fills the buffer: not truncated
+            client.sendto(b'after', path)
+            client.close()
+            self.assertTrue(wait_for(lambda: len(self.lines) == 3))
+            self.assertEqual(self.lines, ['complete line', 'y' * 64, 'after'])
+            self.assertEqual(source.stats['truncated_datagrams'], 1)
+        finally:
+            source.stop()
+
+    def test_unix_stream_reassembly(self):
+        path = os.path.join(self.tmpdir, 'stream.sock')
+        source = UnixSocketSource(path, self.lines.append, socket_type='stream')
+        source.start()
+        try:
+            client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            client.connect(path)
+            client.sendall(b'hello wo')
+            time.sleep(0.05)
+            client.sendall(b'rld\ntrailing')
+            client.close()
+            self.assertTrue(wait_for(lambda: len(self.lines) == 2))
+            self.assertEqual(self.lines, ['hello world', 'trailing'])
+        finally:
+            source.stop()
+
+    def test_only_a_stale_socket_is_replaced(self):
+        path = os.path.join(self.tmpdir, 'stale.sock')
+        stale = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        stale.bind(path)
+        stale.close()  # leaves the socket file behind, as a crashed run would
+        source = UnixSocketSource(path, self.lines.append)
+        source.start()
+        source.stop()
+
+        path = os.path.join(self.tmpdir, 'app.log')
+        with open(path, 'w') as f:
+            f.write('keep me\n')
+        with self.assertRaisesRegex(FileExistsError, 'not a socket'):
+            UnixSocketSource(path, self.lines.append).start()
+        with open(path) as f:
+            self.assertEqual(f.read(), 'keep me\n')
+
+    def test_syslog_udp(self):
+        source = SyslogSource('127.0.0.1', 0, self.lines.append, protocol='udp')
+        source.start()
+        try:
+            client = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+            client.sendto(b'<12>1 2024-01-01T10:00:00Z host app - - - cache miss storm', ('127.0.0.1', source.port))
+            client.close()
+            self.assertTrue(wait_for(lambda: len(self.lines) == 1))
+            self.assertEqual(self.lines[0], '2024-01-01T10:00:00Z WARN: cache miss storm')
+        finally:
+            source.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
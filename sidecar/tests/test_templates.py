@@ -0,0 +1,101 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from templates import (
+    BloomFilter, TemplateDictionary, export_templates, load_template_dictionary,
+    template_key, encode_ids, decode_ids,
+)
+from detector import AnomalyDetector
+
+
+def word(i):
+    """Digit-free unique token (digits would be masked into <NUM>)"""
+    letters = ""
+    while True:
+        letters += chr(97 + i % 26)
+        i //= 26
+        if not i:
+            return letters
+
+
+def template_ids(lines):
+    detector = AnomalyDetector()
+    return [detector.extractor.parse(line)["template_id"] for line in lines]
+
+
+class TestBloomFilter(unittest.TestCase):
+    def test_no_false_negatives_and_low_false_positives(self):
+        ids = template_ids([f"message family {word(i)}" for i in range(2000)])
+        dictionary = TemplateDictionary.from_ids(template_key(tid) for tid in ids)
+        self.assertTrue(all(tid in dictionary for tid in ids))
+
+        others = template_ids([f"unrelated entry {word(i)}" for i in range(2000)])
+        false_positives = sum(tid in dictionary for tid in others)
+        self.assertLess(false_positives, len(others) * 0.03)
+        # ~1.2 bytes per template at 1% FPR
+        self.assertEqual(dictionary.count, 2000)
+        self.assertLess(dictionary.size_bytes(), 2000 * 1.5)
+
+    def test_ids_round_trip(self):
+        keys = [2**64 - 1, 0, 12345]
+        self.assertEqual(list(decode_ids(encode_ids(keys))), sorted(keys))
+
+
+class TestTemplateDictionaryWarmStart(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.lines = [
+            '{"message": "user 12 logged in", "level": "INFO"}',
+            '{"message": "cache miss for key 0x1f", "level": "WARN"}',
+        ]
+        veteran = AnomalyDetector(config={"learning_period": 0})
+        for line in self.lines:
+            veteran.check(line)
+        self.exported = export_templates(veteran.known_template_ids())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+    def test_preloaded_templates_are_not_novel(self):
+        path = os.path.join(self.tmp, "templates.json")
+        with open(path, "w") as f:
+            json.dump(self.exported, f)
+
+        fresh = AnomalyDetector(config={"learning_period": 0}, known_templates=load_template_dictionary(path))
+        self.assertIsNone(fresh.check('{"message": "user 99 logged in", "level": "INFO"}'))
+        anomaly = fresh.check('{"message": "disk quota exceeded", "level": "WARN"}')
+        self.assertEqual(anomaly["anomaly_type"], "Novel Log Template")
+
+    def test_load_from_stub_server_with_ids_only(self):
+        body = json.dumps({"version": 1, "count": self.exported["count"], "ids": self.exported["ids"]}).encode()
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/api/sidecar/templates/svc"
+            dictionary = load_template_dictionary(url)
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertEqual(dictionary.count, 2)
+        for tid in template_ids(self.lines):
+            self.assertIn(tid, dictionary)
+
+
+if __name__ == "__main__":
+    unittest.main()